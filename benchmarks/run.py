@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Offline benchmarks for the scrape-parse, ingest, scoring and export hot paths.
+
+Usage:
+  python benchmarks/run.py [--only parse,ingest,scoring,export] [--quick] [--repeat 5]
+  python benchmarks/run.py --output bench.json
+  python benchmarks/run.py --compare baseline.json [--threshold 0.2]
+
+Everything runs against saved chart fixtures and synthetic data in a temporary
+directory; no network or API keys are needed. Results are printed as a table
+and optionally written as JSON (one entry per benchmark with min/median/mean
+seconds and throughput). --compare reports each benchmark's median against a
+previous JSON run and exits non-zero when any is slower by more than the
+threshold.
+"""
+import argparse
+import copy
+import datetime
+import importlib.util
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src import database, metrics, scraper, video_selector
+from src.video_selector import score_candidate, score_song_batches, select_best_video
+
+from benchmarks import synthetic
+
+FIXTURES = ROOT / 'tests' / 'fixtures' / 'charts'
+FIXTURE_DATE = datetime.date(2024, 1, 5)
+
+# The shipped songs.db holds ~19k songs over ~1355 weekly charts (135k chart
+# rows); with 15% weekly turnover a synthetic history of that many weeks has
+# about the same number of songs
+SHIPPED_WEEKS = 1355
+INGEST_YEARS = 10
+SCORING_SONGS = 2000
+
+BENCHMARKS = ['parse', 'ingest', 'scoring', 'export']
+
+def measure(name, fn, repeat, items=None, setup=None, **params):
+    """
+    Time ``fn`` ``repeat`` times and return a result dict.
+
+    ``setup`` (untimed) runs before every call and its return value is passed
+    to ``fn``; ``items`` is the number of units of work per call and is used
+    to report throughput.
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    result = {
+        'name': name,
+        'params': params,
+        'repeat': repeat,
+        'min': min(times),
+        'median': median,
+        'mean': statistics.fmean(times),
+        'items': items,
+        'items_per_sec': items / median if items and median else None,
+    }
+    rate = f", {result['items_per_sec']:,.0f} items/s" if items else ''
+    print(f"{name:<40} median {median * 1000:10.2f} ms  (min {min(times) * 1000:.2f} ms{rate})", flush=True)
+    return result
+
+def bench_parse(repeat, scales, workdir):
+    results = []
+    for path in sorted(FIXTURES.glob('*.html')):
+        html = path.read_text(encoding='utf-8')
+        entries = len(scraper.parse_chart_page(html, FIXTURE_DATE))
+        for engine in ('fast', 'soup'):
+            results.append(measure(f'parse.{path.stem}.{engine}', scraper.parse_chart_page, repeat, items=entries,
+                                   setup=lambda html=html, engine=engine: (html, FIXTURE_DATE, engine),
+                                   fixture=path.name, engine=engine))
+
+    # scrape_songs end to end, with the page served from the fixture instead of the fetcher
+    html = (FIXTURES / 'singles_top100.html').read_text(encoding='utf-8')
+    fetch = scraper.fetch_chart_page
+    scraper.fetch_chart_page = lambda date, chart_id=scraper.SINGLES_CHART_ID, refresh=False: html
+    try:
+        results.append(measure('parse.scrape_songs', scraper.scrape_songs, repeat, items=100,
+                               setup=lambda: (FIXTURE_DATE,), engine=scraper.CHART_PARSER))
+    finally:
+        scraper.fetch_chart_page = fetch
+    return results
+
+def _fresh_db(workdir, name):
+    path = Path(workdir) / name
+    for suffix in ('', '-wal', '-shm'):
+        Path(f'{path}{suffix}').unlink(missing_ok=True)
+    database.set_db_path(path)
+    database.create_tables_if_needed()
+    return path
+
+def _ingest_one_by_one(charts):
+    for date, songs in charts:
+        database.add_playlist_to_db(date, songs)
+    database.close_db_connections()
+
+def _ingest_bulk(charts):
+    database.add_playlists_to_db(charts)
+    database.close_db_connections()
+
+def bench_ingest(repeat, scales, workdir):
+    results = []
+    for scale in scales:
+        years = INGEST_YEARS * scale
+        charts = synthetic.chart_history(52 * years)
+        rows = sum(len(songs) for _, songs in charts)
+
+        def setup():
+            _fresh_db(workdir, 'ingest.db')
+            return (charts,)
+
+        # One transaction per chart gets slow quickly; only time it at the base scale
+        if scale == scales[0]:
+            results.append(measure(f'ingest.add_playlist_to_db.{years}y', _ingest_one_by_one, repeat, items=rows,
+                                   setup=setup, years=years, charts=len(charts)))
+        results.append(measure(f'ingest.add_playlists_to_db.{years}y', _ingest_bulk, repeat, items=rows,
+                               setup=setup, years=years, charts=len(charts)))
+    return results
+
+def bench_scoring(repeat, scales, workdir):
+    results = []
+    for scale in scales:
+        songs = SCORING_SONGS * scale
+        sets = synthetic.candidate_sets(songs)
+        candidates = sum(len(c) for c, _, _ in sets)
+        fresh = lambda: ([([copy.copy(c) for c in cands], artist, song) for cands, artist, song in sets],)
+
+        def one_by_one(batches):
+            for cands, artist, song in batches:
+                for c in cands:
+                    score_candidate(c, artist, song)
+
+        def per_song(batches):
+            for cands, artist, song in batches:
+                select_best_video(cands, artist, song)
+
+        params = dict(songs=songs, candidates=candidates, rapidfuzz=video_selector._RAPIDFUZZ_AVAILABLE,
+                      vectorized=video_selector._CDIST_AVAILABLE)
+        results.append(measure(f'scoring.score_candidate.{songs}', one_by_one, repeat, items=candidates,
+                               setup=fresh, **params))
+        results.append(measure(f'scoring.select_best_video.{songs}', per_song, repeat, items=candidates,
+                               setup=fresh, **params))
+        results.append(measure(f'scoring.score_song_batches.{songs}', score_song_batches, repeat, items=candidates,
+                               setup=fresh, **params))
+    return results
+
+def _load_export_script():
+    spec = importlib.util.spec_from_file_location('export_csv', ROOT / 'scripts' / 'export_csv.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def build_history_db(path, weeks):
+    """Write a synthetic chart history of ``weeks`` charts to a new database at ``path``."""
+    _fresh_db(path.parent, path.name)
+    database.add_playlists_to_db(synthetic.chart_history(weeks), batch_size=500)
+    database.close_db_connections()
+    conn = database.get_readonly_connection(path)
+    try:
+        return (conn.execute('SELECT COUNT(*) FROM songs').fetchone()[0],
+                conn.execute('SELECT COUNT(*) FROM playlist_songs').fetchone()[0])
+    finally:
+        conn.close()
+
+def bench_export(repeat, scales, workdir):
+    export_csv = _load_export_script()
+    # Keep the script's run report out of the working directory
+    metrics.RUN_REPORT = str(Path(workdir) / 'run_report.json')
+    results = []
+    for scale in scales:
+        path = Path(workdir) / f'export_{scale}x.db'
+        songs, rows = build_history_db(path, SHIPPED_WEEKS * scale)
+        export_csv.DB_PATH = path
+        export_csv.PUBLIC_DIR = Path(workdir) / f'public_{scale}x'
+        results.append(measure(f'export.export_csv.{scale}x', export_csv.main, repeat, items=songs + 100,
+                               setup=lambda: ([],), scale=scale, songs=songs, chart_rows=rows))
+        results.append(measure(f'export.export_csv.history.{scale}x', export_csv.main, repeat, items=2 * rows,
+                               setup=lambda: (['--history', '--by-year', '--format', ''],), scale=scale,
+                               songs=songs, chart_rows=rows))
+        path.unlink()
+    return results
+
+RUNNERS = {
+    'parse': bench_parse,
+    'ingest': bench_ingest,
+    'scoring': bench_scoring,
+    'export': bench_export,
+}
+
+def run_benchmarks(selected=BENCHMARKS, repeat=5, scales=(1, 10), workdir=None):
+    """Run the selected benchmark groups and return their result dicts."""
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        db_path = database.DB_PATH
+        try:
+            results = []
+            for name in selected:
+                results.extend(RUNNERS[name](repeat, list(scales), tmp))
+            return results
+        finally:
+            database.set_db_path(db_path)
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def compare(results, baseline, threshold):
+    """Print each median against ``baseline`` and return the names that regressed."""
+    previous = {r['name']: r for r in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline.get('environment', {}).get('commit') or 'baseline'}:")
+    for r in results:
+        old = previous.get(r['name'])
+        if old is None:
+            print(f"{r['name']:<40} (new)")
+            continue
+        ratio = r['median'] / old['median']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(r['name'])
+        print(f"{r['name']:<40} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Run offline performance benchmarks')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help=f"Comma-separated groups ({','.join(BENCHMARKS)})")
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark (default 5)')
+    parser.add_argument('--quick', action='store_true', help='Base scale only, 3 runs')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Slowdown ratio above which --compare fails (default 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"Unknown benchmark group(s): {', '.join(sorted(unknown))}")
+    repeat = 3 if args.quick else args.repeat
+    scales = (1,) if args.quick else (1, 10)
+
+    # Per-chart logging (and the edge-case fixture's expected parse errors)
+    # would dominate the timings
+    logging.disable(logging.CRITICAL)
+    results = run_benchmarks(selected, repeat, scales)
+    report = {'environment': environment(), 'results': results}
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+        print(f'\nWrote {len(results)} results to {args.output}')
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
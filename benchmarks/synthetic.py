@@ -0,0 +1,73 @@
+import datetime
+import random
+
+from src.video_selector import VideoCandidate
+
+WORDS = [
+    'love', 'night', 'heart', 'dance', 'fire', 'baby', 'summer', 'dream', 'light', 'gold', 'rain', 'wild',
+    'home', 'girl', 'boy', 'forever', 'tonight', 'crazy', 'sweet', 'blue', 'stars', 'money', 'city', 'run',
+]
+TITLE_EXTRAS = [
+    '(Official Video)', '(Official Music Video)', '(Lyrics)', '(Lyric Video)', '(Official Audio)', '(Visualiser)',
+    '(Live at Wembley)', '(Acoustic Cover)', '(Remix)', '[HQ Audio]', '', '', '',
+]
+
+def _name(rng, words=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).upper()
+
+def chart_history(weeks, chart_size=100, turnover=0.15, seed=0, start=datetime.date(2000, 1, 7)):
+    """
+    Return ``weeks`` consecutive synthetic charts as (yyyymmdd, songs) pairs.
+
+    Each week about ``turnover`` of the chart is replaced by new songs and the
+    rest moves around, so songs recur across weeks like the real chart.
+    """
+    rng = random.Random(seed)
+    counter = 0
+
+    def new_song():
+        nonlocal counter
+        counter += 1
+        return (f'{_name(rng, rng.randint(1, 3))} {counter}', _name(rng, 2))
+
+    current = [new_song() for _ in range(chart_size)]
+    charts = []
+    for week in range(weeks):
+        date = start + datetime.timedelta(days=7 * week)
+        if week:
+            keep = rng.sample(current, int(chart_size * (1 - turnover)))
+            current = keep + [new_song() for _ in range(chart_size - len(keep))]
+            rng.shuffle(current)
+        charts.append((date.strftime('%Y%m%d'), [{
+            'position': position,
+            'song_name': song,
+            'artist': artist,
+            'lw': 0,
+            'peak': position,
+            'weeks': 1,
+            'is_new': False,
+            'is_reentry': False,
+        } for position, (song, artist) in enumerate(current, 1)]))
+    return charts
+
+def candidate_sets(songs, per_song=15, seed=0):
+    """Return ``songs`` synthetic (candidates, artist, song) search results."""
+    rng = random.Random(seed)
+    sets = []
+    for i in range(songs):
+        artist = _name(rng, 2).title()
+        song = _name(rng, rng.randint(1, 3)).title()
+        candidates = []
+        for j in range(per_song):
+            title = rng.choice([f'{artist} - {song}', f'{song} - {artist}', f'{song}', f'{_name(rng, 3).title()}'])
+            candidates.append(VideoCandidate(
+                video_id=f'v{i}_{j}',
+                title=f'{title} {rng.choice(TITLE_EXTRAS)}'.strip(),
+                channel_title=rng.choice([artist, f'{artist}VEVO', 'Lyrics Hub', 'Music Channel', _name(rng, 1)]),
+                view_count=rng.choice([0, rng.randint(1_000, 100_000), rng.randint(1_000_000, 900_000_000)]),
+                duration_seconds=rng.choice([None, rng.randint(30, 80), rng.randint(150, 300), rng.randint(700, 4000)]),
+                category_id=rng.choice(['10', '10', '22', '24']),
+                published_at='2020-01-01T00:00:00Z',
+            ))
+        sets.append((candidates, artist, song))
+    return sets
@@ -10,10 +10,8 @@ Requires YOUTUBE_API_KEYS in environment.
 import argparse
 import os
 import logging
-import sqlite3
 import sys
 from pathlib import Path
-from typing import Optional
 
 # Ensure project root on sys.path when executed directly
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -21,38 +19,20 @@ if str(PROJECT_ROOT / 'src') not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.youtube import get_scored_candidates, get_best_youtube_video
-from src.database import get_db_connection
+from src.database import get_db_connection, get_readonly_connection
+from src.queries import get_playlist, latest_chart_date
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
-def get_latest_date(conn: sqlite3.Connection) -> Optional[str]:
-    row = conn.execute('SELECT date FROM playlists ORDER BY date DESC LIMIT 1').fetchone()
-    return row[0] if row else None
-
-def load_top_songs(conn: sqlite3.Connection, date: str, limit: int):
-    rows = conn.execute('''
-        SELECT s.id, s.song_name, s.artist, s.video_id, s.video_title, s.channel_title, s.video_confidence, ps.position
-        FROM playlists p
-        JOIN playlist_songs ps ON p.id = ps.playlist_id
-        JOIN songs s ON s.id = ps.song_id
-        WHERE p.date = ?
-        ORDER BY ps.position ASC
-        LIMIT ?
-    ''', (date, limit)).fetchall()
-    return [dict(r) for r in rows]
-
-
 def analyze_song(song):
-    artist = song['artist']
-    title = song['song_name']
-    candidates = get_scored_candidates(artist, title, limit=15)
-    current_id = song.get('video_id') or ''
+    candidates = get_scored_candidates(song.artist, song.song_name, limit=15)
+    current_id = song.video_id or ''
     best = candidates[0] if candidates else None
     improved = False
     if best and best['video_id'] and best['video_id'] != current_id:
         # Consider improvement only if score delta significant (>5) or current empty
-        old_score = song.get('video_confidence') or 0.0
+        old_score = song.video_confidence or 0.0
         if (best['score'] - old_score) > 5 or not current_id:
             improved = True
     return {
@@ -69,7 +49,7 @@ def maybe_apply(conn, analysis_result):
     song = analysis_result['song']
     best = analysis_result['best']
     conn.execute('''UPDATE songs SET video_id = ?, video_title = ?, channel_title = ?, video_confidence = ? WHERE id = ?''',
-                 (best['video_id'], best['title'], best['channel_title'], best['score'], song['id']))
+                 (best['video_id'], best['title'], best['channel_title'], best['score'], song.song_id))
     return True
 
 
@@ -84,12 +64,13 @@ def main():
     if 'YOUTUBE_API_KEYS' not in os.environ:
         parser.error('YOUTUBE_API_KEYS environment variable required')
 
-    conn = get_db_connection()
-    date = args.date or get_latest_date(conn)
+    # Only --apply writes; plain analysis runs against a read-only mapping
+    conn = get_db_connection() if args.apply else get_readonly_connection()
+    date = args.date or latest_chart_date(conn)
     if not date:
         parser.error('No playlists found in database and no --date supplied')
 
-    songs = load_top_songs(conn, date, args.limit)
+    songs = (get_playlist(date, conn) or ())[:args.limit]
     if not songs:
         parser.error(f'No songs found for date {date}')
 
@@ -99,8 +80,8 @@ def main():
         analysis = analyze_song(song)
         best = analysis['best']
         print('\n' + '='*80)
-        print(f"{song['position']:02d}. {song['artist']} - {song['song_name']}")
-        print(f"Current: {song.get('video_id') or '(none)'} | score={song.get('video_confidence')} title={song.get('video_title')}")
+        print(f"{song.position:02d}. {song.artist} - {song.song_name}")
+        print(f"Current: {song.video_id or '(none)'} | score={song.video_confidence} title={song.video_title}")
         if not best:
             print('No candidates found.')
             continue
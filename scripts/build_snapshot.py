@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Build the compact, read-only songs.db snapshot that gets published.
+
+Usage:
+  python scripts/build_snapshot.py [--db songs.db] [--out public/songs.db] [--compress gz,zst] [--previous old.db]
+         [--history-index] [--extras public/songs_extras.db] [--report report.json]
+
+Only songs, playlists and playlist_songs are copied. Chart dates are stored as
+INTEGER yyyymmdd (comparisons with 'yyyymmdd' strings still match), and
+playlist_songs is a WITHOUT ROWID table keyed by (playlist_id, position).
+A date index serves "playlist by date" lookups; --history-index adds the
+(song_id, playlist_id) index for "song history" (about +1.6 MB on the shipped
+data).
+With --extras the derived tables (song_stats, artist_stats, song_sparklines,
+song_canonical, artists, song_artists) are written to a separate file, so
+clients that want them ATTACH it next to songs.db.
+Compressed copies are written next to the snapshot (.zst needs zstandard). The
+report compares sizes and query timings with the source database and with the
+previous publication (--previous, default the existing --out file); a
+snapshot that grew by more than 1% is logged as a warning.
+"""
+import argparse
+import dataclasses
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.snapshot import PAGE_SIZE, build_snapshot, compress_snapshot, snapshot_with_report
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the published read-only database snapshot')
+    parser.add_argument('--db', type=Path, default=Path('songs.db'), help='Working database (default songs.db)')
+    parser.add_argument('--out', type=Path, default=Path('public/songs.db'), help='Snapshot path (default public/songs.db)')
+    parser.add_argument('--compress', default='gz,zst', help="Compressed variants to write (default gz,zst; '' for none)")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help=f'SQLite page size (default {PAGE_SIZE})')
+    parser.add_argument('--previous', type=Path, help='Previously published snapshot to compare sizes with (default --out)')
+    parser.add_argument('--history-index', action='store_true',
+                        help='Add the song history index (faster song lookups, larger file)')
+    parser.add_argument('--extras', type=Path, help='Also write the derived tables to this separate snapshot')
+    parser.add_argument('--report', type=Path, help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        raise SystemExit(f'{args.db} not found')
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    formats = [fmt.strip() for fmt in args.compress.split(',') if fmt.strip()]
+    report = snapshot_with_report(args.db, args.out, formats, args.page_size, args.previous,
+                                  args.history_index)
+
+    print(f'Source:   {report.source_bytes:>10,} bytes ({report.source_free_pages} free pages)')
+    print(f'Snapshot: {report.snapshot_bytes:>10,} bytes ({report.snapshot_bytes / report.source_bytes:.0%} of source)')
+    if report.previous_bytes:
+        print(f'Previous: {report.previous_bytes:>10,} bytes ({report.snapshot_bytes / report.previous_bytes - 1:+.1%})')
+    for fmt, size in report.compressed.items():
+        print(f'  .{fmt:<6} {size:>10,} bytes')
+    for name, timing in report.query_seconds.items():
+        previous = f" (previous {timing['previous'] * 1000:.3f} ms)" if 'previous' in timing else ''
+        print(f"{name:<18} {timing['source'] * 1000:8.3f} ms -> {timing['snapshot'] * 1000:8.3f} ms{previous}")
+    if args.extras:
+        build_snapshot(args.db, args.extras, args.page_size, extras=True)
+        print(f'Extras:   {args.extras.stat().st_size:>10,} bytes ({args.extras})')
+        for fmt, size in (compress_snapshot(args.extras, formats) if formats else {}).items():
+            print(f'  .{fmt:<6} {size:>10,} bytes')
+    if args.report:
+        args.report.write_text(json.dumps(dataclasses.asdict(report), indent=2) + '\n', encoding='utf-8')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Check or rebuild the precomputed chart stats tables.
+
+Usage:
+  python scripts/chart_stats.py --check      # exit 1 if any summary differs from the raw charts
+  python scripts/chart_stats.py --rebuild    # recompute song_stats, artist_stats and song_sparklines
+
+The tables are normally kept up to date by every chart write; see
+src/chart_stats.py.
+"""
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.chart_stats import check_chart_stats, rebuild_chart_stats
+from src.database import get_db_connection
+from src.migrations import migrate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check or rebuild the chart stats tables')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--check', action='store_true', help='Compare the stored summaries with the raw charts')
+    group.add_argument('--rebuild', action='store_true', help='Recompute every summary from the raw charts')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        migrate(conn)
+        if args.rebuild:
+            rebuild_chart_stats(conn)
+            conn.commit()
+            return
+        problems = check_chart_stats(conn)
+    finally:
+        conn.close()
+    for problem in problems:
+        print(problem)
+    if problems:
+        print(f'{len(problems)} chart stats rows differ from the raw charts; run with --rebuild')
+        sys.exit(1)
+    print('Chart stats match the raw charts')
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,34 @@
 #!/usr/bin/env python3
-"""Export CSV snapshots from songs.db for publication.
+"""Export CSV (and optionally compressed / Parquet) snapshots from songs.db for publication.
 
 Outputs:
   public/latest_playlist.csv  (latest Friday playlist with joined fields)
   public/songs.csv            (unique songs master list)
 
-The script assumes it is run from repo root or with CWD containing songs.db.
+With --history / --by-year:
+  public/history/chart_history.csv.gz                 (every chart row, oldest first)
+  public/history/by_year/chart_history_<year>.csv.gz  (one file per chart year)
+
+Usage:
+  python scripts/export_csv.py [--history] [--by-year] [--format csv] [--history-format csv.gz,parquet] [--workers 4]
+
+Rows are streamed from SQLite in chunks, so memory use stays flat however
+large the history gets; independent exports run concurrently. Parquet output
+requires pyarrow (uv sync --extra parquet). The script assumes it is run from
+repo root or with CWD containing songs.db.
 """
 
-import csv
-import datetime
+import argparse
 import logging
 import os
-import sqlite3
+import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.export import CHUNK_ROWS, plan_exports, run_exports
+from src.metrics import write_run_report
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -22,78 +36,33 @@ DB_PATH = Path('songs.db')
 PUBLIC_DIR = Path('public')
 
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def latest_friday_date(conn):
-    cur = conn.execute("SELECT date FROM playlists ORDER BY date DESC LIMIT 1")
-    row = cur.fetchone()
-    return row['date'] if row else None
-
-
-def export_latest_playlist(conn, date_str: str):
-    query = """
-    SELECT 
-      p.date AS chart_date,
-      ps.position,
-      s.song_name,
-      s.artist,
-      ps.lw,
-      ps.peak,
-      ps.weeks,
-      ps.is_new,
-      ps.is_reentry,
-      s.video_id
-    FROM playlists p
-    JOIN playlist_songs ps ON p.id = ps.playlist_id
-    JOIN songs s ON ps.song_id = s.id
-    WHERE p.date = ?
-    ORDER BY ps.position ASC
-    """
-    rows = conn.execute(query, (date_str,)).fetchall()
-    out_path = PUBLIC_DIR / 'latest_playlist.csv'
-    with out_path.open('w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            'chart_date','position','song_name','artist','lw','peak','weeks','is_new','is_reentry','video_id'
-        ])
-        for r in rows:
-            writer.writerow([
-                r['chart_date'], r['position'], r['song_name'], r['artist'], r['lw'], r['peak'], r['weeks'],
-                int(r['is_new']), int(r['is_reentry']), r['video_id'] or ''
-            ])
-    logger.info(f"Exported latest playlist ({date_str}) to {out_path}")
-
-
-def export_songs_master(conn):
-    query = "SELECT id, song_name, artist, COALESCE(video_id,'') AS video_id FROM songs ORDER BY artist, song_name"
-    rows = conn.execute(query).fetchall()
-    out_path = PUBLIC_DIR / 'songs.csv'
-    with out_path.open('w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['id','song_name','artist','video_id'])
-        for r in rows:
-            writer.writerow([r['id'], r['song_name'], r['artist'], r['video_id']])
-    logger.info(f"Exported songs master ({len(rows)} rows) to {out_path}")
-
-
-def main():
-    if not DB_PATH.exists():
+def parse_formats(value):
+    return [fmt.strip() for fmt in value.split(',') if fmt.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export chart data for publication')
+    parser.add_argument('--db', type=Path, default=DB_PATH, help='Database to export (default songs.db)')
+    parser.add_argument('--out', type=Path, default=PUBLIC_DIR, help='Output directory (default public)')
+    parser.add_argument('--history', action='store_true', help='Export the full chart history')
+    parser.add_argument('--by-year', action='store_true', help='Export one chart history file per year')
+    parser.add_argument('--format', type=parse_formats, default=['csv'],
+                        help='Formats for latest_playlist and songs: csv, csv.gz, parquet (default csv)')
+    parser.add_argument('--history-format', type=parse_formats, default=['csv.gz'],
+                        help='Formats for the history exports (default csv.gz)')
+    parser.add_argument('--workers', type=int, default=4, help='Exports to run at once (default 4)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if not args.db.exists():
         raise SystemExit("songs.db not found; run update scripts first")
-    PUBLIC_DIR.mkdir(exist_ok=True)
-    conn = get_connection()
     try:
-        date_str = latest_friday_date(conn)
-        if not date_str:
-            logger.warning("No playlists found; skipping playlist export")
-        else:
-            export_latest_playlist(conn, date_str)
-        export_songs_master(conn)
-    finally:
-        conn.close()
+        jobs = plan_exports(args.db, args.out, args.format, args.history_format, args.history, args.by_year)
+        results = run_exports(args.db, jobs, args.workers, args.chunk_rows)
+    except (ValueError, RuntimeError) as e:
+        raise SystemExit(str(e))
+    logger.info(f"Finished {len(results)} exports ({sum(r.rows for r in results)} rows) into {args.out}")
+    write_run_report('export_csv')
 
 
 if __name__ == '__main__':
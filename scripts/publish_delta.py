@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Publish songs.db incrementally: a changeset against the previous snapshot plus a manifest.
+
+Usage:
+  python scripts/publish_delta.py --out public --base-url https://mjdavy.github.io/toptastic-bot
+  python scripts/publish_delta.py --out public --previous-db old/songs.db --previous-manifest old/manifest.json
+
+With --base-url the previously published manifest, snapshot and changesets
+are downloaded first (changesets into <out>/deltas so they stay published).
+If anything is missing or fails verification a new chain is started from the
+current database. See src/delta.py for the format.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.delta import FULL_SNAPSHOT_EVERY, MANIFEST_NAME, SNAPSHOT_NAME, file_sha256, load_manifest, publish
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 60
+
+def download(url, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with requests.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            for block in response.iter_content(1 << 16):
+                f.write(block)
+
+def fetch_previous(base_url, work_dir, out_dir):
+    """Download the published manifest, snapshot and changesets; returns (manifest, snapshot path) or (None, None)."""
+    base_url = base_url.rstrip('/')
+    try:
+        download(f'{base_url}/{MANIFEST_NAME}', work_dir / MANIFEST_NAME)
+        manifest = load_manifest(work_dir / MANIFEST_NAME)
+        snapshot = work_dir / SNAPSHOT_NAME
+        download(f"{base_url}/{manifest['snapshot']['file']}", snapshot)
+        if file_sha256(snapshot) != manifest['snapshot']['sha256']:
+            raise ValueError('snapshot hash mismatch')
+        for delta in manifest['deltas']:
+            path = out_dir / delta['file']
+            download(f"{base_url}/{delta['file']}", path)
+            if file_sha256(path) != delta['sha256']:
+                raise ValueError(f"hash mismatch for {delta['file']}")
+    except (requests.RequestException, ValueError, KeyError) as e:
+        logger.warning(f'Could not fetch the previous publication from {base_url} ({e}); starting a new chain')
+        return None, None
+    logger.info(f"Fetched published version {manifest['version']} with {len(manifest['deltas'])} changesets")
+    return manifest, snapshot
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish songs.db with incremental changesets')
+    parser.add_argument('--db', type=Path, default=Path('songs.db'), help='Database to publish (default songs.db)')
+    parser.add_argument('--out', type=Path, default=Path('public'), help='Publication directory (default public)')
+    parser.add_argument('--base-url', help='URL of the current publication to diff against')
+    parser.add_argument('--previous-db', type=Path, help='Previously published snapshot (instead of --base-url)')
+    parser.add_argument('--previous-manifest', type=Path, help='Previously published manifest (instead of --base-url)')
+    parser.add_argument('--full-every', type=int, default=FULL_SNAPSHOT_EVERY,
+                        help=f'Start a new chain after this many changesets (default {FULL_SNAPSHOT_EVERY})')
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        raise SystemExit(f'{args.db} not found')
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.base_url:
+            previous, previous_db = fetch_previous(args.base_url, Path(tmp), args.out)
+        else:
+            previous = load_manifest(args.previous_manifest) if args.previous_manifest else None
+            previous_db = args.previous_db
+        manifest = publish(args.db, args.out, previous_db, previous, args.full_every)
+    logger.info(f"Published version {manifest['version']} "
+                f"({len(manifest['deltas'])} changesets since version {manifest['chain_start']})")
+
+if __name__ == '__main__':
+    main()
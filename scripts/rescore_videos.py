@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Re-score stored video picks from the candidate archive (no YouTube API calls).
+
+Usage:
+  python scripts/rescore_videos.py [--dry-run] [--force] [--workers N] [--from-cache]
+"""
+import argparse
+import logging
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.candidates import archive_from_cache
+from src.database import get_db_connection
+from src.migrations import migrate
+from src.rescore import rescore_archive
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score video picks from archived candidates')
+    parser.add_argument('--dry-run', action='store_true', help='Report changed picks without updating the DB')
+    parser.add_argument('--force', action='store_true', help='Re-score even if the selector fingerprint is unchanged')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--from-cache', action='store_true',
+                        help='First archive candidates for songs that have none, using the YouTube response cache')
+    args = parser.parse_args()
+
+    if args.from_cache:
+        conn = get_db_connection()
+        migrate(conn)
+        archive_from_cache(conn)
+
+    result = rescore_archive(workers=args.workers, dry_run=args.dry_run, force=args.force)
+    for change in result.changes:
+        print(f"{change.artist} - {change.song_name}: {change.old_video_id or '(none)'} -> "
+              f"{change.video_id} score={change.score:.2f} '{change.video_title}' [{change.channel_title}]")
+    if not result.up_to_date:
+        action = 'would change' if args.dry_run else 'changed'
+        print(f'{len(result.changes)} of {result.scored} picks {action} (selector {result.fingerprint})')
+
+if __name__ == "__main__":
+    main()
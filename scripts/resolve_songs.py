@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Find duplicate songs and map each one to a canonical song.
+
+Usage:
+  python scripts/resolve_songs.py [--dry-run]
+
+Songs whose titles and lead artists match closely (see src/identity.py) are
+grouped; song_canonical maps every other member to the group's canonical song
+and members without a video take the group's. Video enrichment runs this
+automatically before looking anything up. --dry-run only prints the groups.
+"""
+import argparse
+import logging
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.database import get_db_connection
+from src.identity import resolve_song_identities
+from src.migrations import migrate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description='Map duplicate songs to canonical songs')
+    parser.add_argument('--dry-run', action='store_true', help='Print the duplicate groups without writing')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    migrate(conn)
+    groups = resolve_song_identities(conn, dry_run=args.dry_run)
+    if args.dry_run:
+        names = {row[0]: f'{row[2]} - {row[1]}' for row in conn.execute('SELECT id, song_name, artist FROM songs')}
+        for group in groups:
+            print(' <= '.join(names[song_id] for song_id in group.members))
+    else:
+        conn.commit()
+    conn.close()
+
+if __name__ == '__main__':
+    main()
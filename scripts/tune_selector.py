@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Search video selector weights against a labeled set of correct videos.
+
+Usage:
+  python scripts/tune_selector.py --labels labels.csv [--samples 5000] [--spread 0.5] [--seed 0]
+  python scripts/tune_selector.py --labels labels.csv --grid lyrics_penalty=-40,-30,-20 --grid live_penalty=-15,-10
+
+labels.csv has columns song_id,video_id or artist,song_name,video_id. Candidates
+come from the candidate archive (see scripts/rescore_videos.py).
+"""
+import argparse
+import logging
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import tuning
+from src.candidates import load_archived_songs
+from src.database import DB_PATH, get_readonly_connection
+from src.video_selector import WEIGHTS
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+def parse_grid(values):
+    grid = {}
+    for item in values or []:
+        name, _, options = item.partition('=')
+        if name not in tuning.TUNABLE:
+            sys.exit(f"Unknown weight '{name}'; choose from {', '.join(tuning.TUNABLE)}")
+        grid[name] = [float(v) for v in options.split(',')]
+    return grid
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune video selector weights')
+    parser.add_argument('--labels', required=True, help='CSV of correct picks')
+    parser.add_argument('--db', default=DB_PATH, help='Database with the candidate archive')
+    parser.add_argument('--samples', type=int, default=5000, help='Random configs to evaluate (default 5000)')
+    parser.add_argument('--spread', type=float, default=0.5, help='Random scale range around current weights (default 0.5)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--grid', action='append', metavar='NAME=V1,V2,...', help='Grid search values for a weight')
+    parser.add_argument('--top', type=int, default=5, help='Configs to show (default 5)')
+    args = parser.parse_args()
+
+    conn = get_readonly_connection(args.db)
+    labels = tuning.load_labels(args.labels, conn)
+    fs = tuning.build_feature_set(load_archived_songs(conn), labels)
+    conn.close()
+    logger.info(f'{len(fs.song_ids)} of {len(labels)} labeled songs have their correct video among archived candidates')
+    if not fs.song_ids:
+        sys.exit('Nothing to tune against')
+
+    base = tuning.weight_vector(WEIGHTS)
+    grid = parse_grid(args.grid)
+    configs = tuning.grid_configs(base, grid) if grid else tuning.random_configs(base, args.samples, args.spread, args.seed)
+
+    start = time.perf_counter()
+    accuracy = tuning.evaluate(fs, configs)
+    elapsed = time.perf_counter() - start
+    logger.info(f'Evaluated {len(configs)} configs over {len(fs.views)} candidates in {elapsed:.2f}s')
+
+    print(f'Current weights: top-1 accuracy {accuracy[0]:.3f}')
+    order = accuracy.argsort(kind='stable')[::-1][:args.top]
+    for rank, i in enumerate(order, 1):
+        print(f'#{rank}: accuracy {accuracy[i]:.3f}')
+    best = tuning.weights_dict(configs[order[0]])
+    print('Best weights:')
+    for name in tuning.TUNABLE:
+        marker = '' if best[name] == WEIGHTS[name] else f'  (was {WEIGHTS[name]})'
+        print(f"    '{name}': {best[name]:.6g},{marker}")
+
+if __name__ == "__main__":
+    main()
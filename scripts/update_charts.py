@@ -6,8 +6,11 @@ import os
 import argparse
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.database import get_playlist_from_db, add_playlist_to_db, create_tables_if_needed
+from src.database import add_playlist_to_db, create_tables_if_needed
+from src.metrics import write_run_report
+from src.queries import get_playlist
 from src.scraper import scrape_songs
+from src.backfill import MIN_CHART_SONGS, find_chart_gaps, most_recent_friday, run_backfill
 
 logging.basicConfig(
     level=logging.INFO,
@@ -34,43 +37,65 @@ def fetch_and_store_songs(date):
     logger.info(f'Converted date {date} to {date_str}.')
 
     # Check if the playlist is already in the database
-    playlist = get_playlist_from_db(date_str)
+    playlist = get_playlist(date_str)
     if playlist:
         logger.info(f'Playlist for date {date} containing {len(playlist)} songs fetched from the db.')
         return
     
     logger.info(f'Playlist for date {date} not found in the db. Performing web scrape.')
+    scrape_and_store_songs(date)
+
+def scrape_and_store_songs(date):
+    """
+    Scrape the chart for a given date and store it, replacing any existing copy.
+
+    Args:
+        date: datetime.date object representing the date to scrape
+    """
+    date_str = date.strftime("%Y%m%d")
     songs = scrape_songs(date)
     logger.info(f'Playlist for date {date} scraped from web returned {len(songs)} songs.')
 
     # Add the playlist to the database if we have enough songs
-    if len(songs) >= 40:
+    if len(songs) >= MIN_CHART_SONGS:
         add_playlist_to_db(date_str, songs)
     else:
         logger.warning(f'Not enough songs ({len(songs)}) found for {date_str}. Skipping DB update.')
 
+def parse_date(value):
+    """argparse type accepting yyyy-mm-dd or yyyymmdd."""
+    for fmt in ('%Y-%m-%d', '%Y%m%d'):
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f'invalid date {value!r}; expected yyyy-mm-dd or yyyymmdd')
+
 def main():
     """Main function to update the database with chart data."""
     parser = argparse.ArgumentParser(description='Update the song database with chart data.')
     parser.add_argument('--mode', choices=['latest', 'historical'], default='latest',
                         help='Mode to run in: latest (just the most recent chart) or historical (all historical charts)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Concurrent page downloads in historical mode (default 1 = sequential)')
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help='Maximum chart page requests per second when --workers > 1 (0 disables)')
+    parser.add_argument('--from', dest='from_date', type=parse_date,
+                        help='Historical mode: earliest chart date to consider (default 2000-01-01)')
+    parser.add_argument('--to', dest='to_date', type=parse_date,
+                        help='Historical mode: latest chart date to consider (default today)')
     args = parser.parse_args()
-    
+    try:
+        update_charts(args)
+    finally:
+        write_run_report('update_charts')
+
+def update_charts(args):
     # Ensure database tables exist
     create_tables_if_needed()
     
-    # Get today's date
-    today = datetime.date.today()
-
     # Find the most recent Friday
-    if today.weekday() == 4:  # Friday
-        # Today is Friday, use today
-        days_since_last_friday = 0
-    else:
-        # Find the most recent Friday
-        days_since_last_friday = (today.weekday() - 4) % 7
-
-    current_date = today - datetime.timedelta(days=days_since_last_friday)
+    current_date = most_recent_friday()
     
     if args.mode == 'latest':
         # Just process the most recent Friday
@@ -80,24 +105,23 @@ def main():
         except Exception as e:
             logger.error(f"Error updating chart data for {current_date}: {e}")
     else:
-        # Process all historical charts
+        # Process only the historical weeks that are missing or incomplete
         logger.info('Updating historical chart data')
-        
-        # Find the first Friday of the year 2000
-        start_year = 2000
-        year_start = datetime.date(start_year, 1, 1)
-        first_friday = year_start + datetime.timedelta(days=(4 - year_start.weekday() + 7) % 7)
-        
-        # Iterate over all Fridays from the most recent to the first of 2000
-        while current_date >= first_friday:
-            logger.info(f'Processing chart data for {current_date}')
+        dates = find_chart_gaps(args.from_date, args.to_date)
+        if not dates:
+            logger.info('All chart weeks in range are already stored. Nothing to do.')
+            return
+
+        if args.workers > 1:
+            run_backfill(dates, workers=args.workers, rate=args.rate)
+            return
+
+        for date in dates:
+            logger.info(f'Processing chart data for {date}')
             try:
-                fetch_and_store_songs(current_date)
+                scrape_and_store_songs(date)
             except Exception as e:
-                logger.error(f"Error processing chart data for {current_date}: {e}")
-                
-            # Move to the previous Friday
-            current_date -= datetime.timedelta(days=7)
+                logger.error(f"Error processing chart data for {date}: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
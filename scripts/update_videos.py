@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import argparse
+import dataclasses
 import logging
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src.metrics import write_run_report
 from src.youtube import update_video_ids
 
 logging.basicConfig(
@@ -19,8 +22,21 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Update video IDs for songs in the database."""
+    parser = argparse.ArgumentParser(description='Update YouTube video IDs for songs in the database')
+    parser.add_argument('--budget', type=int, default=None,
+                        help='Quota units to spend this run (default: 10000 per API key)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of concurrent YouTube lookups (default: 1)')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Maximum requests per second per API key (default: 5, 0 disables)')
+    args = parser.parse_args()
+
     logger.info("Starting YouTube video ID update process")
-    update_video_ids()
+    stats = None
+    try:
+        stats = update_video_ids(budget=args.budget, workers=args.workers, rate=args.rate)
+    finally:
+        write_run_report('update_videos', extra={'enrichment': dataclasses.asdict(stats) if stats else None})
     logger.info("YouTube video ID update process completed")
 
 if __name__ == "__main__":
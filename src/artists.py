@@ -0,0 +1,88 @@
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from src.credits import ambiguous_pieces, artist_key, split_credit, standalone_artists
+from src.sqlutil import chunks
+
+logger = logging.getLogger(__name__)
+
+# Individual artists behind each song's credit (see src/credits.py):
+#   artists       one row per artist, unique by artist_key(name)
+#   song_artists  (song_id, artist_id, position, role) for every credited artist
+# New songs are linked as they are ingested, splitting "&"/AND/X credits only
+# when every piece is already in the artists table; rebuild_song_artists
+# re-links every song using the artists seen performing alone anywhere in the
+# history.
+
+def _artist_ids(conn, names: Iterable[str]) -> dict:
+    """{artist_key: id} for ``names``, inserting the artists not seen before."""
+    wanted = {}
+    for name in names:
+        wanted.setdefault(artist_key(name), name)
+    conn.executemany('INSERT OR IGNORE INTO artists (name, name_key) VALUES (?, ?)',
+                     [(name, key) for key, name in wanted.items()])
+    ids = {}
+    for chunk in chunks(wanted):
+        ids.update(conn.execute(f"SELECT name_key, id FROM artists WHERE name_key IN ({','.join('?' * len(chunk))})",
+                                chunk).fetchall())
+    return ids
+
+def link_song_artists(conn, songs: Iterable[Tuple[int, str]], known=None):
+    """
+    Record the artists credited on ``songs`` ((song_id, artist credit) pairs) inside the caller's transaction.
+
+    The songs must not be linked yet: new songs, or all of them after the
+    tables are cleared.
+
+    ``known`` is the set of artist keys allowed to split an "&"/AND/X credit;
+    by default, the artists already in the table.
+    """
+    songs = list(songs)
+    if not songs:
+        return
+    if known is None:
+        pieces = ambiguous_pieces(credit for _, credit in songs)
+        known = set()
+        for chunk in chunks(pieces):
+            known.update(row[0] for row in conn.execute(
+                f"SELECT name_key FROM artists WHERE name_key IN ({','.join('?' * len(chunk))})", chunk))
+    credited = [(song_id, split_credit(credit, known)) for song_id, credit in songs]
+    ids = _artist_ids(conn, (name for _, artists in credited for name, _ in artists))
+    conn.executemany('INSERT INTO song_artists (song_id, artist_id, position, role) VALUES (?, ?, ?, ?)', [
+        (song_id, ids[artist_key(name)], position, role)
+        for song_id, artists in credited
+        for position, (name, role) in enumerate(artists, 1)
+    ])
+
+def rebuild_song_artists(conn):
+    """Re-split every credit and rebuild both tables (inside the caller's transaction)."""
+    songs = conn.execute('SELECT id, artist FROM songs').fetchall()
+    known = standalone_artists(credit for _, credit in songs)
+    conn.execute('DELETE FROM song_artists')
+    conn.execute('DELETE FROM artists')
+    link_song_artists(conn, [tuple(row) for row in songs], known)
+    count = conn.execute('SELECT COUNT(*) FROM artists').fetchone()[0]
+    logger.info(f'Linked {len(songs)} songs to {count} artists')
+
+def find_artist(conn, name: str) -> Optional[Tuple[int, str]]:
+    """(id, name) of the artist matching ``name`` regardless of case, spacing or accents."""
+    row = conn.execute('SELECT id, name FROM artists WHERE name_key = ?', (artist_key(name),)).fetchone()
+    return tuple(row) if row else None
+
+def song_artists(conn, song_id: int) -> List[Tuple[str, str]]:
+    """(name, role) of every artist credited on a song, in credit order."""
+    return [tuple(row) for row in conn.execute('''
+        SELECT a.name, sa.role FROM song_artists sa JOIN artists a ON a.id = sa.artist_id
+        WHERE sa.song_id = ? ORDER BY sa.position
+    ''', (song_id,))]
+
+def artist_songs(conn, name: str) -> List[Tuple[int, str, str, str]]:
+    """(song_id, song_name, full credit, role) for every song crediting the artist."""
+    return [tuple(row) for row in conn.execute('''
+        SELECT s.id, s.song_name, s.artist, sa.role
+        FROM artists a
+        JOIN song_artists sa ON sa.artist_id = a.id
+        JOIN songs s ON s.id = sa.song_id
+        WHERE a.name_key = ?
+        ORDER BY s.id
+    ''', (artist_key(name),))]
@@ -0,0 +1,196 @@
+import datetime
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from src.database import MIN_CHART_SONGS, add_playlists_to_db, close_db_connections, find_missing_chart_dates
+from src.ratelimit import TokenBucket
+from src.scraper import discard_chart_page, fetch_chart_page, parse_chart_page
+
+logger = logging.getLogger(__name__)
+
+# Earliest chart week the historical backfill covers
+FIRST_CHART_YEAR = 2000
+
+_DONE = object()
+
+def most_recent_friday(today=None):
+    """Return the latest chart Friday on or before ``today``."""
+    today = today or datetime.date.today()
+    return today - datetime.timedelta(days=(today.weekday() - 4) % 7)
+
+def chart_fridays(start, end):
+    """Return every Friday between ``start`` and ``end`` (inclusive), newest first."""
+    current = most_recent_friday(end)
+    fridays = []
+    while current >= start:
+        fridays.append(current)
+        current -= datetime.timedelta(days=7)
+    return fridays
+
+def find_chart_gaps(start=None, end=None, min_songs=MIN_CHART_SONGS):
+    """
+    Return the chart weeks between ``start`` and ``end`` that need scraping.
+
+    Stored chart dates are read in a single query and diffed against the
+    Friday calendar; both missing weeks and stored-but-incomplete weeks (fewer
+    than ``min_songs`` rows) are returned, newest first.
+    """
+    start = start or datetime.date(FIRST_CHART_YEAR, 1, 1)
+    end = end or datetime.date.today()
+    fridays = chart_fridays(start, end)
+    missing, incomplete = find_missing_chart_dates(fridays, min_songs=min_songs)
+    if incomplete:
+        logger.warning(
+            f"{len(incomplete)} incomplete chart(s) will be re-scraped: "
+            f"{', '.join(d.strftime('%Y%m%d') for d in incomplete)}"
+        )
+    logger.info(f'{len(missing)} missing and {len(incomplete)} incomplete chart weeks between {start} and {end}')
+    gaps = set(missing) | set(incomplete)
+    return [d for d in fridays if d in gaps]
+
+@dataclass
+class BackfillStats:
+    fetched: int = 0
+    failed: int = 0
+    written: int = 0
+    skipped: int = 0
+
+def run_backfill(dates, workers=8, rate=2.0, queue_size=None, write_batch=25):
+    """
+    Scrape and store many chart weeks concurrently.
+
+    Pages are downloaded by a pool of ``workers`` threads sharing a politeness
+    limit of ``rate`` requests per second. Downloaded pages flow through a
+    parse stage and then a single writer thread, so SQLite only ever sees one
+    writer and a slow page never holds up the rest of the batch. A page that
+    parses short is handed back to the download pool to be fetched again,
+    bypassing the cache, so the parse stage never waits on the network.
+
+    Args:
+        dates: iterable of datetime.date objects to fetch
+        workers: number of concurrent page downloads
+        rate: maximum requests per second across all workers (0 disables)
+        queue_size: bound for the inter-stage queues (defaults to 2 * workers)
+        write_batch: maximum charts the writer commits in one transaction
+
+    Returns:
+        BackfillStats: counts of fetched, failed, written and skipped charts
+    """
+    dates = list(dates)
+    workers = max(1, workers)
+    queue_size = queue_size or workers * 2
+    limiter = TokenBucket(rate)
+    stats = BackfillStats()
+    stats_lock = threading.Lock()
+    parse_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+
+    # Weeks not yet handed to the writer (or given up on); a short page goes
+    # back to the download pool, so the pool can't be closed before this is 0
+    pending = {'weeks': len(dates)}
+    settled = threading.Condition()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill-fetch')
+
+    def count(field):
+        with stats_lock:
+            setattr(stats, field, getattr(stats, field) + 1)
+
+    def settle():
+        with settled:
+            pending['weeks'] -= 1
+            settled.notify_all()
+
+    def fetch(date, refresh=False):
+        limiter.acquire()
+        try:
+            html = fetch_chart_page(date, refresh=refresh)
+        except Exception as e:
+            logger.error(f"Error fetching chart data for {date}: {e}")
+            html = None
+        if html is None:
+            count('failed')
+            settle()
+            return
+        if not refresh:
+            count('fetched')
+        parse_queue.put((date, html, refresh))
+
+    def parse_stage():
+        while True:
+            item = parse_queue.get()
+            if item is _DONE:
+                break
+            date, html, refreshed = item
+            try:
+                songs = parse_chart_page(html, date)
+                if len(songs) < MIN_CHART_SONGS:
+                    if not refreshed:
+                        # Possibly a truncated page pinned in the cache: download it again
+                        logger.warning(f"Only {len(songs)} songs parsed for {date}; downloading the page again")
+                        pool.submit(fetch, date, True)
+                        continue
+                    discard_chart_page(date)
+            except Exception as e:
+                logger.error(f"Error parsing chart data for {date}: {e}")
+                count('failed')
+                settle()
+                continue
+            write_queue.put((date, songs))
+            settle()
+
+    def write_stage():
+        batch = []
+
+        def flush():
+            if batch:
+                written = add_playlists_to_db(batch, batch_size=len(batch))
+                with stats_lock:
+                    stats.written += written
+                    stats.failed += len(batch) - written
+                batch.clear()
+
+        try:
+            while True:
+                item = write_queue.get()
+                if item is _DONE:
+                    flush()
+                    break
+                date, songs = item
+                date_str = date.strftime("%Y%m%d")
+                if len(songs) < MIN_CHART_SONGS:
+                    logger.warning(f'Not enough songs ({len(songs)}) found for {date_str}. Skipping DB update.')
+                    count('skipped')
+                else:
+                    batch.append((date_str, songs))
+                # Commit in batches, but never sit on charts while the queue is idle
+                if len(batch) >= write_batch or write_queue.empty():
+                    flush()
+        finally:
+            # This thread's connection is not closed by atexit; checkpoint the WAL here
+            close_db_connections()
+
+    logger.info(f'Backfilling {len(dates)} chart weeks with {workers} workers at {rate} req/s')
+    parser = threading.Thread(target=parse_stage, name='backfill-parse', daemon=True)
+    writer = threading.Thread(target=write_stage, name='backfill-write', daemon=True)
+    parser.start()
+    writer.start()
+    try:
+        for date in dates:
+            pool.submit(fetch, date)
+        with settled:
+            settled.wait_for(lambda: pending['weeks'] == 0)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        parse_queue.put(_DONE)
+        parser.join()
+        write_queue.put(_DONE)
+        writer.join()
+
+    logger.info(
+        f'Backfill finished: {stats.fetched} fetched, {stats.written} written, '
+        f'{stats.skipped} skipped, {stats.failed} failed'
+    )
+    return stats
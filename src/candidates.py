@@ -0,0 +1,99 @@
+import datetime
+import logging
+from typing import List, Optional
+
+from src.video_selector import VideoCandidate, build_candidates_from_api
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_COLUMNS = ('video_id', 'title', 'channel_title', 'view_count', 'duration_seconds', 'category_id', 'published_at')
+
+def get_meta(conn, key: str) -> Optional[str]:
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+def set_meta(conn, key: str, value: str):
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+def store_candidates(conn, song_id: int, candidates: List[VideoCandidate], fetched_at=None):
+    """
+    Archive every candidate considered for a song, in search result order.
+
+    Video metadata is upserted into candidate_videos (shared across songs) and
+    the song's previous candidate list is replaced.
+    """
+    fetched_at = fetched_at or datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+    conn.executemany('''
+        INSERT INTO candidate_videos
+            (video_id, title, channel_title, view_count, duration_seconds, category_id, published_at, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(video_id) DO UPDATE SET
+            title = excluded.title,
+            channel_title = excluded.channel_title,
+            view_count = excluded.view_count,
+            duration_seconds = excluded.duration_seconds,
+            category_id = excluded.category_id,
+            published_at = excluded.published_at,
+            fetched_at = excluded.fetched_at
+    ''', [(c.video_id, c.title, c.channel_title, c.view_count or 0, c.duration_seconds, c.category_id,
+           c.published_at, fetched_at) for c in candidates])
+    conn.execute('DELETE FROM song_candidates WHERE song_id = ?', (song_id,))
+    conn.executemany(
+        'INSERT INTO song_candidates (song_id, rank, video_id) VALUES (?, ?, ?)',
+        [(song_id, rank, c.video_id) for rank, c in enumerate(candidates)]
+    )
+
+def load_archived_songs(conn):
+    """
+    Return (song_id, artist, song_name, video_id, candidate_rows) for every song with archived candidates.
+
+    candidate_rows are tuples in CANDIDATE_COLUMNS order, in search result order.
+    """
+    rows = conn.execute(f'''
+        SELECT s.id, s.artist, s.song_name, s.video_id, {', '.join('v.' + c for c in CANDIDATE_COLUMNS)}
+        FROM song_candidates sc
+        JOIN songs s ON s.id = sc.song_id
+        JOIN candidate_videos v ON v.video_id = sc.video_id
+        ORDER BY sc.song_id, sc.rank
+    ''')
+    songs = []
+    current = None
+    for row in rows:
+        if current is None or current[0] != row[0]:
+            current = (row[0], row[1], row[2], row[3] or '', [])
+            songs.append(current)
+        current[4].append(tuple(row[4:]))
+    return songs
+
+def candidates_from_rows(rows) -> List[VideoCandidate]:
+    return [VideoCandidate(*row) for row in rows]
+
+def archive_from_cache(conn, cache=None) -> int:
+    """
+    Seed the archive from the YouTube response cache for songs that have none yet.
+
+    Only songs whose search results and video details are both still cached
+    are archived; no API calls are made. Returns the number of songs archived.
+    """
+    from src.youtube import SEARCH_PAGE_SIZE
+    from src.youtube_cache import get_cache
+
+    cache = cache or get_cache()
+    songs = conn.execute('''
+        SELECT id, artist, song_name FROM songs
+        WHERE id NOT IN (SELECT DISTINCT song_id FROM song_candidates)
+    ''').fetchall()
+    archived = 0
+    for song_id, artist, song in songs:
+        items = cache.get_search(f"{song} {artist}".strip(), SEARCH_PAGE_SIZE)
+        if not items:
+            continue
+        video_ids = [i['id']['videoId'] for i in items]
+        videos_map = cache.get_videos(video_ids)
+        if len(videos_map) < len(set(video_ids)):
+            continue
+        store_candidates(conn, song_id, build_candidates_from_api(items, videos_map))
+        archived += 1
+    conn.commit()
+    logger.info(f'Archived candidates for {archived} songs from the YouTube cache')
+    return archived
@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Exact class strings used by the Official Charts markup
+ENTRY_CLASS = 'description block'
+SONG_NAME_CLASS = 'chart-name font-bold inline-block'
+ARTIST_CLASS = 'chart-artist text-lg inline-block'
+LW_CLASS = 'movement px-2 py-1 rounded-md inline-block mr-1 sm:mr-2'
+PEAK_CLASS = 'peak px-2 py-1 rounded-md inline-block mr-1 sm:mr-2'
+WEEKS_CLASS = 'weeks px-2 py-1 rounded-md inline-block mr-1 sm:mr-2'
+
+FIELD_TAGS = {
+    ('a', SONG_NAME_CLASS): 'name',
+    ('a', ARTIST_CLASS): 'artist',
+    ('li', LW_CLASS): 'lw',
+    ('li', PEAK_CLASS): 'peak',
+    ('li', WEEKS_CLASS): 'weeks',
+}
+
+# Text inside these elements is not part of get_text() in BeautifulSoup either
+SKIP_TAGS = {'script', 'style', 'template'}
+
+@dataclass
+class RawChartEntry:
+    """Stripped text pulled out of one ``div.description block`` chart entry.
+
+    Fields are None when the corresponding tag was not present. ``name_spans``
+    holds the text of every ``span`` inside the song name link, in document
+    order (the first one carries the NEW / RE marker when there are several).
+    """
+    name: Optional[str] = None
+    name_spans: List[str] = field(default_factory=list)
+    artist: Optional[str] = None
+    lw: Optional[str] = None
+    peak: Optional[str] = None
+    weeks: Optional[str] = None
+
+def _class_attr(attrs) -> str:
+    for key, value in attrs:
+        if key == 'class':
+            return ' '.join((value or '').split())
+    return ''
+
+class ChartPageParser(HTMLParser):
+    """Single-pass tokenizer that collects chart entries without building a DOM.
+
+    Text is accumulated the way BeautifulSoup's ``get_text(strip=True)`` sees
+    it: each text node between two tags is stripped and non-empty nodes are
+    concatenated. Only the first matching tag of each kind is used per entry,
+    mirroring ``div.find(...)``.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.entries: List[RawChartEntry] = []
+        self._entry: Optional[RawChartEntry] = None
+        self._div_depth = 0
+        self._field: Optional[str] = None
+        self._field_tag: Optional[str] = None
+        self._field_depth = 0
+        self._field_text: List[str] = []
+        self._spans: List[List[str]] = []
+        self._open_spans: List[int] = []
+        self._skip = 0
+        self._pending: List[str] = []
+
+    def _flush(self):
+        if not self._pending:
+            return
+        text = ''.join(self._pending).strip()
+        self._pending = []
+        if not text or self._field is None:
+            return
+        self._field_text.append(text)
+        for index in self._open_spans:
+            self._spans[index].append(text)
+
+    def _finish_field(self):
+        text = ''.join(self._field_text)
+        if self._field == 'name':
+            self._entry.name = text
+            self._entry.name_spans = [''.join(parts) for parts in self._spans]
+        else:
+            setattr(self._entry, self._field, text)
+        self._field = None
+        self._field_tag = None
+        self._field_text = []
+        self._spans = []
+        self._open_spans = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in SKIP_TAGS:
+            self._skip += 1
+            return
+        if self._entry is None:
+            if tag == 'div' and _class_attr(attrs) == ENTRY_CLASS:
+                self._entry = RawChartEntry()
+                self._div_depth = 1
+            return
+
+        if tag == 'div':
+            self._div_depth += 1
+
+        if self._field is not None:
+            if tag == self._field_tag:
+                self._field_depth += 1
+            if self._field == 'name' and tag == 'span':
+                self._open_spans.append(len(self._spans))
+                self._spans.append([])
+            return
+
+        name = FIELD_TAGS.get((tag, _class_attr(attrs))) if tag in ('a', 'li') else None
+        if name is not None and getattr(self._entry, name) is None:
+            self._field = name
+            self._field_tag = tag
+            self._field_depth = 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+        if self._entry is None:
+            return
+
+        if self._field is not None:
+            if tag == self._field_tag:
+                self._field_depth -= 1
+                if self._field_depth == 0:
+                    self._finish_field()
+            elif tag == 'span' and self._open_spans:
+                self._open_spans.pop()
+
+        if tag == 'div':
+            self._div_depth -= 1
+            if self._div_depth == 0:
+                if self._field is not None:
+                    self._finish_field()
+                self.entries.append(self._entry)
+                self._entry = None
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+        if self._entry is not None:
+            if self._field is not None:
+                self._finish_field()
+            self.entries.append(self._entry)
+            self._entry = None
+
+def parse_chart_entries(html: str) -> List[RawChartEntry]:
+    """Return the raw chart entries on a page in chart order."""
+    parser = ChartPageParser()
+    parser.feed(html)
+    parser.close()
+    return parser.entries
@@ -0,0 +1,275 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.sqlutil import chunks
+
+logger = logging.getLogger(__name__)
+
+# Materialized chart-run summaries, kept in step with playlist_songs:
+#   song_stats       one row per charted song (weeks, peak, first/last date, runs)
+#   artist_stats     one row per artist credit, aggregated from song_stats
+#   song_sparklines  each song's position every chart week from its first to
+#                    its last appearance, comma-separated, 0 for weeks off chart
+# A run is a stretch of consecutive stored charts. Writers call
+# update_chart_stats with the songs they touched; only those songs (plus, when
+# an older chart is inserted into the middle of the history, the songs whose
+# span covers it) are recomputed.
+
+@dataclass
+class SongStats:
+    song_id: int
+    weeks: int
+    peak: int
+    weeks_at_peak: int
+    first_date: str
+    last_date: str
+    runs: int
+
+def compute_song_stats(conn, song_ids: Optional[Iterable[int]] = None):
+    """
+    Compute stats and sparklines from the raw chart rows.
+
+    Returns ({song_id: SongStats}, {song_id: sparkline}) for ``song_ids``
+    (default: every charted song). Songs without chart rows are absent.
+    """
+    ordinal = {row[0]: i for i, row in enumerate(conn.execute('SELECT date FROM playlists ORDER BY date'))}
+    query = '''
+        SELECT ps.song_id, p.date, ps.position
+        FROM playlist_songs ps JOIN playlists p ON p.id = ps.playlist_id
+        {where}
+        ORDER BY ps.song_id, p.date
+    '''
+    if song_ids is None:
+        batches = [conn.execute(query.format(where=''))]
+    else:
+        batches = (conn.execute(query.format(where=f"WHERE ps.song_id IN ({','.join('?' * len(chunk))})"), chunk)
+                   for chunk in chunks(sorted(set(song_ids))))
+
+    stats, sparklines = {}, {}
+
+    def finish(song_id, history):
+        first, last = ordinal[history[0][0]], ordinal[history[-1][0]]
+        line = [0] * (last - first + 1)
+        runs, previous = 0, None
+        for date, position in history:
+            i = ordinal[date]
+            line[i - first] = position
+            if previous is None or i != previous + 1:
+                runs += 1
+            previous = i
+        peak = min(position for _, position in history)
+        stats[song_id] = SongStats(song_id, len(history), peak, sum(1 for _, p in history if p == peak),
+                                   history[0][0], history[-1][0], runs)
+        sparklines[song_id] = ','.join(map(str, line))
+
+    for rows in batches:
+        current, history = None, []
+        for song_id, date, position in rows:
+            if song_id != current:
+                if history:
+                    finish(current, history)
+                current, history = song_id, []
+            history.append((date, position))
+        if history:
+            finish(current, history)
+    return stats, sparklines
+
+def _write_song_stats(conn, stats: Dict[int, SongStats], sparklines: Dict[int, str]):
+    conn.executemany('''
+        INSERT OR REPLACE INTO song_stats (song_id, weeks, peak, weeks_at_peak, first_date, last_date, runs)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(s.song_id, s.weeks, s.peak, s.weeks_at_peak, s.first_date, s.last_date, s.runs) for s in stats.values()])
+    conn.executemany('INSERT OR REPLACE INTO song_sparklines (song_id, positions) VALUES (?, ?)',
+                     sparklines.items())
+
+ARTIST_AGGREGATE = '''
+    INSERT OR REPLACE INTO artist_stats (artist, songs, weeks, peak, number_ones, first_date, last_date)
+    SELECT s.artist, COUNT(*), SUM(st.weeks), MIN(st.peak), SUM(st.peak = 1), MIN(st.first_date), MAX(st.last_date)
+    FROM songs s JOIN song_stats st ON st.song_id = s.id
+    {where}
+    GROUP BY s.artist
+'''
+
+def _refresh_artists(conn, song_ids):
+    artists = set()
+    for chunk in chunks(sorted(song_ids)):
+        marks = ','.join('?' * len(chunk))
+        artists.update(row[0] for row in conn.execute(f'SELECT artist FROM songs WHERE id IN ({marks})', chunk))
+    for chunk in chunks(sorted(artists)):
+        marks = ','.join('?' * len(chunk))
+        conn.execute(f'DELETE FROM artist_stats WHERE artist IN ({marks})', chunk)
+        conn.execute(ARTIST_AGGREGATE.format(where=f'WHERE s.artist IN ({marks})'), chunk)
+
+def refresh_songs(conn, song_ids: Iterable[int]):
+    """Recompute the stats of ``song_ids`` and of their artists from the raw rows (inside the caller's transaction)."""
+    song_ids = set(song_ids)
+    if not song_ids:
+        return
+    stats, sparklines = compute_song_stats(conn, song_ids)
+    gone = [song_id for song_id in song_ids if song_id not in stats]
+    for chunk in chunks(gone):
+        marks = ','.join('?' * len(chunk))
+        conn.execute(f'DELETE FROM song_stats WHERE song_id IN ({marks})', chunk)
+        conn.execute(f'DELETE FROM song_sparklines WHERE song_id IN ({marks})', chunk)
+    _write_song_stats(conn, stats, sparklines)
+    _refresh_artists(conn, song_ids)
+
+def _load_song_stats(conn, song_ids):
+    stats, sparklines = {}, {}
+    for chunk in chunks(sorted(song_ids)):
+        marks = ','.join('?' * len(chunk))
+        for row in conn.execute(f'''
+            SELECT st.song_id, st.weeks, st.peak, st.weeks_at_peak, st.first_date, st.last_date, st.runs, sp.positions
+            FROM song_stats st JOIN song_sparklines sp ON sp.song_id = st.song_id
+            WHERE st.song_id IN ({marks})
+        ''', chunk):
+            stats[row[0]] = SongStats(*list(row)[:7])
+            sparklines[row[0]] = row[7]
+    return stats, sparklines
+
+def _append_charts(conn, dates: List[str], song_ids: Set[int]):
+    """
+    Extend the stored summaries with charts newer than every other chart.
+
+    Each song's new appearances are appended to its stored stats and
+    sparkline; songs whose stored history already reaches these dates (the
+    chart was replaced) are recomputed from the raw rows instead.
+    """
+    ordinal = {date: i for i, date in enumerate(dates)}
+    marks = ','.join('?' * len(dates))
+    appearances = {}
+    for song_id, date, position in conn.execute(f'''
+        SELECT ps.song_id, p.date, ps.position
+        FROM playlists p JOIN playlist_songs ps ON ps.playlist_id = p.id
+        WHERE p.date IN ({marks})
+        ORDER BY p.date
+    ''', dates):
+        appearances.setdefault(song_id, []).append((date, position))
+
+    stored, stored_lines = _load_song_stats(conn, song_ids)
+    stats, sparklines, recompute = {}, {}, set()
+    older = {}
+    for song_id in song_ids:
+        old = stored.get(song_id)
+        history = appearances.get(song_id)
+        if old is not None and old.last_date >= dates[0]:
+            recompute.add(song_id)
+            continue
+        if not history:
+            continue
+        start = ordinal[history[0][0]]
+        line = [0] * (ordinal[history[-1][0]] - start + 1)
+        runs, previous = 0, None
+        for date, position in history:
+            i = ordinal[date]
+            line[i - start] = position
+            if previous is None or i != previous + 1:
+                runs += 1
+            previous = i
+        peak = min(position for _, position in history)
+        at_peak = sum(1 for _, p in history if p == peak)
+        text = ','.join(map(str, line))
+        if old is None:
+            stats[song_id] = SongStats(song_id, len(history), peak, at_peak, history[0][0], history[-1][0], runs)
+            sparklines[song_id] = text
+            continue
+        # Off-chart weeks between the song's last stored appearance and its first new one
+        if old.last_date not in older:
+            older[old.last_date] = conn.execute('SELECT COUNT(*) FROM playlists WHERE date > ? AND date < ?',
+                                                (old.last_date, dates[0])).fetchone()[0]
+        gap = older[old.last_date] + start
+        if peak < old.peak:
+            old_peak, old_at_peak = peak, at_peak
+        else:
+            old_peak, old_at_peak = old.peak, old.weeks_at_peak + (at_peak if peak == old.peak else 0)
+        stats[song_id] = SongStats(song_id, old.weeks + len(history), old_peak, old_at_peak, old.first_date,
+                                   history[-1][0], old.runs + runs - (1 if gap == 0 else 0))
+        sparklines[song_id] = stored_lines[song_id] + ',0' * gap + ',' + text
+
+    _write_song_stats(conn, stats, sparklines)
+    refresh_songs(conn, recompute)
+    _refresh_artists(conn, stats.keys())
+
+def update_chart_stats(conn, dates: Iterable[str], song_ids: Iterable[int]):
+    """
+    Bring the summaries up to date after charts for ``dates`` were written.
+
+    ``song_ids`` are the songs on those charts plus any removed from them.
+    When every date is newer than the rest of the history (the weekly case)
+    the stored summaries are extended in place. A chart inserted before later
+    ones also shifts the sparklines and runs of songs whose span covers it,
+    so those songs are recomputed from the raw rows.
+    """
+    dates = sorted(set(dates))
+    affected = set(song_ids)
+    if not dates:
+        return
+    marks = ','.join('?' * len(dates))
+    later = conn.execute(f'SELECT MAX(date) FROM playlists WHERE date NOT IN ({marks})', dates).fetchone()[0]
+    if later is None or later < dates[0]:
+        _append_charts(conn, dates, affected)
+        return
+    affected.update(row[0] for row in conn.execute(
+        'SELECT song_id FROM song_stats WHERE first_date < ? AND last_date > ?', (dates[-1], dates[0])))
+    refresh_songs(conn, affected)
+
+def rebuild_chart_stats(conn):
+    """Recompute every summary table from playlist_songs (inside the caller's transaction)."""
+    stats, sparklines = compute_song_stats(conn)
+    conn.execute('DELETE FROM song_stats')
+    conn.execute('DELETE FROM song_sparklines')
+    conn.execute('DELETE FROM artist_stats')
+    _write_song_stats(conn, stats, sparklines)
+    conn.execute(ARTIST_AGGREGATE.format(where=''))
+    logger.info(f'Rebuilt chart stats for {len(stats)} songs')
+
+def check_chart_stats(conn) -> List[str]:
+    """Compare the stored summaries with the raw chart rows; returns one line per mismatch."""
+    stats, sparklines = compute_song_stats(conn)
+    problems = []
+    stored = {row[0]: SongStats(*row) for row in conn.execute(
+        'SELECT song_id, weeks, peak, weeks_at_peak, first_date, last_date, runs FROM song_stats')}
+    for song_id in sorted(set(stats) | set(stored)):
+        if stats.get(song_id) != stored.get(song_id):
+            problems.append(f'song_stats {song_id}: stored {stored.get(song_id)}, expected {stats.get(song_id)}')
+    stored_lines = {row[0]: row[1] for row in conn.execute('SELECT song_id, positions FROM song_sparklines')}
+    for song_id in sorted(set(sparklines) | set(stored_lines)):
+        if sparklines.get(song_id) != stored_lines.get(song_id):
+            problems.append(f'song_sparklines {song_id}: stored and recomputed positions differ')
+
+    expected_artists = {}
+    for song_id, artist in conn.execute('SELECT id, artist FROM songs'):
+        s = stats.get(song_id)
+        if s is None:
+            continue
+        a = expected_artists.get(artist)
+        if a is None:
+            expected_artists[artist] = [1, s.weeks, s.peak, int(s.peak == 1), s.first_date, s.last_date]
+        else:
+            expected_artists[artist] = [a[0] + 1, a[1] + s.weeks, min(a[2], s.peak), a[3] + (s.peak == 1),
+                                        min(a[4], s.first_date), max(a[5], s.last_date)]
+    stored_artists = {row[0]: list(row)[1:] for row in conn.execute(
+        'SELECT artist, songs, weeks, peak, number_ones, first_date, last_date FROM artist_stats')}
+    for artist in sorted(set(expected_artists) | set(stored_artists)):
+        if expected_artists.get(artist) != stored_artists.get(artist):
+            problems.append(f'artist_stats {artist!r}: stored {stored_artists.get(artist)}, '
+                            f'expected {expected_artists.get(artist)}')
+    return problems
+
+def get_song_stats(conn, song_id: int) -> Optional[SongStats]:
+    row = conn.execute('SELECT song_id, weeks, peak, weeks_at_peak, first_date, last_date, runs '
+                       'FROM song_stats WHERE song_id = ?', (song_id,)).fetchone()
+    return SongStats(*row) if row else None
+
+def get_artist_stats(conn, artist: str) -> Optional[dict]:
+    row = conn.execute('SELECT artist, songs, weeks, peak, number_ones, first_date, last_date '
+                       'FROM artist_stats WHERE artist = ?', (artist,)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(('artist', 'songs', 'weeks', 'peak', 'number_ones', 'first_date', 'last_date'), row))
+
+def get_sparkline(conn, song_id: int) -> Optional[List[int]]:
+    """Chart position for every week from the song's first to last appearance (0 = off chart)."""
+    row = conn.execute('SELECT positions FROM song_sparklines WHERE song_id = ?', (song_id,)).fetchone()
+    return [int(p) for p in row[0].split(',')] if row else None
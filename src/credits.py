@@ -0,0 +1,118 @@
+import functools
+import re
+import unicodedata
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Chart artist credits ("CALVIN HARRIS FT DUA LIPA", "DAVE & CENTRAL CEE",
+# "MUMFORD & SONS") split into individual artists. FT/FEAT/FEATURING, "/",
+# VS, WITH and PTS/PRESENTS always separate artists; everyone after a
+# featuring keyword is a featured artist. "&", AND, X, "+" and "," are also
+# part of act names, so a segment is only split on them when every piece is
+# a known artist on its own; without a known set everything is split. A
+# separator with nothing on one side ("LIL NAS X", "LIBERTY X") is part of the
+# name, and "/" is not split inside a known name that contains it ("AC/DC").
+
+MAIN = 'main'
+FEATURED = 'featured'
+
+_FEATURING = {'ft', 'feat', 'featuring', 'with', 'pts', 'presents'}
+_SEPARATOR_RE = re.compile(r'\s*(/|\b(?:ft|feat|featuring|vs|with|pts|presents)\b\.?)\s*', re.IGNORECASE)
+_SLASH = '/'
+# AND / X only separate two names: "LIL NAS X & JACK HARLOW" splits on "&" alone
+_AMBIGUOUS_RE = re.compile(r'\s*(?:&|\+|,)\s*|(?<=\w)\s+(?:and|x)\s+(?=\w)', re.IGNORECASE)
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+
+@functools.lru_cache(maxsize=65536)
+def artist_key(name: str) -> str:
+    """Comparison key for an artist name: diacritics, case, spaces and punctuation removed."""
+    name = name.lower()
+    if not name.isascii():
+        name = ''.join(c for c in unicodedata.normalize('NFKD', name) if not unicodedata.combining(c))
+    return _NON_ALNUM_RE.sub('', name)
+
+# Acts whose own name contains "/". Other names joined by "/" are recognized
+# when they are in the caller's known set (an artists row named "AC/DC").
+SLASH_NAMES = frozenset(artist_key(name) for name in ('AC/DC', 'HUNTR/X'))
+
+def _groups(credit: str) -> List[List[Tuple[str, str]]]:
+    """(text, role) parts between the unambiguous separators, grouped by the "/" between them."""
+    parts = _SEPARATOR_RE.split(credit.strip())
+    groups, role = [[]], MAIN
+    for i, part in enumerate(parts):
+        if i % 2:
+            if part != _SLASH:
+                groups.append([])
+            if part.lower().rstrip('.') in _FEATURING:
+                role = FEATURED
+        elif part.strip():
+            groups[-1].append((part.strip(), role))
+    return groups
+
+def _slash_name(texts: List[str], start: int, known: Set[str]) -> int:
+    """End of the longest run of "/"-separated parts from ``start`` that forms a known name."""
+    for end in range(len(texts), start + 1, -1):
+        key = artist_key(_SLASH.join(texts[start:end]))
+        if key in SLASH_NAMES or key in known:
+            return end
+    return start + 1
+
+def _segments(credit: str, known: Optional[Set[str]] = None) -> List[Tuple[str, str]]:
+    """(text, role) segments between the unambiguous separators; "/" inside a known name is kept."""
+    segments = []
+    for group in _groups(credit):
+        texts, start = [text for text, _ in group], 0
+        while start < len(texts):
+            end = _slash_name(texts, start, known or frozenset())
+            segments.append((_SLASH.join(texts[start:end]), group[start][1]))
+            start = end
+    return segments
+
+def _pieces(segment: str) -> List[str]:
+    pieces = [p.strip() for p in _AMBIGUOUS_RE.split(segment)]
+    # A separator with nothing on one side belongs to the name ("FOO &", "A & & B")
+    return pieces if all(pieces) else [segment]
+
+def split_credit(credit: str, known: Optional[Set[str]] = None) -> List[Tuple[str, str]]:
+    """
+    Artists named in ``credit`` as (name, role) pairs in credit order, without duplicates.
+
+    ``known`` holds artist_key()s of artists known to perform alone; a
+    segment like "MUMFORD & SONS" stays whole unless every piece is known,
+    and "/" is not split inside a known name.
+    """
+    artists, seen = [], set()
+    for segment, role in _segments(credit, known):
+        pieces = _pieces(segment)
+        if known is not None and len(pieces) > 1 and not all(artist_key(p) in known for p in pieces):
+            pieces = [segment]
+        for name in pieces:
+            key = artist_key(name)
+            if key and key not in seen:
+                seen.add(key)
+                artists.append((name, role))
+    return artists
+
+def standalone_artists(credits: Iterable[str]) -> Set[str]:
+    """Keys of the segments that appear without any ambiguous separator: artists seen performing alone."""
+    known = set()
+    for credit in credits:
+        for segment, _ in _segments(credit):
+            if len(_pieces(segment)) == 1:
+                known.add(artist_key(segment))
+    known.discard('')
+    return known
+
+def ambiguous_pieces(credits: Iterable[str]) -> Set[str]:
+    """
+    Keys of every piece an ambiguous separator could split off, and of every
+    name a run of "/"-separated parts could form, for looking up which are known.
+    """
+    keys = set()
+    for credit in credits:
+        keys.update(artist_key(p) for segment, _ in _segments(credit) for p in _pieces(segment))
+        for group in _groups(credit):
+            texts = [text for text, _ in group]
+            keys.update(artist_key(_SLASH.join(texts[start:end]))
+                        for start in range(len(texts)) for end in range(start + 2, len(texts) + 1))
+    keys.discard('')
+    return keys
@@ -1,17 +1,97 @@
+import atexit
 import logging
 import sqlite3
 import json
+import threading
 from pathlib import Path
 import os
 
+from src.artists import link_song_artists
+from src.chart_stats import update_chart_stats
+from src.metrics import count, timed
+from src.migrations import migrate
+from src.sqlutil import chunks
+
 logger = logging.getLogger(__name__)
 
+# Charts with fewer entries than this are treated as incomplete scrapes
+MIN_CHART_SONGS = 40
+
+# Database location; override with TOPTASTIC_DB_PATH or set_db_path()
+DB_PATH = os.environ.get('TOPTASTIC_DB_PATH', 'songs.db')
+
+# Connection tuning
+BUSY_TIMEOUT = 30               # seconds to wait on a locked database
+CACHE_SIZE_KIB = 64 * 1024      # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024   # memory-mapped I/O for read-only connections
+
+_local = threading.local()
+
+def _is_open(conn):
+    try:
+        conn.in_transaction
+        return True
+    except sqlite3.ProgrammingError:
+        return False
+
+def set_db_path(path):
+    """Point the module at a different database file (closes this thread's connections)."""
+    global DB_PATH
+    close_db_connections()
+    DB_PATH = str(path)
+
 def get_db_connection():
-    """Create a connection to the SQLite database."""
-    conn = sqlite3.connect('songs.db')
+    """
+    Return this thread's shared connection to the SQLite database.
+
+    The connection is opened on first use and reused by every helper running
+    on the same thread. It runs in WAL mode with synchronous=NORMAL, a larger
+    page cache and a busy timeout. Closing it is allowed; the next call simply
+    opens a fresh one.
+    """
+    connections = _local.__dict__.setdefault('connections', {})
+    path = os.path.abspath(DB_PATH)
+    conn = connections.get(path)
+    if conn is not None and _is_open(conn):
+        return conn
+
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    connections[path] = conn
     return conn
 
+def get_readonly_connection(path=None):
+    """
+    Open a read-only, memory-mapped connection for exporters and analysis.
+
+    The caller owns the returned connection and should close it when done.
+    """
+    uri = Path(path or DB_PATH).resolve().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA query_only = ON')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    return conn
+
+def close_db_connections():
+    """Close this thread's shared connections, folding the WAL back into the main file."""
+    connections = _local.__dict__.get('connections', {})
+    for conn in connections.values():
+        if _is_open(conn):
+            try:
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            except sqlite3.Error as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
+            conn.close()
+    connections.clear()
+
+atexit.register(close_db_connections)
+
 def create_tables_if_needed():
     """Create the database tables if they don't already exist."""
     conn = get_db_connection()
@@ -48,133 +128,235 @@ def create_tables_if_needed():
         )
     ''')
     conn.commit()
-    conn.close()
-    logger.info("Database tables created or verified")
+    version = migrate(conn)
+    logger.info(f"Database tables created or verified (schema version {version})")
 
-def get_playlist_from_db(date):
-    """Retrieve a playlist from the database for a specific date."""
+def get_playlist_sizes():
+    """Return {date: number of chart rows} for every stored playlist, in one query."""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Try to find the playlist for the given date
-    cursor.execute('''
-        SELECT 
-            s.id,
-            s.song_name, 
-            s.artist, 
-            s.video_id,
-            ps.position, 
-            ps.lw, 
-            ps.peak, 
-            ps.weeks, 
-            ps.is_new, 
-            ps.is_reentry
-        FROM 
-            playlists p 
-            JOIN playlist_songs ps ON p.id = ps.playlist_id 
-            JOIN songs s ON ps.song_id = s.id
-        WHERE 
-            p.date = ?
-        ORDER BY
-            ps.position
-    ''', (date,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    if not rows:
-        logger.info(f"No playlist found for date {date}")
-        return None
-
-    # Convert rows to list of dictionaries
-    playlist = []
-    for row in rows:
-        song = dict(row)
-        playlist.append({
-            'id': song['id'],
-            'position': song['position'],
-            'song_name': song['song_name'],
-            'artist': song['artist'],
-            'lw': song['lw'],
-            'peak': song['peak'],
-            'weeks': song['weeks'],
-            'is_new': bool(song['is_new']), 
-            'is_reentry': bool(song['is_reentry']),
-            'video_id': song['video_id']
-        })
-    
-    logger.info(f"Retrieved playlist for {date} with {len(playlist)} songs")
-    return playlist
+    rows = conn.execute('''
+        SELECT p.date, COUNT(ps.playlist_id) AS songs
+        FROM playlists p
+        LEFT JOIN playlist_songs ps ON ps.playlist_id = p.id
+        GROUP BY p.id
+    ''').fetchall()
+    return {row['date']: row['songs'] for row in rows}
+
+def find_missing_chart_dates(dates, min_songs=MIN_CHART_SONGS):
+    """
+    Diff a chart calendar against the database.
+
+    Args:
+        dates: iterable of datetime.date chart dates to check
+        min_songs: charts with fewer stored rows than this count as incomplete
+
+    Returns:
+        tuple: (missing, incomplete) lists of datetime.date, in input order.
+        ``incomplete`` dates are stored but too short and should be re-scraped.
+    """
+    sizes = get_playlist_sizes()
+    missing = []
+    incomplete = []
+    for date in dates:
+        size = sizes.get(date.strftime("%Y%m%d"))
+        if size is None:
+            missing.append(date)
+        elif size < min_songs:
+            incomplete.append(date)
+    return missing, incomplete
+
+def _lookup_song_ids(cursor, keys, song_ids):
+    """Add the ids of the stored songs among ``keys`` ((song_name, artist) pairs) to ``song_ids``."""
+    for chunk in chunks(keys):
+        # CROSS JOIN keeps the VALUES list outermost: one (artist, song_name) index probe per key
+        cursor.execute(
+            f"SELECT s.id, s.song_name, s.artist FROM (VALUES {','.join(['(?, ?)'] * len(chunk))}) v "
+            f"CROSS JOIN songs s ON s.artist = v.column1 AND s.song_name = v.column2",
+            [value for song_name, artist in chunk for value in (artist, song_name)]
+        )
+        for row in cursor.fetchall():
+            song_ids[(row['song_name'], row['artist'])] = row['id']
 
+def _resolve_song_ids(cursor, songs, song_ids, complete=False):
+    """
+    Fill ``song_ids`` ((song_name, artist) -> id) for every song in ``songs``.
+
+    Songs not yet in the table are inserted with a single executemany, their
+    AUTOINCREMENT ids read back through the (artist, song_name) index, and
+    linked to their credited artists. When ``complete`` is True the map
+    already holds every existing song, so only the inserts are needed.
+    """
+    missing = []
+    seen = set()
+    for song in songs:
+        key = (song['song_name'], song['artist'])
+        if key not in song_ids and key not in seen:
+            seen.add(key)
+            missing.append(key)
+    if not missing:
+        return
+
+    if not complete:
+        _lookup_song_ids(cursor, missing, song_ids)
+        missing = [key for key in missing if key not in song_ids]
+        if not missing:
+            return
+
+    cursor.executemany('INSERT INTO songs (song_name, artist) VALUES (?, ?)', missing)
+    _lookup_song_ids(cursor, missing, song_ids)
+    count('db.songs_inserted', len(missing))
+    link_song_artists(cursor, [(song_ids[key], key[1]) for key in missing])
+
+def _store_playlist(cursor, date, songs, song_ids, playlist_ids=None, complete=False):
+    """
+    Write one playlist (replacing any existing one) inside the caller's transaction.
+
+    Returns the ids of the songs on the new chart and of any it replaced, for update_chart_stats.
+    """
+    if playlist_ids is None:
+        cursor.execute('SELECT id FROM playlists WHERE date = ?', (date,))
+        existing_playlist = cursor.fetchone()
+        playlist_id = existing_playlist['id'] if existing_playlist else None
+    else:
+        playlist_id = playlist_ids.get(date)
+
+    if playlist_id is not None:
+        logger.info(f"Playlist for {date} already exists, updating")
+        replaced = {row[0] for row in cursor.execute('SELECT song_id FROM playlist_songs WHERE playlist_id = ?',
+                                                     (playlist_id,))}
+        # Delete existing playlist songs
+        cursor.execute('DELETE FROM playlist_songs WHERE playlist_id = ?', (playlist_id,))
+    else:
+        replaced = set()
+        # Create new playlist
+        cursor.execute('INSERT INTO playlists (date) VALUES (?)', (date,))
+        playlist_id = cursor.lastrowid
+        if playlist_ids is not None:
+            playlist_ids[date] = playlist_id
+        logger.info(f"Created new playlist for {date} with ID {playlist_id}")
+
+    _resolve_song_ids(cursor, songs, song_ids, complete=complete)
+
+    # Add songs to playlist
+    cursor.executemany('''
+        INSERT INTO playlist_songs
+        (playlist_id, song_id, position, lw, peak, weeks, is_new, is_reentry)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(
+        playlist_id,
+        song_ids[(song['song_name'], song['artist'])],
+        song['position'],
+        song['lw'],
+        song['peak'],
+        song['weeks'],
+        1 if song['is_new'] else 0,
+        1 if song['is_reentry'] else 0
+    ) for song in songs])
+    return replaced | {song_ids[(song['song_name'], song['artist'])] for song in songs}
+
+@timed('db.add_playlist')
 def add_playlist_to_db(date, songs):
     """Add a playlist to the database for a specific date."""
     if not songs:
         logger.warning(f"No songs provided for date {date}, skipping database update")
         return
-    
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+
     try:
-        # Check if playlist already exists
-        cursor.execute('SELECT id FROM playlists WHERE date = ?', (date,))
-        existing_playlist = cursor.fetchone()
-        
-        if existing_playlist:
-            logger.info(f"Playlist for {date} already exists, updating")
-            playlist_id = existing_playlist['id']
-            # Delete existing playlist songs
-            cursor.execute('DELETE FROM playlist_songs WHERE playlist_id = ?', (playlist_id,))
-        else:
-            # Create new playlist
-            cursor.execute('INSERT INTO playlists (date) VALUES (?)', (date,))
-            playlist_id = cursor.lastrowid
-            logger.info(f"Created new playlist for {date} with ID {playlist_id}")
-        
-        # Add songs to playlist
-        for song in songs:
-            # Check if song exists
-            cursor.execute(
-                'SELECT id FROM songs WHERE song_name = ? AND artist = ?', 
-                (song['song_name'], song['artist'])
-            )
-            existing_song = cursor.fetchone()
-            
-            if existing_song:
-                song_id = existing_song['id']
-            else:
-                # Create new song
-                cursor.execute(
-                    'INSERT INTO songs (song_name, artist) VALUES (?, ?)',
-                    (song['song_name'], song['artist'])
-                )
-                song_id = cursor.lastrowid
-            
-            # Add song to playlist
-            cursor.execute('''
-                INSERT INTO playlist_songs 
-                (playlist_id, song_id, position, lw, peak, weeks, is_new, is_reentry)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                playlist_id, 
-                song_id,
-                song['position'],
-                song['lw'],
-                song['peak'],
-                song['weeks'],
-                1 if song['is_new'] else 0,
-                1 if song['is_reentry'] else 0
-            ))
-        
+        touched = _store_playlist(cursor, date, songs, {})
+        update_chart_stats(cursor, [date], touched)
         conn.commit()
+        count('db.charts_written')
+        count('db.chart_rows_written', len(songs))
         logger.info(f"Successfully added {len(songs)} songs to playlist for {date}")
-    
+
     except Exception as e:
         conn.rollback()
+        # Swallowed here, so the timer never sees it
+        count('db.add_playlist.errors')
         logger.error(f"Error adding playlist for date {date}: {e}")
-    
-    finally:
-        conn.close()
+
+@timed('db.add_playlists')
+def add_playlists_to_db(charts, batch_size=100):
+    """
+    Bulk-add many playlists to the database.
+
+    Song ids are resolved against a (song_name, artist) -> id map loaded once
+    up front, rows are written with executemany, and work is committed every
+    ``batch_size`` charts instead of once per chart. Chart stats are brought
+    up to date once per batch. Each chart is written inside its own SAVEPOINT,
+    so a chart that fails is rolled back, logged and skipped without losing
+    the rest of the batch.
+
+    Args:
+        charts: iterable of (date, songs) pairs; date is a yyyymmdd string
+        batch_size: number of charts per transaction
+
+    Returns:
+        int: number of playlists written
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    written = 0
+    pending = []
+    pending_rows = 0
+    touched = set()
+
+    try:
+        song_ids = {(row['song_name'], row['artist']): row['id']
+                    for row in cursor.execute('SELECT id, song_name, artist FROM songs')}
+        playlist_ids = {row['date']: row['id'] for row in cursor.execute('SELECT id, date FROM playlists')}
+
+        for date, songs in charts:
+            if not songs:
+                logger.warning(f"No songs provided for date {date}, skipping database update")
+                continue
+            if not conn.in_transaction:
+                cursor.execute('BEGIN')
+            # Keys added to the id maps by a chart that fails refer to rolled-back rows
+            known_songs, known_playlists = len(song_ids), len(playlist_ids)
+            cursor.execute('SAVEPOINT chart')
+            try:
+                touched_chart = _store_playlist(cursor, date, songs, song_ids, playlist_ids, complete=True)
+            except Exception as e:
+                cursor.execute('ROLLBACK TO chart')
+                cursor.execute('RELEASE chart')
+                for key in list(song_ids)[known_songs:]:
+                    del song_ids[key]
+                for key in list(playlist_ids)[known_playlists:]:
+                    del playlist_ids[key]
+                count('db.add_playlists.errors')
+                logger.error(f"Error adding playlist for date {date}, skipping it: {e}")
+                continue
+            cursor.execute('RELEASE chart')
+            touched |= touched_chart
+            pending.append(date)
+            pending_rows += len(songs)
+            if len(pending) >= batch_size:
+                update_chart_stats(cursor, pending, touched)
+                conn.commit()
+                count('db.charts_written', len(pending))
+                count('db.chart_rows_written', pending_rows)
+                written += len(pending)
+                logger.info(f"Committed {len(pending)} playlists ({written} total)")
+                pending = []
+                pending_rows = 0
+                touched = set()
+
+        update_chart_stats(cursor, pending, touched)
+        conn.commit()
+        count('db.charts_written', len(pending))
+        count('db.chart_rows_written', pending_rows)
+        written += len(pending)
+        logger.info(f"Successfully added {written} playlists")
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error bulk adding playlists (batch starting {pending[0] if pending else 'n/a'}): {e}")
+
+    return written
 
 def debug_dump_songs(songs):
     """Log a prettified JSON representation of the songs."""
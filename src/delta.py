@@ -0,0 +1,275 @@
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.database import get_readonly_connection
+from src.migrations import get_schema_version
+from src.snapshot import snapshot_format
+
+logger = logging.getLogger(__name__)
+
+# Incremental publishing. Each publish that changes the database gets a new
+# version and a changeset (deltas/<version>.json.gz) holding the row-level
+# upserts and deletes since the previous version. Versions are linked by a
+# logical state hash of the table contents, so a client verifies the state it
+# starts from and the state it ends at for every changeset it applies.
+# manifest.json lists the changesets still offered; clients older than the
+# start of the chain download the full songs.db instead.
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_NAME = 'songs.db'
+DELTA_DIR = 'deltas'
+
+# Start a new chain (clients re-download songs.db) after this many changesets
+FULL_SNAPSHOT_EVERY = 26
+
+# ... or when a changeset would be larger than this fraction of the database
+MAX_DELTA_RATIO = 0.5
+
+class DeltaError(Exception):
+    """A changeset does not fit the database it is being applied to."""
+
+def published_tables(conn) -> List[str]:
+    """Ordinary tables in the database, skipping SQLite internals and virtual-table shadow tables."""
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' ORDER BY name").fetchall()
+    virtual = [name for name, sql in rows if sql and sql.upper().startswith('CREATE VIRTUAL TABLE')]
+    return [name for name, sql in rows
+            if not name.startswith('sqlite_') and name not in virtual
+            and not any(name.startswith(f'{v}_') for v in virtual)]
+
+def table_columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+def table_key(conn, table: str) -> List[str]:
+    """Columns identifying a row: the primary key, else the first unique index, else every column."""
+    info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+    pk = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    if pk:
+        return pk
+    for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        if index[2]:
+            return [row[2] for row in conn.execute(f'PRAGMA index_info("{index[1]}")')]
+    return [row[1] for row in info]
+
+def schema_signature(conn) -> str:
+    """Hash of the schema / snapshot format version and table definitions; changesets only apply across equal signatures."""
+    digest = hashlib.sha256(f'{get_schema_version(conn)}:{snapshot_format(conn)}'.encode())
+    for table in published_tables(conn):
+        digest.update(f'\n{table}:{",".join(table_columns(conn, table))}'.encode())
+    return digest.hexdigest()[:16]
+
+def _quoted(columns):
+    return ', '.join(f'"{c}"' for c in columns)
+
+def state_hash(conn, chunk_size: int = 5000) -> str:
+    """
+    Logical hash of every published table's rows.
+
+    Rows are hashed as JSON in key order, so two databases with the same
+    contents hash the same regardless of page layout or rowids.
+    """
+    digest = hashlib.sha256()
+    for table in published_tables(conn):
+        columns = table_columns(conn, table)
+        digest.update(f'{table}\n'.encode())
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f'SELECT {_quoted(columns)} FROM "{table}" ORDER BY {_quoted(table_key(conn, table))}')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            # One dumps call per chunk; dropping the outer brackets keeps the hash independent of chunking
+            digest.update(json.dumps(rows, separators=(',', ':'))[1:-1].encode() + b',')
+    return digest.hexdigest()
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def diff_databases(new_path, old_path) -> Dict[str, dict]:
+    """
+    Row-level differences from ``old_path`` to ``new_path`` for every published table.
+
+    Returns {table: {columns, key, upsert, delete}} for tables that changed;
+    ``upsert`` holds full new rows and ``delete`` the keys of removed rows.
+    """
+    conn = get_readonly_connection(new_path)
+    conn.row_factory = None
+    try:
+        conn.execute('ATTACH DATABASE ? AS old', (Path(old_path).resolve().as_uri() + '?mode=ro',))
+        tables = {}
+        for table in published_tables(conn):
+            columns = table_columns(conn, table)
+            key = table_key(conn, table)
+            cols, keys = _quoted(columns), _quoted(key)
+            upsert = conn.execute(f'SELECT {cols} FROM main."{table}" EXCEPT '
+                                  f'SELECT {cols} FROM old."{table}" ORDER BY {keys}').fetchall()
+            delete = conn.execute(f'SELECT {keys} FROM old."{table}" EXCEPT '
+                                  f'SELECT {keys} FROM main."{table}" ORDER BY {keys}').fetchall()
+            if upsert or delete:
+                tables[table] = {'columns': columns, 'key': key, 'upsert': [list(r) for r in upsert],
+                                 'delete': [list(r) for r in delete]}
+        return tables
+    finally:
+        conn.close()
+
+def write_changeset(path, changeset: dict):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(changeset, f, separators=(',', ':'))
+
+def read_changeset(path) -> dict:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def apply_changeset(conn, changeset: dict, verify: bool = True):
+    """
+    Apply a changeset to a writable connection in one transaction.
+
+    With ``verify`` the database must hash to the changeset's base state
+    before, and to its target state after; otherwise nothing is changed and
+    DeltaError is raised.
+    """
+    if changeset.get('format') != FORMAT_VERSION:
+        raise DeltaError(f"Unsupported changeset format {changeset.get('format')}")
+    conn.commit()
+    try:
+        conn.execute('BEGIN')
+        if verify and state_hash(conn) != changeset['base_state']:
+            raise DeltaError(f"Database does not match the base of changeset {changeset['version']}")
+        for table, change in changeset['tables'].items():
+            key = change['key']
+            where = ' AND '.join(f'"{c}" IS ?' for c in key)
+            conn.executemany(f'DELETE FROM "{table}" WHERE {where}', change['delete'])
+            placeholders = ', '.join('?' for _ in change['columns'])
+            conn.executemany(f'INSERT OR REPLACE INTO "{table}" ({_quoted(change["columns"])}) VALUES ({placeholders})',
+                             change['upsert'])
+        if verify and state_hash(conn) != changeset['state']:
+            raise DeltaError(f"Changeset {changeset['version']} did not produce its recorded state")
+        conn.commit()
+    except (DeltaError, sqlite3.Error):
+        conn.rollback()
+        raise
+
+def load_manifest(path) -> Optional[dict]:
+    path = Path(path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+def updates_for(manifest: dict, version: int) -> Optional[List[dict]]:
+    """
+    Changesets a client at ``version`` should apply, in order.
+
+    Returns an empty list when the client is current and None when it is
+    outside the chain and has to download the full snapshot.
+    """
+    if version == manifest['version']:
+        return []
+    if version < manifest['chain_start'] or version > manifest['version']:
+        return None
+    return [d for d in manifest['deltas'] if d['version'] > version]
+
+def _delta_file(version: int) -> str:
+    return f'{DELTA_DIR}/{version:06d}.json.gz'
+
+def publish(db_path, out_dir, previous_db=None, previous: Optional[dict] = None,
+            full_every: int = FULL_SNAPSHOT_EVERY, now=None) -> dict:
+    """
+    Publish ``db_path`` as the next version and write manifest.json into ``out_dir``.
+
+    ``previous_db`` and ``previous`` are the last published snapshot and its
+    manifest. When they are present, consistent and share the schema, the
+    differences become a new changeset; otherwise (or every ``full_every``
+    changesets, or when the changeset would be too large) a new chain starts
+    from this snapshot. Changeset files listed by ``previous`` are expected to
+    be in ``out_dir`` already.
+    """
+    out_dir = Path(out_dir)
+    created = (now or datetime.datetime.utcnow()).strftime('%Y-%m-%dT%H:%M:%SZ')
+    conn = get_readonly_connection(db_path)
+    try:
+        state, schema = state_hash(conn), schema_signature(conn)
+    finally:
+        conn.close()
+    snapshot = {'file': SNAPSHOT_NAME, 'sha256': file_sha256(db_path), 'size_bytes': Path(db_path).stat().st_size}
+
+    reason = None
+    if previous is None or previous_db is None or not Path(previous_db).exists():
+        reason = 'no previous snapshot'
+    elif previous.get('format') != FORMAT_VERSION:
+        reason = 'manifest format changed'
+    elif previous['schema'] != schema:
+        reason = 'schema changed'
+    else:
+        old = get_readonly_connection(previous_db)
+        try:
+            if state_hash(old) != previous['state']:
+                reason = 'previous snapshot does not match its manifest'
+        finally:
+            old.close()
+
+    if reason is None and previous['state'] == state:
+        logger.info(f"Database unchanged since version {previous['version']}; republishing manifest")
+        manifest = dict(previous, snapshot=snapshot)
+        _write_manifest(out_dir, manifest)
+        return manifest
+
+    version = previous['version'] + 1 if previous else 1
+    deltas = []
+    if reason is None and len(previous['deltas']) >= full_every:
+        reason = f'chain reached {full_every} changesets'
+    if reason is None:
+        changeset = {
+            'format': FORMAT_VERSION, 'version': version, 'base_version': previous['version'],
+            'base_state': previous['state'], 'state': state, 'created': created,
+            'tables': diff_databases(db_path, previous_db),
+        }
+        path = out_dir / _delta_file(version)
+        write_changeset(path, changeset)
+        size = path.stat().st_size
+        if size > MAX_DELTA_RATIO * snapshot['size_bytes']:
+            path.unlink()
+            reason = f'changeset of {size} bytes is too large'
+        else:
+            rows = sum(len(t['upsert']) + len(t['delete']) for t in changeset['tables'].values())
+            logger.info(f"Wrote changeset {version} ({rows} row changes, {size} bytes) to {path}")
+            deltas = previous['deltas'] + [{
+                'version': version, 'base_version': previous['version'], 'base_state': previous['state'],
+                'state': state, 'file': _delta_file(version), 'sha256': file_sha256(path), 'size_bytes': size,
+                'created': created,
+            }]
+    if reason is not None:
+        logger.info(f'Starting a new changeset chain at version {version}: {reason}')
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'state': state,
+        'schema': schema,
+        'created': created,
+        'chain_start': deltas[0]['base_version'] if deltas else version,
+        'snapshot': snapshot,
+        'deltas': deltas,
+    }
+    _write_manifest(out_dir, manifest)
+    return manifest
+
+def _write_manifest(out_dir: Path, manifest: dict):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + '\n', encoding='utf-8')
+    # Changesets from an abandoned chain are no longer offered
+    listed = {d['file'] for d in manifest['deltas']}
+    for path in (out_dir / DELTA_DIR).glob('*.json.gz'):
+        if f'{DELTA_DIR}/{path.name}' not in listed:
+            path.unlink()
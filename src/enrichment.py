@@ -0,0 +1,260 @@
+import datetime
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.candidates import store_candidates
+from src.database import close_db_connections, get_db_connection
+from src.identity import resolve_song_identities, share_videos
+from src.migrations import migrate
+from src.youtube import (
+    DAILY_QUOTA_PER_KEY, SEARCH_COST, SEARCH_PAGE_SIZE, VIDEO_DETAILS_BATCH, VIDEOS_LIST_COST,
+    LOOKUP_FAILED, get_api_keys, keys_exhausted, lookup_best_videos, quota, set_key_rate,
+)
+from src.youtube_cache import get_cache
+
+logger = logging.getLogger(__name__)
+
+# Failed lookups are retried after 1, 2, 4, ... days, capped at RETRY_MAX
+RETRY_BASE = datetime.timedelta(days=1)
+RETRY_MAX = datetime.timedelta(days=90)
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Songs looked up together; with 15 candidates each, their details fill a few
+# full 50-id videos.list calls instead of one partial call per song
+LOOKUP_GROUP_SIZE = 10
+
+_DONE = object()
+
+@dataclass
+class EnrichmentTask:
+    song_id: int
+    song_name: str
+    artist: str
+    last_chart: Optional[str]
+    position: Optional[int]
+    attempts: int = 0
+
+@dataclass
+class EnrichmentStats:
+    updated: int = 0
+    failed: int = 0
+    deferred: int = 0
+    unresolved: int = 0
+    quota_used: int = 0
+
+def _timestamp(when):
+    return when.strftime(TIMESTAMP_FORMAT)
+
+def load_enrichment_queue(conn, now=None) -> List[EnrichmentTask]:
+    """
+    Return songs that need a video, most valuable first.
+
+    Songs are ordered by their most recent chart date (newest first) and their
+    position on that chart. Songs whose last lookup failed are only included
+    once their retry time has passed. Duplicates mapped in song_canonical are
+    left out; they share their canonical song's video.
+    """
+    now = now or datetime.datetime.utcnow()
+    rows = conn.execute('''
+        SELECT
+            s.id,
+            s.song_name,
+            s.artist,
+            MAX(p.date) AS last_chart,
+            ps.position,
+            COALESCE(r.attempts, 0) AS attempts
+        FROM songs s
+        LEFT JOIN playlist_songs ps ON ps.song_id = s.id
+        LEFT JOIN playlists p ON p.id = ps.playlist_id
+        LEFT JOIN video_lookup_retries r ON r.song_id = s.id
+        WHERE (s.video_id IS NULL OR s.video_id = '')
+          AND (r.next_attempt IS NULL OR r.next_attempt <= ?)
+          AND s.id NOT IN (SELECT song_id FROM song_canonical)
+        GROUP BY s.id
+        ORDER BY last_chart IS NULL, last_chart DESC, ps.position, s.id
+    ''', (_timestamp(now),)).fetchall()
+    return [EnrichmentTask(row['id'], row['song_name'], row['artist'], row['last_chart'],
+                           row['position'], row['attempts']) for row in rows]
+
+def estimate_cost(artist: str, song: str) -> int:
+    """Estimate the quota units a lookup will cost, taking the response cache into account."""
+    cache = get_cache()
+    items = cache.get_search(f"{song} {artist}".strip(), SEARCH_PAGE_SIZE)
+    if items is None:
+        return SEARCH_COST + VIDEOS_LIST_COST
+    video_ids = [i['id']['videoId'] for i in items]
+    missing = len(video_ids) - len(cache.get_videos(video_ids))
+    return -(-missing // VIDEO_DETAILS_BATCH) * VIDEOS_LIST_COST
+
+def retry_delay(attempts: int) -> datetime.timedelta:
+    """Backoff before the next lookup after ``attempts`` consecutive failures."""
+    exponent = min(max(attempts - 1, 0), 16)
+    return min(RETRY_BASE * (2 ** exponent), RETRY_MAX)
+
+def record_success(conn, song_id, meta):
+    conn.execute(
+        'UPDATE songs SET video_id = ?, video_title = ?, channel_title = ?, video_confidence = ? WHERE id = ?',
+        (meta['video_id'], meta.get('video_title'), meta.get('channel_title'), meta.get('video_confidence'), song_id)
+    )
+    conn.execute('DELETE FROM video_lookup_retries WHERE song_id = ?', (song_id,))
+    if meta.get('candidates'):
+        store_candidates(conn, song_id, meta['candidates'])
+    share_videos(conn, [song_id])
+
+def record_failure(conn, song_id, attempts, error=None, now=None):
+    """Blank the video and queue the song for another attempt with exponential backoff."""
+    now = now or datetime.datetime.utcnow()
+    attempts += 1
+    conn.execute('UPDATE songs SET video_id = ? WHERE id = ?', ('', song_id))
+    conn.execute('''
+        INSERT OR REPLACE INTO video_lookup_retries (song_id, attempts, next_attempt, last_error)
+        VALUES (?, ?, ?, ?)
+    ''', (song_id, attempts, _timestamp(now + retry_delay(attempts)), error))
+
+def run_enrichment(budget=None, workers=1, rate=None, write_batch=25, group_size=LOOKUP_GROUP_SIZE):
+    """
+    Look up videos for songs that need one, within a quota budget.
+
+    API lookups run on a pool of ``workers`` threads, with every API key
+    limited to ``rate`` requests per second. Results are handed to a single
+    writer thread that commits them in batches, so throughput is bounded by
+    quota rather than by round-trip latency. Each lookup reserves its
+    estimated cost up front, so concurrent lookups never overshoot the budget.
+    Songs are looked up in groups of ``group_size`` so their video details
+    share full 50-id ``videos.list`` calls.
+
+    Args:
+        budget: quota units this run may spend (defaults to the daily quota of
+            every configured API key)
+        workers: number of concurrent lookups
+        rate: requests per second per API key (defaults to youtube.KEY_RATE)
+        write_batch: maximum results the writer commits in one transaction
+        group_size: songs per lookup task
+
+    Returns:
+        EnrichmentStats
+    """
+    conn = get_db_connection()
+    migrate(conn)
+    # Duplicate songs reuse one lookup (and any video already found) per canonical song
+    resolve_song_identities(conn)
+    conn.commit()
+    if budget is None:
+        budget = DAILY_QUOTA_PER_KEY * len(get_api_keys())
+    if rate is not None:
+        set_key_rate(rate)
+    workers = max(1, workers)
+    max_in_flight = workers * 2
+
+    tasks = load_enrichment_queue(conn)
+    logger.info(f'Updating video metadata for {len(tasks)} songs with {workers} workers (budget {budget} quota units)')
+
+    stats = EnrichmentStats()
+    start_used = quota.used
+    scheduler = threading.Condition()
+    in_flight = {'count': 0, 'reserved': 0}
+    write_queue = queue.Queue()
+
+    def remaining():
+        return budget - (quota.used - start_used) - in_flight['reserved']
+
+    def lookup(group, cost):
+        try:
+            try:
+                results = lookup_best_videos([(task.artist, task.song_name) for task in group])
+            except Exception as e:
+                logger.error(f"Error updating video metadata for {len(group)} songs: {e}")
+                return
+            # Songs cut short by quota exhaustion or an API error come back
+            # as LOOKUP_FAILED and are left for the next run
+            for task, meta in zip(group, results):
+                write_queue.put((task, meta))
+        finally:
+            with scheduler:
+                in_flight['count'] -= 1
+                in_flight['reserved'] -= cost
+                scheduler.notify_all()
+
+    def write_stage():
+        conn = get_db_connection()
+        pending = 0
+        while True:
+            item = write_queue.get()
+            if item is _DONE:
+                break
+            task, meta = item
+            try:
+                if meta is LOOKUP_FAILED:
+                    # An API error or quota, not a verdict on the song: no backoff
+                    stats.unresolved += 1
+                elif meta and meta.get('video_id'):
+                    record_success(conn, task.song_id, meta)
+                    stats.updated += 1
+                    logger.info(f"Updated video metadata for '{task.song_name}' by '{task.artist}' -> {meta['video_id']}")
+                else:
+                    record_failure(conn, task.song_id, task.attempts, 'no suitable video')
+                    stats.failed += 1
+                    logger.info(f"No suitable video found for '{task.song_name}' by '{task.artist}'")
+                pending += 1
+            except Exception as e:
+                logger.error(f"Error storing video metadata for '{task.song_name}' by '{task.artist}': {e}")
+            # Commit in batches, but never sit on results while the queue is idle
+            if pending and (pending >= write_batch or write_queue.empty()):
+                conn.commit()
+                pending = 0
+        conn.commit()
+        close_db_connections()
+
+    writer = threading.Thread(target=write_stage, name='enrichment-write', daemon=True)
+    writer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='enrichment') as pool:
+            group, group_cost = [], 0
+
+            def submit():
+                nonlocal group, group_cost
+                if group:
+                    with scheduler:
+                        in_flight['count'] += 1
+                    pool.submit(lookup, group, group_cost)
+                group, group_cost = [], 0
+
+            for task in tasks:
+                if keys_exhausted():
+                    logger.warning('All API keys exhausted; stopping enrichment')
+                    break
+                cost = estimate_cost(task.artist, task.song_name)
+                with scheduler:
+                    # Wait for a free slot, and for in-flight lookups to settle
+                    # before concluding that a song does not fit the budget
+                    while in_flight['count'] >= max_in_flight or (in_flight['count'] and cost > remaining()):
+                        scheduler.wait()
+                    if cost > remaining():
+                        # Cached lookups further down the queue may still fit
+                        stats.deferred += 1
+                        continue
+                    in_flight['reserved'] += cost
+                group.append(task)
+                group_cost += cost
+                if len(group) >= group_size:
+                    submit()
+            submit()
+    finally:
+        write_queue.put(_DONE)
+        writer.join()
+
+    stats.quota_used = quota.used - start_used
+    logger.info(f'{stats.updated} videos updated successfully, {stats.failed} queued for retry')
+    if stats.deferred:
+        logger.info(f'{stats.deferred} songs deferred to a later run to stay within the quota budget')
+    if stats.unresolved:
+        logger.info(f'{stats.unresolved} songs left for a later run after API errors or quota exhaustion')
+    logger.info(f'{stats.quota_used} quota units used')
+    remaining_songs = conn.execute('SELECT count(*) FROM songs WHERE video_id IS NULL').fetchone()[0]
+    logger.info(f'{remaining_songs} songs without video IDs remaining')
+    return stats
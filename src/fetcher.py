@@ -0,0 +1,159 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.metrics import count, timed
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.environ.get('TOPTASTIC_CACHE_DIR', '.cache')) / 'charts'
+REQUEST_TIMEOUT = 30  # seconds
+POOL_SIZE = 32
+USER_AGENT = 'toptastic-bot (+https://github.com/mjdavy/toptastic-bot)'
+
+# Charts are final once the following week's chart is out; anything older than
+# this is served straight from the cache without touching the network.
+IMMUTABLE_AFTER_DAYS = 14
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return the process-wide pooled HTTP session (keep-alive, retries)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                          allowed_methods=frozenset(['GET']))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+        return _session
+
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+class ChartCache:
+    """Content-addressed on-disk store for chart pages.
+
+    Page bodies live under ``objects/`` named by their sha256, so identical
+    pages are stored once. A small JSON index entry per (chart id, date) points
+    at the body and keeps the validators needed for conditional GETs.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root is not None else CACHE_DIR
+
+    def _index_path(self, chart_id, date_str):
+        return self.root / 'index' / str(chart_id) / f'{date_str}.json'
+
+    def _object_path(self, digest):
+        return self.root / 'objects' / digest[:2] / f'{digest}.html'
+
+    def get(self, chart_id, date_str):
+        """Return ``(entry, body)`` for a cached page, or ``(None, None)``."""
+        index_path = self._index_path(chart_id, date_str)
+        try:
+            entry = json.loads(index_path.read_text(encoding='utf-8'))
+            body = self._object_path(entry['sha256']).read_bytes().decode('utf-8')
+        except (OSError, ValueError, KeyError):
+            return None, None
+        return entry, body
+
+    def put(self, chart_id, date_str, url, body, etag=None, last_modified=None):
+        data = body.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not object_path.exists():
+            _atomic_write(object_path, data)
+        entry = {
+            'url': url,
+            'sha256': digest,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_utc': datetime.datetime.utcnow().isoformat() + 'Z',
+        }
+        _atomic_write(self._index_path(chart_id, date_str), json.dumps(entry, indent=2).encode('utf-8'))
+        return entry
+
+    def discard(self, chart_id, date_str):
+        """Forget the page cached for (chart id, date); its body object may be shared and is kept."""
+        self._index_path(chart_id, date_str).unlink(missing_ok=True)
+
+def is_immutable(date, today=None):
+    """True if the chart for ``date`` is old enough that it can no longer change."""
+    today = today or datetime.date.today()
+    return (today - date).days > IMMUTABLE_AFTER_DAYS
+
+@timed('chart.fetch')
+def fetch_chart_html(url, chart_id, date, cache=None, refresh=False):
+    """
+    Fetch a chart page through the shared session and on-disk cache.
+
+    Historical pages already in the cache are returned without any network
+    traffic. Recent pages are revalidated with ETag / Last-Modified and only
+    re-downloaded when the server reports a change.
+
+    Args:
+        url: page URL
+        chart_id: Official Charts chart id (part of the cache key)
+        date: datetime.date of the chart (part of the cache key)
+        cache: ChartCache to use (defaults to one rooted at CACHE_DIR)
+        refresh: ignore any cached copy and download the page unconditionally
+
+    Returns:
+        str: Page HTML, or None if the page could not be retrieved
+    """
+    cache = cache or ChartCache()
+    date_str = date.strftime("%Y%m%d")
+    entry, cached_body = (None, None) if refresh else cache.get(chart_id, date_str)
+
+    if cached_body is not None and is_immutable(date):
+        logger.debug(f"Serving {url} from cache")
+        count('chart.fetch.cached')
+        return cached_body
+
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 304 and cached_body is not None:
+        logger.debug(f"{url} not modified, using cached copy")
+        count('chart.fetch.not_modified')
+        return cached_body
+
+    if response.status_code != 200:
+        logger.error(f"Failed to retrieve chart data. Status code: {response.status_code}")
+        count('chart.fetch.failed')
+        return None
+
+    count('chart.fetch.downloaded')
+    cache.put(chart_id, date_str, url, response.text,
+              etag=response.headers.get('ETag'),
+              last_modified=response.headers.get('Last-Modified'))
+    return response.text
@@ -0,0 +1,222 @@
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.search import fold
+
+try:
+    from rapidfuzz import fuzz as rf_fuzz
+    _RAPIDFUZZ_AVAILABLE = True
+except Exception:  # pragma: no cover - fallback path
+    _RAPIDFUZZ_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Song identity resolution. Chart rows are keyed by the exact (song_name,
+# artist) strings, so "FT"/"FEAT", punctuation changes and re-credits create
+# separate songs. resolve_song_identities finds likely duplicates without
+# comparing every pair: songs are grouped into blocks by the start of their
+# title and by lead artist plus first title word, and only songs sharing a
+# block are scored. Two songs match when
+#   - their normalized titles are at least TITLE_THRESHOLD similar,
+#   - their titles carry the same numbers ("EP 17" is not "EP 21"),
+#   - their lead artists are at least ARTIST_THRESHOLD similar, and
+#   - they never appear on the same chart.
+# Matches are merged with union-find; each group's canonical song is the one
+# with the most chart weeks (then one with a video, then the lowest id).
+# song_canonical maps every other member to it.
+
+TITLE_THRESHOLD = 90
+ARTIST_THRESHOLD = 90
+
+# Compact-title characters used as a blocking key
+TITLE_BLOCK = 6
+
+# Featured credits inside a title: "SONG (FT X)"
+_TITLE_FEATURE_RE = re.compile(r'[(\[]\s*(?:feat|ft|featuring)\b[^)\]]*[)\]]', re.IGNORECASE)
+_APOSTROPHE_RE = re.compile(r"['’`]")
+# Separators between credited artists; the lead artist is whatever comes first
+_CREDIT_SPLIT_RE = re.compile(r'\s*(?:/|,|&|\+|\b(?:ft|feat|featuring|and|with|vs|x|pts|presents)\b\.?)\s*',
+                              re.IGNORECASE)
+_TITLE_STOPWORDS = {'and'}
+_NUMBER_RE = re.compile(r'\d+')
+
+@dataclass
+class SongKey:
+    song_id: int
+    title: str          # folded title without featured credits
+    lead_artist: str    # folded lead artist, spaces removed
+    numbers: Tuple[str, ...]
+
+@dataclass
+class IdentityGroup:
+    canonical_id: int
+    members: List[int] = field(default_factory=list)
+
+def title_key(song_name: str) -> str:
+    text = fold(_APOSTROPHE_RE.sub('', _TITLE_FEATURE_RE.sub(' ', song_name)))
+    return ' '.join(word for word in text.split() if word not in _TITLE_STOPWORDS)
+
+def lead_artist(artist: str) -> str:
+    """The first credited artist, folded and without spaces: 'Sigala FT Ella Eyre' -> 'sigala'."""
+    for part in _CREDIT_SPLIT_RE.split(_APOSTROPHE_RE.sub('', artist)):
+        key = fold(part).replace(' ', '')
+        if key:
+            return key
+    return ''
+
+def song_key(song_id: int, song_name: str, artist: str) -> SongKey:
+    title = title_key(song_name)
+    return SongKey(song_id, title, lead_artist(artist), tuple(_NUMBER_RE.findall(title)))
+
+def blocking_keys(key: SongKey) -> List[str]:
+    keys = []
+    compact = key.title.replace(' ', '')
+    if compact:
+        keys.append(f't:{compact[:TITLE_BLOCK]}')
+    if key.lead_artist and key.title:
+        keys.append(f'a:{key.lead_artist}:{key.title.split()[0][:3]}')
+    return keys
+
+def is_match(a: SongKey, b: SongKey) -> bool:
+    if a.numbers != b.numbers or not a.title or not a.lead_artist:
+        return False
+    if a.title == b.title and a.lead_artist == b.lead_artist:
+        return True
+    if not _RAPIDFUZZ_AVAILABLE:
+        return False
+    return (rf_fuzz.ratio(a.title, b.title) >= TITLE_THRESHOLD
+            and rf_fuzz.ratio(a.lead_artist, b.lead_artist) >= ARTIST_THRESHOLD)
+
+def candidate_pairs(keys: List[SongKey]):
+    """Matching (song_id, song_id) pairs among songs that share a block."""
+    blocks = defaultdict(list)
+    for key in keys:
+        for block in blocking_keys(key):
+            blocks[block].append(key)
+    seen = set()
+    for members in blocks.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pair = (min(a.song_id, b.song_id), max(a.song_id, b.song_id))
+                if pair not in seen:
+                    seen.add(pair)
+                    if is_match(a, b):
+                        yield pair
+
+class _UnionFind:
+    """Union-find over song ids that refuses to join groups sharing a chart."""
+
+    def __init__(self, charts: Dict[int, set]):
+        self.parent = {}
+        self.charts = charts
+
+    def find(self, x):
+        parent = self.parent.setdefault(x, x)
+        if parent != x:
+            parent = self.parent[x] = self.find(parent)
+        return parent
+
+    def union(self, a, b) -> bool:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return True
+        charts_a, charts_b = self.charts.get(ra, set()), self.charts.get(rb, set())
+        if not charts_a.isdisjoint(charts_b):
+            return False
+        if len(charts_a) < len(charts_b):
+            ra, rb, charts_a, charts_b = rb, ra, charts_b, charts_a
+        self.parent[rb] = ra
+        self.charts[ra] = charts_a | charts_b
+        self.charts.pop(rb, None)
+        return True
+
+def find_identity_groups(conn) -> List[IdentityGroup]:
+    """Groups of songs that are the same record, each with its canonical song first."""
+    keys = [song_key(row[0], row[1], row[2]) for row in conn.execute('SELECT id, song_name, artist FROM songs')]
+    charts = defaultdict(set)
+    for song_id, playlist_id in conn.execute('SELECT song_id, playlist_id FROM playlist_songs'):
+        charts[song_id].add(playlist_id)
+    forest = _UnionFind(charts)
+    rejected = 0
+    for a, b in candidate_pairs(keys):
+        if not forest.union(a, b):
+            rejected += 1
+    if rejected:
+        logger.info(f'{rejected} matching pairs kept apart because they share a chart')
+
+    members = defaultdict(list)
+    for song_id in list(forest.parent):
+        members[forest.find(song_id)].append(song_id)
+    weeks = {row[0]: row[1] for row in conn.execute('SELECT song_id, weeks FROM song_stats')}
+    has_video = {row[0] for row in conn.execute("SELECT id FROM songs WHERE video_id IS NOT NULL AND video_id != ''")}
+    groups = []
+    for ids in members.values():
+        if len(ids) < 2:
+            continue
+        ids.sort(key=lambda i: (-weeks.get(i, 0), i not in has_video, i))
+        groups.append(IdentityGroup(ids[0], ids))
+    groups.sort(key=lambda g: g.canonical_id)
+    return groups
+
+def resolve_song_identities(conn, dry_run: bool = False) -> List[IdentityGroup]:
+    """
+    Recompute song_canonical and share videos within each group (inside the caller's transaction).
+
+    Members without a video take the canonical song's, or the first member's
+    that has one. With ``dry_run`` the groups are only returned.
+    """
+    groups = find_identity_groups(conn)
+    logger.info(f'Found {len(groups)} duplicate groups covering {sum(len(g.members) for g in groups)} songs')
+    if dry_run:
+        return groups
+    conn.execute('DELETE FROM song_canonical')
+    conn.executemany('INSERT INTO song_canonical (song_id, canonical_id) VALUES (?, ?)',
+                     [(song_id, g.canonical_id) for g in groups for song_id in g.members[1:]])
+    share_videos(conn)
+    return groups
+
+def share_videos(conn, canonical_ids: Optional[List[int]] = None) -> int:
+    """
+    Give every song in a group without a video the group's video; returns the songs updated.
+
+    ``canonical_ids`` limits the work to those groups.
+    """
+    where = ''
+    params = []
+    if canonical_ids is not None:
+        if not canonical_ids:
+            return 0
+        where = f"WHERE g.canonical_id IN ({','.join('?' * len(canonical_ids))})"
+        params = list(canonical_ids)
+    # One source per group: the canonical song if it has a video, else the lowest id that does
+    sources = conn.execute(f'''
+        WITH g AS (
+            SELECT canonical_id, canonical_id AS song_id FROM song_canonical GROUP BY canonical_id
+            UNION SELECT canonical_id, song_id FROM song_canonical
+        )
+        SELECT g.canonical_id, s.video_id, s.video_title, s.channel_title, s.video_confidence
+        FROM g JOIN songs s ON s.id = g.song_id
+        {where} {'AND' if where else 'WHERE'} s.video_id IS NOT NULL AND s.video_id != ''
+        ORDER BY g.canonical_id, s.id != g.canonical_id, s.id
+    ''', params).fetchall()
+    best = {}
+    for row in sources:
+        best.setdefault(row[0], tuple(row[1:]))
+    updated = 0
+    for canonical_id, video in best.items():
+        cursor = conn.execute('''
+            UPDATE songs SET video_id = ?, video_title = ?, channel_title = ?, video_confidence = ?
+            WHERE (video_id IS NULL OR video_id = '')
+              AND (id = ? OR id IN (SELECT song_id FROM song_canonical WHERE canonical_id = ?))
+        ''', video + (canonical_id, canonical_id))
+        updated += cursor.rowcount
+    if updated:
+        logger.info(f'Shared existing videos with {updated} duplicate songs')
+    return updated
+
+def canonical_id(conn, song_id: int) -> int:
+    row = conn.execute('SELECT canonical_id FROM song_canonical WHERE song_id = ?', (song_id,)).fetchone()
+    return row[0] if row else song_id
@@ -0,0 +1,141 @@
+import contextlib
+import datetime
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Run instrumentation shared by the pipeline stages. Stages record into the
+# process-wide ``metrics`` registry:
+#   counters    running totals ("youtube.quota_units", "db.chart_rows_written")
+#   histograms  individual observations; timers record seconds per call
+#               ("chart.fetch", "db.add_playlist", "youtube.search")
+# Names are dotted "<area>.<stage>". At the end of a script write_run_report
+# summarizes everything (count, total, mean, min, max and percentiles per
+# histogram) into a JSON report. The report file holds one entry per script,
+# so the scripts of one workflow run share a single file.
+
+RUN_REPORT = os.environ.get('TOPTASTIC_RUN_REPORT', 'run_report.json')
+PERCENTILES = (50, 90, 99)
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted ``values``."""
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+def summarize(values: List[float]) -> dict:
+    values = sorted(values)
+    summary = {
+        'count': len(values),
+        'total': sum(values),
+        'mean': sum(values) / len(values),
+        'min': values[0],
+        'max': values[-1],
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}'] = percentile(values, pct)
+    return summary
+
+class Metrics:
+    """Thread-safe counters and histograms for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters: Dict[str, float] = {}
+            self.histograms: Dict[str, List[float]] = {}
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.histograms.setdefault(name, []).append(value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        """Record the seconds spent in the block, even if it raises (counted in <name>.errors)."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count(f'{name}.errors')
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """Decorator form of timer()."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def report(self, script: str, extra: Optional[dict] = None) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: list(values) for name, values in self.histograms.items()}
+            started = self.started
+        finished = time.time()
+        report = {
+            'script': script,
+            'started_utc': _utc(started),
+            'finished_utc': _utc(finished),
+            'seconds': finished - started,
+            'stages': {name: summarize(values) for name, values in sorted(histograms.items())},
+            'counters': dict(sorted(counters.items())),
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+metrics = Metrics()
+count = metrics.count
+observe = metrics.observe
+timer = metrics.timer
+timed = metrics.timed
+
+def _utc(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def write_run_report(script: str, path=None, extra: Optional[dict] = None) -> dict:
+    """
+    Add this process's report under ``script`` to the JSON run report at ``path``.
+
+    ``path`` defaults to TOPTASTIC_RUN_REPORT (run_report.json). Reports of
+    other scripts already in the file are kept; an earlier report of the same
+    script is replaced.
+    """
+    path = Path(path or RUN_REPORT)
+    report = metrics.report(script, extra)
+    runs = {}
+    if path.exists():
+        try:
+            runs = json.loads(path.read_text()).get('runs', {})
+        except (ValueError, AttributeError):
+            logger.warning(f'Replacing unreadable run report {path}')
+    runs[script] = report
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps({'generated_utc': report['finished_utc'], 'runs': runs}, indent=2))
+    os.replace(tmp, path)
+
+    for name, stage in report['stages'].items():
+        logger.info(f"{name}: {stage['count']} calls, {stage['total']:.2f}s total, "
+                    f"p50 {stage['p50'] * 1000:.1f}ms, p99 {stage['p99'] * 1000:.1f}ms")
+    logger.info(f'Run report for {script} written to {path}')
+    return report
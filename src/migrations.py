@@ -0,0 +1,301 @@
+import logging
+import re
+
+from src.artists import rebuild_song_artists
+from src.chart_stats import rebuild_chart_stats
+
+logger = logging.getLogger(__name__)
+
+# Registered migrations as (version, description, function), applied in order.
+# The database's PRAGMA user_version records the last version applied.
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register ``fn(conn)`` as the step that brings the schema to ``version``."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+@migration(1, 'add video metadata columns to songs')
+def _add_video_columns(conn):
+    existing = _columns(conn, 'songs')
+    for column, column_type in (('video_title', 'TEXT'), ('channel_title', 'TEXT'), ('video_confidence', 'REAL')):
+        if column not in existing:
+            conn.execute(f'ALTER TABLE songs ADD COLUMN {column} {column_type}')
+
+@migration(2, 'unique index on playlists(date)')
+def _unique_playlist_dates(conn):
+    duplicated = conn.execute('SELECT date FROM playlists GROUP BY date HAVING COUNT(*) > 1').fetchall()
+    if duplicated:
+        # Keep the fullest copy of any date that was stored more than once
+        sizes = dict(conn.execute('SELECT playlist_id, COUNT(*) FROM playlist_songs GROUP BY playlist_id').fetchall())
+        drop = []
+        for (date,) in duplicated:
+            ids = [row[0] for row in conn.execute('SELECT id FROM playlists WHERE date = ? ORDER BY id', (date,))]
+            keep = max(ids, key=lambda i: (sizes.get(i, 0), -i))
+            drop.extend((i,) for i in ids if i != keep)
+        logger.warning(f'Removing {len(drop)} duplicate playlist rows')
+        conn.executemany('DELETE FROM playlist_songs WHERE playlist_id = ?', drop)
+        conn.executemany('DELETE FROM playlists WHERE id = ?', drop)
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_playlists_date ON playlists(date)')
+
+@migration(3, 'merge duplicate songs and add unique index on songs(artist, song_name)')
+def _unique_songs(conn):
+    groups = conn.execute('''
+        SELECT MIN(id), GROUP_CONCAT(id)
+        FROM songs
+        GROUP BY artist, song_name
+        HAVING COUNT(*) > 1
+    ''').fetchall()
+    if groups:
+        merges = []
+        for keep_id, ids in groups:
+            merges.extend((int(i), keep_id) for i in ids.split(',') if int(i) != keep_id)
+        conn.execute('CREATE TEMP TABLE song_merge (dupe_id INTEGER PRIMARY KEY, keep_id INTEGER NOT NULL)')
+        conn.executemany('INSERT INTO song_merge (dupe_id, keep_id) VALUES (?, ?)', merges)
+
+        # Inherit a video from a duplicate if the surviving row has none
+        donors = conn.execute('''
+            SELECT m.keep_id, s.video_id, s.video_title, s.channel_title, s.video_confidence
+            FROM song_merge m
+            JOIN songs s ON s.id = m.dupe_id
+            JOIN songs k ON k.id = m.keep_id
+            WHERE (k.video_id IS NULL OR k.video_id = '') AND s.video_id IS NOT NULL AND s.video_id != ''
+            ORDER BY m.dupe_id DESC
+        ''').fetchall()
+        # Rows are ordered so the lowest duplicate id is written last and wins
+        conn.executemany(
+            'UPDATE songs SET video_id = ?, video_title = ?, channel_title = ?, video_confidence = ? WHERE id = ?',
+            [(video_id, title, channel, confidence, keep_id) for keep_id, video_id, title, channel, confidence in donors]
+        )
+
+        conn.execute('''
+            UPDATE OR IGNORE playlist_songs
+            SET song_id = (SELECT keep_id FROM song_merge WHERE dupe_id = playlist_songs.song_id)
+            WHERE song_id IN (SELECT dupe_id FROM song_merge)
+        ''')
+        conn.execute('DELETE FROM playlist_songs WHERE song_id IN (SELECT dupe_id FROM song_merge)')
+        conn.execute('DELETE FROM songs WHERE id IN (SELECT dupe_id FROM song_merge)')
+        conn.execute('DROP TABLE song_merge')
+        logger.info(f'Merged {len(merges)} duplicate rows into {len(groups)} songs')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_songs_artist_song ON songs(artist, song_name)')
+
+@migration(4, 'unique (playlist_id, position) key on playlist_songs')
+def _playlist_song_key(conn):
+    conn.execute('''
+        DELETE FROM playlist_songs
+        WHERE rowid NOT IN (SELECT MIN(rowid) FROM playlist_songs GROUP BY playlist_id, position)
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_playlist_songs_position ON playlist_songs(playlist_id, position)')
+
+@migration(5, 'video lookup retry queue and playlist_songs(song_id) index')
+def _video_lookup_retries(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS video_lookup_retries (
+            song_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            next_attempt TEXT NOT NULL,
+            last_error TEXT,
+            FOREIGN KEY (song_id) REFERENCES songs(id)
+        )
+    ''')
+    # The enrichment queue looks up each song's latest chart appearance
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_playlist_songs_song ON playlist_songs(song_id)')
+
+@migration(6, 'video candidate archive and meta table')
+def _candidate_archive(conn):
+    # Every candidate returned for a song, so picks can be re-scored offline.
+    # Video metadata is stored once per video and shared between songs.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS candidate_videos (
+            video_id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            channel_title TEXT NOT NULL,
+            view_count INTEGER NOT NULL DEFAULT 0,
+            duration_seconds INTEGER,
+            category_id TEXT,
+            published_at TEXT,
+            fetched_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS song_candidates (
+            song_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            video_id TEXT NOT NULL,
+            PRIMARY KEY (song_id, rank),
+            FOREIGN KEY (song_id) REFERENCES songs(id),
+            FOREIGN KEY (video_id) REFERENCES candidate_videos(video_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+@migration(7, 'materialized song, artist and sparkline chart stats')
+def _chart_stats(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS song_stats (
+            song_id INTEGER PRIMARY KEY,
+            weeks INTEGER NOT NULL,
+            peak INTEGER NOT NULL,
+            weeks_at_peak INTEGER NOT NULL,
+            first_date TEXT NOT NULL,
+            last_date TEXT NOT NULL,
+            runs INTEGER NOT NULL,
+            FOREIGN KEY (song_id) REFERENCES songs(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS artist_stats (
+            artist TEXT PRIMARY KEY,
+            songs INTEGER NOT NULL,
+            weeks INTEGER NOT NULL,
+            peak INTEGER NOT NULL,
+            number_ones INTEGER NOT NULL,
+            first_date TEXT NOT NULL,
+            last_date TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS song_sparklines (
+            song_id INTEGER PRIMARY KEY,
+            positions TEXT NOT NULL,
+            FOREIGN KEY (song_id) REFERENCES songs(id)
+        )
+    ''')
+    rebuild_chart_stats(conn)
+
+@migration(8, 'full-text index over song titles and artists')
+def _songs_fts(conn):
+    # External-content table: the text lives in songs, the triggers keep the index in step
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+            song_name, artist,
+            content='songs', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN
+            INSERT INTO songs_fts (rowid, song_name, artist) VALUES (new.id, new.song_name, new.artist);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN
+            INSERT INTO songs_fts (songs_fts, rowid, song_name, artist) VALUES ('delete', old.id, old.song_name, old.artist);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF song_name, artist ON songs BEGIN
+            INSERT INTO songs_fts (songs_fts, rowid, song_name, artist) VALUES ('delete', old.id, old.song_name, old.artist);
+            INSERT INTO songs_fts (rowid, song_name, artist) VALUES (new.id, new.song_name, new.artist);
+        END
+    ''')
+    conn.execute("INSERT INTO songs_fts (songs_fts) VALUES ('rebuild')")
+
+@migration(9, 'canonical song mapping for duplicate songs')
+def _song_canonical(conn):
+    # Filled by src.identity.resolve_song_identities; songs without a row are their own canonical song
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS song_canonical (
+            song_id INTEGER PRIMARY KEY,
+            canonical_id INTEGER NOT NULL,
+            FOREIGN KEY (song_id) REFERENCES songs(id),
+            FOREIGN KEY (canonical_id) REFERENCES songs(id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_song_canonical_canonical ON song_canonical(canonical_id)')
+
+@migration(10, 'artists and song_artists tables split from artist credits')
+def _song_artists(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS artists (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS song_artists (
+            song_id INTEGER NOT NULL,
+            artist_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            PRIMARY KEY (song_id, artist_id),
+            FOREIGN KEY (song_id) REFERENCES songs(id),
+            FOREIGN KEY (artist_id) REFERENCES artists(id)
+        ) WITHOUT ROWID
+    ''')
+    # "Every song by this artist" without scanning the credits
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_song_artists_artist ON song_artists(artist_id, song_id)')
+    rebuild_song_artists(conn)
+
+@migration(11, 'AUTOINCREMENT song ids')
+def _autoincrement_song_ids(conn):
+    # The shipped songs.db declares songs.id as a plain INTEGER PRIMARY KEY, so
+    # SQLite may reissue the id of the newest song after it is deleted. Rebuild
+    # the table with AUTOINCREMENT, keeping every id, index and trigger.
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'songs'").fetchone()[0]
+    if 'AUTOINCREMENT' in sql.upper():
+        return
+    rebuilt, replaced = re.subn(r'\bid\s+INTEGER\s+PRIMARY\s+KEY\b', 'id INTEGER PRIMARY KEY AUTOINCREMENT', sql,
+                                count=1, flags=re.IGNORECASE)
+    if not replaced:
+        raise RuntimeError(f'Unexpected songs table definition: {sql}')
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'songs' AND type IN ('index', 'trigger') AND sql IS NOT NULL")]
+    conn.execute(re.sub(r'^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?"?songs"?', 'CREATE TABLE songs_rebuilt',
+                        rebuilt, count=1, flags=re.IGNORECASE))
+    # Same definition, so the columns line up; the FTS triggers are not on the new table yet
+    conn.execute('INSERT INTO songs_rebuilt SELECT * FROM songs')
+    conn.execute('DROP TABLE songs')
+    conn.execute('ALTER TABLE songs_rebuilt RENAME TO songs')
+    for statement in dependents:
+        conn.execute(statement)
+
+def migrate(conn, target=None):
+    """
+    Bring the database schema up to ``target`` (default: latest).
+
+    Each migration runs in its own transaction together with the
+    ``user_version`` bump, so a failure leaves the database at the last
+    version that fully applied. Migrations are written to be idempotent, so
+    re-running one against a partially upgraded file is safe.
+
+    Returns:
+        int: the schema version after migrating
+    """
+    target = latest_version() if target is None else target
+    current = get_schema_version(conn)
+    conn.commit()
+    for version, description, fn in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        logger.info(f'Applying schema migration {version}: {description}')
+        try:
+            conn.execute('BEGIN')
+            fn(conn)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f'Schema migration {version} failed; database left at version {current}')
+            raise
+        current = version
+    return current
@@ -0,0 +1,144 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.credits import artist_key
+from src.database import get_db_connection
+from src.sqlutil import chunks
+
+logger = logging.getLogger(__name__)
+
+# Read side of the chart tables. Every chart lookup goes through the one join
+# below; many dates or a date range are fetched in a single statement and rows
+# come back as immutable ChartEntry tuples built straight from the cursor.
+# Recently read playlists are kept in a small per-thread LRU cache that is
+# dropped as soon as the database changes: a commit on the same connection
+# (add_playlist_to_db, video updates) moves total_changes, and a commit from
+# any other connection or process moves PRAGMA data_version.
+
+# Playlists kept per thread
+PLAYLIST_CACHE_SIZE = 64
+
+CHART_JOIN = '''
+    FROM playlists p
+    JOIN playlist_songs ps ON p.id = ps.playlist_id
+    JOIN songs s ON ps.song_id = s.id
+'''
+
+def chart_query(columns: str, where: str) -> str:
+    """SELECT ``columns`` over the chart join, filtered by ``where``, in chart then position order."""
+    return f'SELECT {columns} {CHART_JOIN} WHERE {where} ORDER BY p.date, ps.position'
+
+# A NamedTuple rather than a frozen dataclass: cached rows are shared, so they
+# must be immutable, and a frozen dataclass costs ~3x more to build per row
+class ChartEntry(NamedTuple):
+    date: str
+    position: int
+    song_id: int
+    song_name: str
+    artist: str
+    lw: int
+    peak: int
+    weeks: int
+    is_new: int
+    is_reentry: int
+    video_id: Optional[str]
+    video_title: Optional[str]
+    channel_title: Optional[str]
+    video_confidence: Optional[float]
+
+ENTRY_COLUMNS = ('p.date, ps.position, s.id, s.song_name, s.artist, ps.lw, ps.peak, ps.weeks, ps.is_new, '
+                 'ps.is_reentry, s.video_id, s.video_title, s.channel_title, s.video_confidence')
+
+Playlist = Tuple[ChartEntry, ...]
+
+_local = threading.local()
+
+def _fetch(conn, where: str, params) -> Dict[str, Playlist]:
+    """Run the entry query and group its rows by chart date."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(chart_query(ENTRY_COLUMNS, where), params)
+    playlists: Dict[str, list] = {}
+    for entry in map(ChartEntry._make, cursor):
+        playlists.setdefault(str(entry.date), []).append(entry)
+    return {date: tuple(entries) for date, entries in playlists.items()}
+
+def _cache_for(conn) -> OrderedDict:
+    """This thread's cache for ``conn``, emptied if the database changed since it was filled."""
+    token = (conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes)
+    state = getattr(_local, 'cache', None)
+    if state is None or state[0] is not conn or state[1] != token:
+        state = (conn, token, OrderedDict())
+        _local.cache = state
+    return state[2]
+
+def _remember(cache: OrderedDict, date: str, playlist: Playlist):
+    cache[date] = playlist
+    cache.move_to_end(date)
+    while len(cache) > PLAYLIST_CACHE_SIZE:
+        cache.popitem(last=False)
+
+def get_playlists(dates: Iterable[str], conn=None) -> Dict[str, Playlist]:
+    """
+    Playlists for many chart dates (yyyymmdd), keyed by date in the order asked for.
+
+    Cached dates are served from memory and the rest are read together in
+    one statement per 500 dates. Dates with no stored chart are left out.
+    """
+    conn = conn or get_db_connection()
+    cache = _cache_for(conn)
+    wanted = list(dict.fromkeys(str(d) for d in dates))
+    found = {}
+    for date in wanted:
+        if date in cache:
+            cache.move_to_end(date)
+            found[date] = cache[date]
+    missing = [date for date in wanted if date not in found]
+    for chunk in chunks(missing):
+        for date, playlist in _fetch(conn, f"p.date IN ({','.join('?' * len(chunk))})", chunk).items():
+            _remember(cache, date, playlist)
+            found[date] = playlist
+    return {date: found[date] for date in wanted if date in found}
+
+def get_playlist(date: str, conn=None) -> Optional[Playlist]:
+    """The chart for ``date`` (yyyymmdd) in position order, or None if it is not stored."""
+    playlist = get_playlists([date], conn).get(str(date))
+    if playlist is None:
+        logger.info(f"No playlist found for date {date}")
+    return playlist
+
+def get_playlist_range(start: str, end: str, conn=None) -> Dict[str, Playlist]:
+    """
+    Every playlist dated ``start``..``end`` inclusive, oldest first, from one statement.
+
+    Range results bypass the cache, which is sized for recent lookups rather
+    than whole stretches of history.
+    """
+    return _fetch(conn or get_db_connection(), 'p.date >= ? AND p.date <= ?', (str(start), str(end)))
+
+def get_artist_history(name: str, conn=None) -> List[ChartEntry]:
+    """
+    Every chart entry crediting the artist ``name``, main or featured, oldest first.
+
+    Served from the song_artists index rather than a LIKE scan of the credits.
+    """
+    cursor = (conn or get_db_connection()).cursor()
+    cursor.row_factory = None
+    cursor.execute(chart_query(ENTRY_COLUMNS, '''s.id IN (
+        SELECT sa.song_id FROM artists a JOIN song_artists sa ON sa.artist_id = a.id WHERE a.name_key = ?
+    )'''), (artist_key(name),))
+    return list(map(ChartEntry._make, cursor))
+
+def latest_chart_date(conn=None) -> Optional[str]:
+    row = (conn or get_db_connection()).execute('SELECT MAX(date) FROM playlists').fetchone()
+    return row[0] if row else None
+
+def clear_playlist_cache():
+    _local.cache = None
+
+def playlist_cache_dates() -> List[str]:
+    """Dates held in this thread's cache, least recently used first."""
+    state = getattr(_local, 'cache', None)
+    return list(state[2]) if state else []
@@ -0,0 +1,97 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List
+
+from src.candidates import candidates_from_rows, get_meta, load_archived_songs, set_meta
+from src.database import get_db_connection
+from src.migrations import migrate
+from src.video_selector import best_of, score_song_batches, selector_fingerprint
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_KEY = 'selector_fingerprint'
+
+# Songs handed to a worker process at a time
+CHUNK_SIZE = 500
+
+@dataclass
+class PickChange:
+    song_id: int
+    artist: str
+    song_name: str
+    old_video_id: str
+    video_id: str
+    video_title: str
+    channel_title: str
+    score: float
+
+@dataclass
+class RescoreResult:
+    fingerprint: str
+    scored: int = 0
+    changes: List[PickChange] = field(default_factory=list)
+    up_to_date: bool = False
+
+def rescore_chunk(songs) -> List[PickChange]:
+    """Re-run selection for archived songs and return the picks that differ from the stored video."""
+    batches = [(candidates_from_rows(rows), artist, song_name) for _, artist, song_name, _, rows in songs]
+    changes = []
+    for (song_id, artist, song_name, current, _), scored in zip(songs, score_song_batches(batches)):
+        best = best_of(scored)
+        if best and best.video_id != current:
+            changes.append(PickChange(song_id, artist, song_name, current, best.video_id,
+                                      best.title, best.channel_title, best.score))
+    return changes
+
+def rescore_archive(workers=None, dry_run=False, force=False, chunk_size=CHUNK_SIZE) -> RescoreResult:
+    """
+    Recompute the best video for every song from the candidate archive.
+
+    No API calls are made. Scoring is spread across ``workers`` processes and
+    only songs whose pick changes are written. The selector fingerprint of the
+    last applied run is stored in the meta table; if it matches the current
+    weights and keyword lists the run is skipped unless ``force`` is set.
+
+    Args:
+        workers: worker processes (default: CPU count; 1 scores in-process)
+        dry_run: report changed picks without writing anything
+        force: re-score even if the fingerprint is unchanged
+
+    Returns:
+        RescoreResult
+    """
+    conn = get_db_connection()
+    migrate(conn)
+    fingerprint = selector_fingerprint()
+    result = RescoreResult(fingerprint)
+    if not force and get_meta(conn, FINGERPRINT_KEY) == fingerprint:
+        logger.info(f'Video picks already scored with selector {fingerprint}; nothing to do')
+        result.up_to_date = True
+        return result
+
+    songs = load_archived_songs(conn)
+    result.scored = len(songs)
+    chunks = [songs[i:i + chunk_size] for i in range(0, len(songs), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    logger.info(f'Re-scoring {len(songs)} songs with selector {fingerprint} on {workers} worker(s)')
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            result.changes.extend(rescore_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for changes in pool.map(rescore_chunk, chunks):
+                result.changes.extend(changes)
+
+    logger.info(f'{len(result.changes)} of {len(songs)} picks change')
+    if dry_run:
+        return result
+
+    conn.executemany(
+        'UPDATE songs SET video_id = ?, video_title = ?, channel_title = ?, video_confidence = ? WHERE id = ?',
+        [(c.video_id, c.video_title, c.channel_title, c.score, c.song_id) for c in result.changes]
+    )
+    set_meta(conn, FINGERPRINT_KEY, fingerprint)
+    conn.commit()
+    return result
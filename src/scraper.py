@@ -1,120 +1,215 @@
 import logging
-import requests
+import os
 from bs4 import BeautifulSoup
 
+from src.chart_parser import (
+    ARTIST_CLASS, ENTRY_CLASS, LW_CLASS, PEAK_CLASS, SONG_NAME_CLASS, WEEKS_CLASS,
+    RawChartEntry, parse_chart_entries,
+)
+from src.database import MIN_CHART_SONGS
+from src.fetcher import ChartCache, fetch_chart_html
+from src.metrics import count, timed
+
 logger = logging.getLogger(__name__)
 
-def scrape_songs(date):
+SINGLES_CHART_ID = '7501'
+CHART_URL = 'https://www.officialcharts.com/charts/singles-chart/{date}/{chart_id}/'
+
+# 'fast' uses the single-pass tokenizer in src.chart_parser, 'soup' the BeautifulSoup tree
+CHART_PARSER = os.environ.get('TOPTASTIC_CHART_PARSER', 'fast')
+
+def chart_url(date, chart_id=SINGLES_CHART_ID):
+    """Return the Official Charts URL for the chart published on ``date``."""
+    return CHART_URL.format(date=date.strftime("%Y%m%d"), chart_id=chart_id)
+
+def fetch_chart_page(date, chart_id=SINGLES_CHART_ID, refresh=False):
+    """
+    Download the raw chart page HTML for a specific date.
+
+    Pages go through the shared HTTP session and on-disk cache in src.fetcher,
+    so historical charts that were fetched before cost no network at all.
+
+    Args:
+        date: datetime.date object representing the date to fetch
+        chart_id: Official Charts chart id (defaults to the singles chart)
+        refresh: bypass the cache and download the page again
+
+    Returns:
+        str: Page HTML, or None if the page could not be retrieved
+    """
+    url = chart_url(date, chart_id)
+    logger.info(f"Scraping chart data from: {url}")
+    return fetch_chart_html(url, chart_id, date, refresh=refresh)
+
+def discard_chart_page(date, chart_id=SINGLES_CHART_ID):
+    """Drop the cached copy of a chart page so the next fetch downloads it again."""
+    ChartCache().discard(chart_id, date.strftime("%Y%m%d"))
+
+@timed('chart.scrape')
+def scrape_songs(date, refresh=False):
     """
     Scrape songs from the Official Charts website for a specific date.
-    
+
+    A page that parses to fewer than MIN_CHART_SONGS entries may be a
+    truncated or error page held in the cache, so it is downloaded once more
+    with ``refresh``; if that is still short it is dropped from the cache
+    rather than served from there forever.
+
     Args:
         date: datetime.date object representing the date to scrape
-        
+        refresh: bypass the page cache
+
     Returns:
         list: List of song dictionaries with chart information
     """
-    # Format the URL for the Official Charts website
-    date_str = date.strftime("%Y%m%d")
-    url = f'https://www.officialcharts.com/charts/singles-chart/{date_str}/7501/'
-    logger.info(f"Scraping chart data from: {url}")
-    
-    # Make a request to the website
-    response = requests.get(url)
-    
-    if response.status_code != 200:
-        logger.error(f"Failed to retrieve chart data. Status code: {response.status_code}")
+    html = fetch_chart_page(date, refresh=refresh)
+    if html is None:
         return []
+    songs = parse_chart_page(html, date)
+    if len(songs) < MIN_CHART_SONGS:
+        if not refresh:
+            logger.warning(f"Only {len(songs)} songs parsed for {date}; downloading the page again")
+            return scrape_songs(date, refresh=True)
+        discard_chart_page(date)
+    return songs
 
-    # Use BeautifulSoup to parse the page
-    soup = BeautifulSoup(response.text, 'html.parser')
+@timed('chart.parse')
+def parse_chart_page(html, date, engine=None):
+    """
+    Parse chart entries out of an Official Charts page.
+
+    Args:
+        html: Page HTML as returned by fetch_chart_page
+        date: datetime.date the page belongs to (used for logging)
+        engine: 'fast' (single-pass tokenizer) or 'soup' (BeautifulSoup tree);
+            defaults to CHART_PARSER. The fast engine falls back to BeautifulSoup
+            if it fails on a page.
+
+    Returns:
+        list: List of song dictionaries with chart information
+    """
+    engine = engine or CHART_PARSER
+    if engine == 'fast':
+        try:
+            entries = parse_chart_entries(html)
+        except Exception as e:
+            logger.warning(f"Fast chart parser failed for {date} ({e}); falling back to BeautifulSoup")
+            entries = soup_chart_entries(html)
+    else:
+        entries = soup_chart_entries(html)
 
-    # Find all the div tags with class 'description block'
-    divs = soup.find_all('div', class_='description block')
-    
     # Create a list to store the song data
     songs = []
-    
+
     # Extract song information from each chart entry
-    for position, div in enumerate(divs, 1):
-        try:
-            song_name_tag = div.find('a', class_='chart-name font-bold inline-block')
-            if song_name_tag is None:
-                logger.error(f'Unable to find song name tag for div at position {position}')
-                continue
-
-            song_name_elements = song_name_tag.find_all('span')
-            if len(song_name_elements) == 0:
-                logger.error(f'Unable to find song name elements for div at position {position}')
-                continue
-
-            re_new = song_name_elements[0].get_text(strip=True).upper() if len(song_name_elements) > 1 else ''
-            song_name = song_name_elements[-1].get_text(strip=True)
-
-            artist_tag = div.find('a', class_='chart-artist text-lg inline-block')
-            if artist_tag is None:
-                logger.error(f'Unable to find artist tag for div at position {position}')
-                continue
-            artist = artist_tag.get_text(strip=True)
-
-            lw_tag = div.find('li', class_='movement px-2 py-1 rounded-md inline-block mr-1 sm:mr-2')
-            if lw_tag is None:
-                logger.error(f'Unable to find lw tag for div at position {position}')
-                continue
-            lw = lw_tag.get_text(strip=True).split(':')[1].replace(',', '').strip()
-
-            peak_tag = div.find('li', class_='peak px-2 py-1 rounded-md inline-block mr-1 sm:mr-2')
-            if peak_tag is None:
-                logger.error(f'Unable to find peak tag for div at position {position}')
-                continue
-            peak = peak_tag.get_text(strip=True).split(':')[1].replace(',', '').strip()
-
-            weeks_tag = div.find('li', class_='weeks px-2 py-1 rounded-md inline-block mr-1 sm:mr-2')
-            if weeks_tag is None:
-                logger.error(f'Unable to find weeks tag for div at position {position}')
-                continue
-            weeks = weeks_tag.get_text(strip=True).split(':')[1].strip()
-
-            # Determine if the song is new or a reentry
-            is_new = re_new.lower() == 'new' or lw.lower() == 'new'
-            is_reentry = re_new.lower() == 're' or lw.lower() == 're'
-
-            # If the song is new or a reentry, set lw to 0
-            if is_new or is_reentry:
-                lw_int = 0
-            else:
-                try:
-                    lw_int = int(lw) if lw else 0
-                except ValueError:
-                    lw_int = 0
+    for position, entry in enumerate(entries, 1):
+        song = song_from_entry(position, entry)
+        if song is not None:
+            songs.append(song)
 
-            try:
-                peak_int = int(peak) if peak else position
-            except ValueError:
-                peak_int = position
+    logger.info(f"Scraped {len(songs)} songs from chart for date {date}")
+    count('chart.songs_parsed', len(songs))
+    return songs
+
+def soup_chart_entries(html):
+    """Extract raw chart entries with BeautifulSoup (the original, slower parser)."""
+    # Use BeautifulSoup to parse the page
+    soup = BeautifulSoup(html, 'html.parser')
+
+    entries = []
+    # Find all the div tags with class 'description block'
+    for div in soup.find_all('div', class_=ENTRY_CLASS):
+        entry = RawChartEntry()
+        song_name_tag = div.find('a', class_=SONG_NAME_CLASS)
+        if song_name_tag is not None:
+            entry.name = song_name_tag.get_text(strip=True)
+            entry.name_spans = [span.get_text(strip=True) for span in song_name_tag.find_all('span')]
+        artist_tag = div.find('a', class_=ARTIST_CLASS)
+        if artist_tag is not None:
+            entry.artist = artist_tag.get_text(strip=True)
+        lw_tag = div.find('li', class_=LW_CLASS)
+        if lw_tag is not None:
+            entry.lw = lw_tag.get_text(strip=True)
+        peak_tag = div.find('li', class_=PEAK_CLASS)
+        if peak_tag is not None:
+            entry.peak = peak_tag.get_text(strip=True)
+        weeks_tag = div.find('li', class_=WEEKS_CLASS)
+        if weeks_tag is not None:
+            entry.weeks = weeks_tag.get_text(strip=True)
+        entries.append(entry)
+    return entries
+
+def song_from_entry(position, entry):
+    """Convert a RawChartEntry into a song dictionary, or None if it is malformed."""
+    try:
+        if entry.name is None:
+            logger.error(f'Unable to find song name tag for div at position {position}')
+            return None
+
+        song_name_elements = entry.name_spans
+        if len(song_name_elements) == 0:
+            logger.error(f'Unable to find song name elements for div at position {position}')
+            return None
+
+        re_new = song_name_elements[0].upper() if len(song_name_elements) > 1 else ''
+        song_name = song_name_elements[-1]
+
+        if entry.artist is None:
+            logger.error(f'Unable to find artist tag for div at position {position}')
+            return None
+        artist = entry.artist
 
+        if entry.lw is None:
+            logger.error(f'Unable to find lw tag for div at position {position}')
+            return None
+        lw = entry.lw.split(':')[1].replace(',', '').strip()
+
+        if entry.peak is None:
+            logger.error(f'Unable to find peak tag for div at position {position}')
+            return None
+        peak = entry.peak.split(':')[1].replace(',', '').strip()
+
+        if entry.weeks is None:
+            logger.error(f'Unable to find weeks tag for div at position {position}')
+            return None
+        weeks = entry.weeks.split(':')[1].strip()
+
+        # Determine if the song is new or a reentry
+        is_new = re_new.lower() == 'new' or lw.lower() == 'new'
+        is_reentry = re_new.lower() == 're' or lw.lower() == 're'
+
+        # If the song is new or a reentry, set lw to 0
+        if is_new or is_reentry:
+            lw_int = 0
+        else:
             try:
-                weeks_int = int(weeks) if weeks else 1
+                lw_int = int(lw) if lw else 0
             except ValueError:
-                weeks_int = 1
-
-            # Create song dictionary
-            song = {
-                'position': position,
-                'song_name': song_name,
-                'artist': artist,
-                'lw': lw_int,
-                'peak': peak_int,
-                'weeks': weeks_int,
-                'is_new': is_new,
-                'is_reentry': is_reentry,
-                'video_id': None  # Will be populated later by the YouTube module
-            }
-            
-            songs.append(song)
-            
-        except Exception as e:
-            logger.error(f"Error parsing chart entry at position {position}: {e}")
-    
-    logger.info(f"Scraped {len(songs)} songs from chart for date {date}")
-    return songs
\ No newline at end of file
+                lw_int = 0
+
+        try:
+            peak_int = int(peak) if peak else position
+        except ValueError:
+            peak_int = position
+
+        try:
+            weeks_int = int(weeks) if weeks else 1
+        except ValueError:
+            weeks_int = 1
+
+        # Create song dictionary
+        return {
+            'position': position,
+            'song_name': song_name,
+            'artist': artist,
+            'lw': lw_int,
+            'peak': peak_int,
+            'weeks': weeks_int,
+            'is_new': is_new,
+            'is_reentry': is_reentry,
+            'video_id': None  # Will be populated later by the YouTube module
+        }
+
+    except Exception as e:
+        logger.error(f"Error parsing chart entry at position {position}: {e}")
+        return None
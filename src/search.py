@@ -0,0 +1,105 @@
+import logging
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.database import get_db_connection
+from src.video_selector import normalize
+
+try:
+    from rapidfuzz import fuzz as rf_fuzz
+    _RAPIDFUZZ_AVAILABLE = True
+except Exception:  # pragma: no cover - fallback path
+    _RAPIDFUZZ_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Song and artist search over the songs_fts index (migration 8). Queries are
+# folded the same way the index is (diacritics removed, then the selector's
+# normalize()) and every term is matched as a prefix, so partial input works
+# as you type. If no song has every term, the terms are cut to their first
+# three letters (most typos come later in a word) and, failing that, any term
+# is enough. The best FTS hits are re-ranked with RapidFuzz, ties going to the
+# songs and artists with the most chart weeks.
+
+# FTS hits handed to the fuzzy re-ranker
+CANDIDATES = 50
+
+# Terms are cut to this many letters on the second pass
+TYPO_PREFIX = 3
+
+@dataclass
+class SearchResult:
+    song_id: int
+    song_name: str
+    artist: str
+    score: float
+
+def fold(text: str) -> str:
+    """Strip diacritics and normalize: 'Beyoncé & JAY-Z' -> 'beyonce jay z'."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return normalize(''.join(c for c in decomposed if not unicodedata.combining(c)))
+
+def match_expression(query: str, column: Optional[str] = None, any_term: bool = False,
+                     prefix_len: Optional[int] = None) -> Optional[str]:
+    """FTS5 MATCH string with every folded term as a quoted prefix; None if nothing is searchable."""
+    terms = [term[:prefix_len] for term in fold(query).split()]
+    if not terms:
+        return None
+    expression = (' OR ' if any_term else ' AND ').join(f'"{term}"*' for term in terms)
+    return f'{column} : ({expression})' if column else expression
+
+# (exact prefixes, shortened prefixes, any term)
+_PASSES = ((False, None), (False, TYPO_PREFIX), (True, None))
+
+def _fts_hits(conn, query: str, column: Optional[str], limit: int):
+    """Up to ``limit`` (id, song_name, artist, song weeks) rows from the first pass with any hits, best bm25 first."""
+    for any_term, prefix_len in _PASSES:
+        expression = match_expression(query, column, any_term, prefix_len)
+        if expression is None:
+            return []
+        rows = conn.execute('''
+            SELECT s.id, s.song_name, s.artist, COALESCE(st.weeks, 0)
+            FROM songs_fts
+            JOIN songs s ON s.id = songs_fts.rowid
+            LEFT JOIN song_stats st ON st.song_id = s.id
+            WHERE songs_fts MATCH ?
+            ORDER BY bm25(songs_fts)
+            LIMIT ?
+        ''', (expression, limit)).fetchall()
+        if rows:
+            return [tuple(row) for row in rows]
+    return []
+
+def similarity(query: str, text: str) -> float:
+    """RapidFuzz WRatio, or the match against the text's start if higher (typeahead input is a prefix)."""
+    if not _RAPIDFUZZ_AVAILABLE:
+        return 0.0
+    return max(rf_fuzz.WRatio(query, text), rf_fuzz.ratio(query, text[:len(query)]))
+
+def _rerank(query: str, items, texts, weeks, limit: int):
+    """Order items by their best similarity to the query, then by chart weeks, then FTS order."""
+    folded = fold(query)
+    scored = []
+    for rank, item in enumerate(items):
+        score = max(similarity(folded, fold(text)) for text in texts(item))
+        scored.append(((-score, -weeks(item), rank), score, item))
+    scored.sort(key=lambda s: s[0])
+    return [(item, score) for _, score, item in scored[:limit]]
+
+def search_songs(query: str, limit: int = 10, conn=None) -> List[SearchResult]:
+    """Songs whose title and/or artist match ``query``, best first."""
+    conn = conn or get_db_connection()
+    hits = _fts_hits(conn, query, None, max(limit, CANDIDATES))
+    ranked = _rerank(query, hits, lambda row: (f'{row[2]} {row[1]}', f'{row[1]} {row[2]}'),
+                     lambda row: row[3], limit)
+    return [SearchResult(row[0], row[1], row[2], score) for row, score in ranked]
+
+def search_artists(query: str, limit: int = 10, conn=None) -> List[str]:
+    """Distinct artist credits matching ``query``, best first."""
+    conn = conn or get_db_connection()
+    weeks = {}
+    for row in _fts_hits(conn, query, 'artist', max(limit, CANDIDATES) * 4):
+        weeks[row[2]] = weeks.get(row[2], 0) + row[3]
+    ranked = _rerank(query, list(weeks), lambda artist: (artist,), weeks.get, limit)
+    return [artist for artist, _ in ranked]
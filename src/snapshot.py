@@ -0,0 +1,348 @@
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import statistics
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.database import get_readonly_connection
+
+try:
+    import zstandard
+    _ZSTD_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    _ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Read-only distribution snapshots. Only the chart tables (songs, playlists,
+# playlist_songs) are copied, in key order, into a fresh file: chart dates
+# become INTEGER yyyymmdd, playlist_songs is clustered by (playlist_id,
+# position) in a WITHOUT ROWID table, and the only default index is the
+# small one on chart dates. Every index is shipped to every client, so each
+# one has to earn its bytes.
+#
+# The derived tables (chart stats and sparklines, the canonical song mapping
+# and the per-artist credits) can all be rebuilt from the chart tables. They
+# go into a separate, opt-in extras file (extras=True) that clients ATTACH
+# next to songs.db, so the main download does not grow with them.
+
+# Measured on the shipped data: 8-64 KB pages give no smaller file than 4 KB
+# and compress worse, while 1-2 KB pages waste more space on page headers
+PAGE_SIZE = 4096
+
+# A weekly chart adds well under 0.1% to the file; growing by more than this
+# against the previous publication means the schema, indexes or copied tables changed
+SIZE_GROWTH_WARNING = 0.01
+
+# Layout version of the snapshot files, recorded in their snapshot_meta table.
+# Snapshots keep PRAGMA user_version at 0: they lack most of the working
+# database's tables, so migrate() must never take one for a migrated database.
+SNAPSHOT_FORMAT = 1
+
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 19
+
+SNAPSHOT_SCHEMA = [
+    '''
+    CREATE TABLE songs (
+        id INTEGER PRIMARY KEY,
+        song_name TEXT NOT NULL,
+        artist TEXT NOT NULL,
+        video_id TEXT,
+        video_title TEXT,
+        channel_title TEXT,
+        video_confidence REAL
+    )
+    ''',
+    '''
+    CREATE TABLE playlists (
+        id INTEGER PRIMARY KEY,
+        date INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE playlist_songs (
+        playlist_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        song_id INTEGER NOT NULL,
+        lw INTEGER,
+        peak INTEGER,
+        weeks INTEGER,
+        is_new INTEGER,
+        is_reentry INTEGER,
+        PRIMARY KEY (playlist_id, position)
+    ) WITHOUT ROWID
+    ''',
+]
+
+EXTRAS_SCHEMA = [
+    '''
+    CREATE TABLE song_stats (
+        song_id INTEGER PRIMARY KEY,
+        weeks INTEGER NOT NULL,
+        peak INTEGER NOT NULL,
+        weeks_at_peak INTEGER NOT NULL,
+        first_date INTEGER NOT NULL,
+        last_date INTEGER NOT NULL,
+        runs INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE artist_stats (
+        artist TEXT PRIMARY KEY,
+        songs INTEGER NOT NULL,
+        weeks INTEGER NOT NULL,
+        peak INTEGER NOT NULL,
+        number_ones INTEGER NOT NULL,
+        first_date INTEGER NOT NULL,
+        last_date INTEGER NOT NULL
+    ) WITHOUT ROWID
+    ''',
+    'CREATE TABLE song_sparklines (song_id INTEGER PRIMARY KEY, positions TEXT NOT NULL)',
+    'CREATE TABLE song_canonical (song_id INTEGER PRIMARY KEY, canonical_id INTEGER NOT NULL)',
+    'CREATE TABLE artists (id INTEGER PRIMARY KEY, name TEXT NOT NULL, name_key TEXT NOT NULL UNIQUE)',
+    '''
+    CREATE TABLE song_artists (
+        song_id INTEGER NOT NULL,
+        artist_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        PRIMARY KEY (song_id, artist_id)
+    ) WITHOUT ROWID
+    ''',
+]
+
+SNAPSHOT_COPY = [
+    '''
+    INSERT INTO songs (id, song_name, artist, video_id, video_title, channel_title, video_confidence)
+    SELECT id, song_name, artist, video_id, video_title, channel_title, video_confidence
+    FROM source.songs ORDER BY id
+    ''',
+    'INSERT INTO playlists (id, date) SELECT id, CAST(date AS INTEGER) FROM source.playlists ORDER BY id',
+    '''
+    INSERT INTO playlist_songs (playlist_id, position, song_id, lw, peak, weeks, is_new, is_reentry)
+    SELECT playlist_id, position, song_id, lw, peak, weeks, is_new, is_reentry
+    FROM source.playlist_songs ORDER BY playlist_id, position
+    ''',
+]
+
+EXTRAS_COPY = [
+    '''
+    INSERT INTO song_stats (song_id, weeks, peak, weeks_at_peak, first_date, last_date, runs)
+    SELECT song_id, weeks, peak, weeks_at_peak, CAST(first_date AS INTEGER), CAST(last_date AS INTEGER), runs
+    FROM source.song_stats ORDER BY song_id
+    ''',
+    '''
+    INSERT INTO artist_stats (artist, songs, weeks, peak, number_ones, first_date, last_date)
+    SELECT artist, songs, weeks, peak, number_ones, CAST(first_date AS INTEGER), CAST(last_date AS INTEGER)
+    FROM source.artist_stats ORDER BY artist
+    ''',
+    'INSERT INTO song_sparklines (song_id, positions) SELECT song_id, positions FROM source.song_sparklines ORDER BY song_id',
+    'INSERT INTO song_canonical (song_id, canonical_id) SELECT song_id, canonical_id FROM source.song_canonical ORDER BY song_id',
+    'INSERT INTO artists (id, name, name_key) SELECT id, name, name_key FROM source.artists ORDER BY id',
+    '''
+    INSERT INTO song_artists (song_id, artist_id, position, role)
+    SELECT song_id, artist_id, position, role FROM source.song_artists ORDER BY song_id, artist_id
+    ''',
+]
+
+# Created after the bulk copy so each index is built in one sorted pass
+SNAPSHOT_INDEXES = [
+    # playlist by date: date -> id, then the playlist_songs primary key
+    'CREATE UNIQUE INDEX idx_playlists_date ON playlists(date)',
+]
+
+# Song history index, opt-in (history_index=True). Measured on the shipped data
+# against the previously published file (no indexes, 4.08 MB): song history
+# takes ~1.2 ms with it instead of ~8 ms, but the file grows by 1.6 MB (+44%
+# over the 3.66 MB snapshot without it); the table scan it saves takes ~14 ms
+HISTORY_INDEX = 'CREATE INDEX idx_playlist_songs_song ON playlist_songs(song_id, playlist_id)'
+
+EXTRAS_INDEXES = [
+    'CREATE INDEX idx_song_canonical_canonical ON song_canonical(canonical_id)',
+    'CREATE INDEX idx_song_artists_artist ON song_artists(artist_id, song_id)',
+]
+
+# Reader queries timed by the report; parameters are filled in from the source database
+QUERIES = {
+    'playlist_by_date': '''
+        SELECT ps.position, s.song_name, s.artist, ps.lw, ps.peak, ps.weeks, s.video_id
+        FROM playlists p
+        JOIN playlist_songs ps ON ps.playlist_id = p.id
+        JOIN songs s ON s.id = ps.song_id
+        WHERE p.date = ?
+        ORDER BY ps.position
+    ''',
+    'song_history': '''
+        SELECT p.date, ps.position, ps.lw, ps.peak, ps.weeks
+        FROM playlist_songs ps
+        JOIN playlists p ON p.id = ps.playlist_id
+        WHERE ps.song_id = ?
+        ORDER BY p.date
+    ''',
+}
+
+@dataclass
+class SnapshotReport:
+    source_bytes: int
+    snapshot_bytes: int
+    source_free_pages: int
+    previous_bytes: Optional[int] = None
+    compressed: Dict[str, int] = field(default_factory=dict)
+    # {query: {'source': seconds, 'previous': seconds, 'snapshot': seconds}} (median per run;
+    # 'previous' only when there is a previous publication)
+    query_seconds: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+def build_snapshot(source_path, dest_path, page_size: int = PAGE_SIZE, extras: bool = False,
+                   history_index: bool = False):
+    """
+    Build a compact read-only copy of the chart tables of ``source_path`` at ``dest_path``.
+
+    With ``extras`` the file holds the derived tables instead; ``history_index``
+    adds the song history index. The file is built next to its destination and
+    renamed into place, and is left in rollback-journal mode with read-only
+    permissions.
+    """
+    if extras:
+        statements = EXTRAS_SCHEMA + EXTRAS_COPY + EXTRAS_INDEXES
+    else:
+        statements = SNAPSHOT_SCHEMA + SNAPSHOT_COPY + SNAPSHOT_INDEXES + ([HISTORY_INDEX] if history_index else [])
+    dest_path = Path(dest_path)
+    tmp = dest_path.with_name(dest_path.name + '.tmp')
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute(f'PRAGMA page_size = {int(page_size)}')
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('ATTACH DATABASE ? AS source', (Path(source_path).resolve().as_uri() + '?mode=ro',))
+        source_version = conn.execute('PRAGMA source.user_version').fetchone()[0]
+        conn.execute('BEGIN')
+        conn.execute('CREATE TABLE snapshot_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID')
+        conn.executemany('INSERT INTO snapshot_meta (key, value) VALUES (?, ?)', [
+            ('format', str(SNAPSHOT_FORMAT)), ('source_schema_version', str(source_version))])
+        for statement in statements:
+            conn.execute(statement)
+        conn.commit()
+        conn.execute('DETACH DATABASE source')
+        conn.execute('ANALYZE')
+        conn.execute('VACUUM')
+        conn.execute('PRAGMA journal_mode = DELETE')
+        problems = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        if problems != 'ok':
+            raise sqlite3.DatabaseError(f'Snapshot failed integrity check: {problems}')
+    finally:
+        conn.close()
+    dest_path.unlink(missing_ok=True)
+    os.replace(tmp, dest_path)
+    os.chmod(dest_path, 0o444)
+    logger.info(f'Built snapshot {dest_path} ({dest_path.stat().st_size} bytes)')
+
+def snapshot_format(conn) -> Optional[int]:
+    """SNAPSHOT_FORMAT of the snapshot behind ``conn``, or None for a working database."""
+    try:
+        row = conn.execute("SELECT value FROM snapshot_meta WHERE key = 'format'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return int(row[0]) if row else None
+
+def compress_snapshot(path, formats=('gz', 'zst')) -> Dict[str, int]:
+    """Write ``path``.gz / ``path``.zst next to the snapshot; returns {suffix: bytes}. zstd needs zstandard."""
+    path = Path(path)
+    sizes = {}
+    for fmt in formats:
+        out = path.with_name(f'{path.name}.{fmt}')
+        if fmt == 'gz':
+            with open(path, 'rb') as src, gzip.open(out, 'wb', compresslevel=GZIP_LEVEL) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        elif fmt == 'zst':
+            if not _ZSTD_AVAILABLE:
+                logger.warning('zstandard not installed; skipping the .zst variant')
+                continue
+            with open(path, 'rb') as src, open(out, 'wb') as dst:
+                zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst)
+        else:
+            raise ValueError(f"Unknown compression format '{fmt}'")
+        sizes[fmt] = out.stat().st_size
+    return sizes
+
+def sample_parameters(conn) -> Dict[str, tuple]:
+    """Representative parameters: the latest chart and the song with the longest chart history."""
+    latest = conn.execute('SELECT MAX(date) FROM playlists').fetchone()[0]
+    song = conn.execute('SELECT song_id FROM playlist_songs GROUP BY song_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()
+    return {'playlist_by_date': (str(latest),), 'song_history': (song[0] if song else 0,)}
+
+def time_queries(path, params: Dict[str, tuple], repeat: int = 20) -> Dict[str, float]:
+    """Median seconds per reader query, each run on a fresh read-only connection."""
+    timings = {}
+    for name, query in QUERIES.items():
+        runs = []
+        for _ in range(repeat):
+            conn = get_readonly_connection(path)
+            try:
+                start = time.perf_counter()
+                conn.execute(query, params[name]).fetchall()
+                runs.append(time.perf_counter() - start)
+            finally:
+                conn.close()
+        timings[name] = statistics.median(runs)
+    return timings
+
+def free_pages(path) -> int:
+    conn = get_readonly_connection(path)
+    try:
+        return conn.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+
+def check_growth(report: SnapshotReport):
+    """Warn when the snapshot grew more than SIZE_GROWTH_WARNING over the previous publication."""
+    if not report.previous_bytes:
+        return
+    growth = report.snapshot_bytes / report.previous_bytes - 1
+    if growth > SIZE_GROWTH_WARNING:
+        logger.warning(f'Snapshot grew {growth:.1%} over the previous publication '
+                       f'({report.previous_bytes} -> {report.snapshot_bytes} bytes)')
+
+def snapshot_with_report(source_path, dest_path, compress: Optional[List[str]] = ('gz', 'zst'),
+                         page_size: int = PAGE_SIZE, previous_path=None,
+                         history_index: bool = False) -> SnapshotReport:
+    """
+    Build (and optionally compress) a snapshot and compare it with the source.
+
+    Size and query timings are also compared with ``previous_path`` (the last
+    published snapshot; defaults to whatever is at ``dest_path`` before the
+    build), which is what clients actually had before.
+    """
+    conn = get_readonly_connection(source_path)
+    try:
+        params = sample_parameters(conn)
+    finally:
+        conn.close()
+    previous = Path(previous_path) if previous_path else Path(dest_path)
+    previous_bytes, previous_seconds = None, {}
+    if previous.exists():
+        previous_bytes = previous.stat().st_size
+        try:
+            previous_seconds = time_queries(previous, params)
+        except sqlite3.DatabaseError as e:
+            logger.warning(f'Could not time the reader queries on {previous}: {e}')
+    build_snapshot(source_path, dest_path, page_size, history_index=history_index)
+    report = SnapshotReport(
+        source_bytes=Path(source_path).stat().st_size,
+        snapshot_bytes=Path(dest_path).stat().st_size,
+        source_free_pages=free_pages(source_path),
+        previous_bytes=previous_bytes,
+        compressed=compress_snapshot(dest_path, compress) if compress else {},
+    )
+    check_growth(report)
+    before, after = time_queries(source_path, params), time_queries(dest_path, params)
+    report.query_seconds = {name: {'source': before[name], 'snapshot': after[name]} for name in QUERIES}
+    for name, seconds in previous_seconds.items():
+        report.query_seconds[name]['previous'] = seconds
+    return report
@@ -0,0 +1,12 @@
+from typing import Iterable, Iterator, List
+
+# SQLite limits the bound parameters per statement, so long IN (...) lists are
+# run in chunks of IN_CHUNK values.
+
+# Bound parameters per IN (...) list
+IN_CHUNK = 500
+
+def chunks(values: Iterable, size: int = IN_CHUNK) -> Iterator[List]:
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
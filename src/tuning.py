@@ -0,0 +1,216 @@
+import csv
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src import video_selector
+from src.candidates import candidates_from_rows
+from src.video_selector import DURATION_MAX, DURATION_MIN, OFFICIAL_CHANNEL_HINTS, channel_artist_names, normalize
+
+logger = logging.getLogger(__name__)
+
+# Weight tuning for the video selector (requires numpy). Archived candidates
+# become a feature matrix with one column per signal produced by
+# score_candidate, so every weight config is scored with one matrix multiply.
+
+# Linear signals, in feature-matrix column order. The view count weight is
+# handled separately because its contribution is capped.
+FEATURES = [
+    'official_keyword', 'category_music', 'vevo_channel', 'artist_channel_exact', 'good_title_match',
+    'rapidfuzz_similarity', 'duration_in_range', 'lyrics_penalty', 'audio_penalty', 'visualizer_penalty',
+    'static_image_penalty', 'live_penalty', 'cover_penalty', 'remix_penalty',
+]
+TUNABLE = FEATURES + ['view_count']
+VIEW_COUNT_CAP = 18.0
+
+# Scores closer than this are treated as ties (the matrix product and the
+# sequential sums in score_candidate can differ in the last bits)
+TIE_EPSILON = 1e-9
+
+# Upper bound on the (candidates x configs) score block held in memory
+MAX_BLOCK_BYTES = 256 * 1024 * 1024
+
+@dataclass
+class FeatureSet:
+    features: np.ndarray     # (candidates, len(FEATURES))
+    views: np.ndarray        # (candidates,)
+    fixed: np.ndarray        # (candidates,) points that do not depend on WEIGHTS
+    position: np.ndarray     # (candidates,) index within the song's candidate list
+    group_of: np.ndarray     # (candidates,) song index
+    group_start: np.ndarray  # (songs,) first candidate row of each song
+    label_row: np.ndarray    # (songs,) row of the labeled correct video
+    song_ids: List[int]
+
+def build_feature_set(songs, labels: Dict[int, str]) -> FeatureSet:
+    """
+    Build the feature matrix for labeled songs.
+
+    Args:
+        songs: (song_id, artist, song_name, video_id, candidate_rows) tuples
+            as returned by candidates.load_archived_songs
+        labels: {song_id: correct video_id}; songs whose correct video is
+            not among their candidates are skipped
+    """
+    matcher = video_selector.title_phrase_matcher()
+    column = {name: i for i, name in enumerate(FEATURES)}
+    rows, views, fixed, position, group_of, group_start, label_row, song_ids = [], [], [], [], [], [], [], []
+    labeled = [(s, labels[s[0]]) for s in songs if s[0] in labels and any(r[0] == labels[s[0]] for r in s[4])]
+
+    queries, titles = [], []
+    for (_, artist, song_name, _, candidate_rows), _ in labeled:
+        query = f"{artist} {song_name}".strip()
+        queries.extend(query for _ in candidate_rows)
+        titles.extend(r[1] for r in candidate_rows)
+    similarities = None
+    if video_selector._RAPIDFUZZ_AVAILABLE:
+        similarities = video_selector._fuzzy_similarities(queries, titles)
+
+    i = 0
+    for (song_id, artist, song_name, _, candidate_rows), correct in labeled:
+        artist_names = channel_artist_names(artist)
+        query_tokens = set(normalize(f"{artist} {song_name}").split())
+        remix_in_song = 'remix' in normalize(song_name)
+        group_start.append(len(rows))
+        song_ids.append(song_id)
+        for pos, candidate in enumerate(candidates_from_rows(candidate_rows)):
+            f = [0.0] * len(FEATURES)
+            offset = 0.0
+            labels_found = matcher.match(candidate.title.lower())
+            if 'official_keyword' in labels_found:
+                f[column['official_keyword']] = 1.0
+            if candidate.category_id == '10':
+                f[column['category_music']] = 1.0
+            if any(hint in candidate.channel_title.lower() for hint in OFFICIAL_CHANNEL_HINTS):
+                f[column['vevo_channel']] = 1.0
+            channel_norm = normalize(candidate.channel_title)
+            if any(name in channel_norm for name in artist_names):
+                f[column['artist_channel_exact']] = 1.0
+            title_tokens = set(normalize(candidate.title).split())
+            if title_tokens and query_tokens:
+                overlap = len(title_tokens & query_tokens) / len(title_tokens | query_tokens)
+                if overlap > 0.5:
+                    f[column['good_title_match']] = overlap
+            if similarities is not None:
+                if similarities[i] >= 60:
+                    f[column['rapidfuzz_similarity']] = similarities[i] / 100.0
+                else:
+                    offset -= 5.0
+            i += 1
+            if candidate.duration_seconds is not None:
+                if DURATION_MIN <= candidate.duration_seconds <= DURATION_MAX:
+                    f[column['duration_in_range']] = 1.0
+                else:
+                    offset -= 5.0
+            for penalty in video_selector._TITLE_PENALTIES:
+                if penalty in labels_found and not (penalty == 'remix_penalty' and remix_in_song):
+                    f[column[penalty]] = 1.0
+
+            if candidate.video_id == correct:
+                label_row.append(len(rows))
+            rows.append(f)
+            views.append(candidate.view_count or 0)
+            fixed.append(offset)
+            position.append(pos)
+            group_of.append(len(song_ids) - 1)
+
+    return FeatureSet(
+        features=np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURES)),
+        views=np.array(views, dtype=np.float64),
+        fixed=np.array(fixed, dtype=np.float64),
+        position=np.array(position, dtype=np.int64),
+        group_of=np.array(group_of, dtype=np.int64),
+        group_start=np.array(group_start, dtype=np.int64),
+        label_row=np.array(label_row, dtype=np.int64),
+        song_ids=song_ids,
+    )
+
+def weight_vector(weights: Dict[str, float]) -> np.ndarray:
+    """Return the TUNABLE weights of a WEIGHTS-style dict as a vector."""
+    return np.array([weights[name] for name in TUNABLE], dtype=np.float64)
+
+def weights_dict(vector, base: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """Inverse of weight_vector; weights that are not tuned are copied from ``base``."""
+    weights = dict(base if base is not None else video_selector.WEIGHTS)
+    weights.update((name, float(v)) for name, v in zip(TUNABLE, vector))
+    return weights
+
+def scores(fs: FeatureSet, configs: np.ndarray) -> np.ndarray:
+    """Scores of every candidate under every config: (candidates, configs)."""
+    linear = fs.features @ configs[:, :len(FEATURES)].T
+    capped = np.minimum(fs.views[:, None] * configs[:, len(FEATURES)][None, :], VIEW_COUNT_CAP)
+    return linear + capped + fs.fixed[:, None]
+
+def evaluate(fs: FeatureSet, configs: np.ndarray) -> np.ndarray:
+    """
+    Top-1 accuracy of each weight config (rows of ``configs``, TUNABLE order).
+
+    A song counts as correct when its labeled video would win select_best_video:
+    no other candidate scores higher, and none ties with more views or an
+    earlier search position. Every candidate's features are taken relative to
+    its song's labeled video, so one matrix multiply gives each candidate's
+    margin over the label and a per-song max decides the winner.
+    """
+    configs = np.atleast_2d(configs)
+    if not len(fs.label_row):
+        return np.zeros(len(configs))
+    label = fs.label_row[fs.group_of]
+    wins_tie = (fs.views > fs.views[label]) | ((fs.views == fs.views[label]) & (fs.position < fs.position[label]))
+    # Candidates that win ties need only come within epsilon of the label
+    offset = fs.fixed - fs.fixed[label] + np.where(wins_tie, 2 * TIE_EPSILON, 0.0)
+    relative = np.hstack([fs.features - fs.features[label], offset[:, None]])
+
+    block = max(1, MAX_BLOCK_BYTES // (8 * 2 * max(len(fs.views), 1)))
+    label_views = fs.views[fs.label_row]
+    accuracy = np.empty(len(configs))
+    for start in range(0, len(configs), block):
+        chunk = configs[start:start + block]
+        linear = np.hstack([chunk[:, :len(FEATURES)], np.ones((len(chunk), 1))])
+        view_weight = chunk[:, len(FEATURES)]
+        # (configs, candidates) layout keeps the per-song reduction contiguous
+        margin = linear @ relative.T
+        capped = np.multiply.outer(view_weight, fs.views)
+        np.minimum(capped, VIEW_COUNT_CAP, out=capped)
+        margin += capped
+        best_rival = np.maximum.reduceat(margin, fs.group_start, axis=1)
+        # The label's own capped view term is per song, so subtract it after the reduction
+        best_rival -= np.minimum(np.multiply.outer(view_weight, label_views), VIEW_COUNT_CAP)
+        accuracy[start:start + block] = 1.0 - (best_rival > TIE_EPSILON).mean(axis=1)
+    return accuracy
+
+def random_configs(base: np.ndarray, samples: int, spread: float = 0.5, seed: Optional[int] = None) -> np.ndarray:
+    """``samples`` configs scaling each weight by a factor in [1 - spread, 1 + spread]; row 0 is ``base``."""
+    rng = np.random.default_rng(seed)
+    factors = rng.uniform(1.0 - spread, 1.0 + spread, size=(samples, len(base)))
+    factors[0] = 1.0
+    return base[None, :] * factors
+
+def grid_configs(base: np.ndarray, grid: Dict[str, List[float]]) -> np.ndarray:
+    """Every combination of the listed values; other weights stay at ``base``."""
+    names = list(grid)
+    combos = list(itertools.product(*(grid[n] for n in names)))
+    configs = np.repeat(base[None, :], len(combos) + 1, axis=0)
+    for i, combo in enumerate(combos, 1):
+        for name, value in zip(names, combo):
+            configs[i, TUNABLE.index(name)] = value
+    return configs
+
+def load_labels(path, conn) -> Dict[int, str]:
+    """
+    Read correct picks from a CSV with columns song_id,video_id or artist,song_name,video_id.
+    """
+    labels = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get('song_id'):
+                labels[int(row['song_id'])] = row['video_id']
+                continue
+            found = conn.execute('SELECT id FROM songs WHERE artist = ? AND song_name = ?',
+                                 (row['artist'], row['song_name'])).fetchone()
+            if found:
+                labels[found[0]] = row['video_id']
+            else:
+                logger.warning(f"Labeled song not found: {row['artist']} - {row['song_name']}")
+    return labels
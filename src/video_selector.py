@@ -1,7 +1,11 @@
+import hashlib
+import json
 import re
 from dataclasses import dataclass
 from typing import List, Optional, Dict, Any
 
+from src.credits import split_credit
+
 # Heuristic weights (tweak as needed)
 try:
     from rapidfuzz import fuzz as rf_fuzz
@@ -9,6 +13,15 @@ try:
 except Exception:  # pragma: no cover - fallback path
     _RAPIDFUZZ_AVAILABLE = False
 
+# Vectorized similarity scoring uses rapidfuzz.process.cpdist, which returns numpy
+# arrays; both are declared dependencies, the loop fallback only covers broken installs
+try:
+    import numpy as np
+    from rapidfuzz import process as rf_process
+    _CDIST_AVAILABLE = _RAPIDFUZZ_AVAILABLE
+except Exception:  # pragma: no cover - fallback path
+    _CDIST_AVAILABLE = False
+
 WEIGHTS = {
     'official_keyword': 25.0,
     'artist_channel_exact': 35.0,
@@ -47,6 +60,22 @@ OFFICIAL_CHANNEL_HINTS = ['vevo']
 DURATION_MIN = 90      # 1:30
 DURATION_MAX = 600     # 10:00
 
+# Bump when the scoring rules change in code (the fingerprint already covers
+# WEIGHTS, keyword lists and duration bounds)
+SELECTOR_VERSION = 2
+
+def selector_fingerprint() -> str:
+    """Hash of everything that decides a pick, used to skip re-scoring when nothing changed."""
+    config = {
+        'version': SELECTOR_VERSION,
+        'weights': WEIGHTS,
+        'phrases': [OFFICIAL_KEYWORDS, BLOCK_LYRIC, BLOCK_AUDIO, BLOCK_STATIC, BLOCK_VISUALIZER,
+                    BLOCK_LIVE, BLOCK_COVER, BLOCK_REMIX, OFFICIAL_CHANNEL_HINTS],
+        'duration': [DURATION_MIN, DURATION_MAX],
+        'rapidfuzz': _RAPIDFUZZ_AVAILABLE,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
 @dataclass
 class VideoCandidate:
     video_id: str
@@ -83,8 +112,26 @@ def contains_any(text: str, phrases: List[str]) -> bool:
     t = text.lower()
     return any(p in t for p in phrases)
 
+# Credited artists shorter than this (normalized) are too likely to match a channel by accident
+MIN_COLLABORATOR_CHARS = 4
+
+def channel_artist_names(artist: str) -> List[str]:
+    """
+    Normalized names that mark a channel as the artist's: the whole credit,
+    then each artist split off by FT, "/", VS and the like. "&" credits stay
+    whole, since without the artists table there is no telling a duo from a
+    band name.
+    """
+    names = [normalize(artist)]
+    for name, _ in split_credit(artist, known=set()):
+        norm = normalize(name)
+        if len(norm) >= MIN_COLLABORATOR_CHARS and norm not in names:
+            names.append(norm)
+    return names
+
 def is_artist_channel(artist: str, channel: str) -> bool:
-    return normalize(artist) in normalize(channel)
+    channel_norm = normalize(channel)
+    return any(name in channel_norm for name in channel_artist_names(artist))
 
 def parse_iso8601_duration(d: str) -> Optional[int]:
     # Simplistic ISO8601 duration parser for YouTube (PnDTnHnMnS)
@@ -156,8 +203,176 @@ def score_candidate(candidate: VideoCandidate, artist: str, song: str) -> VideoC
 
     return candidate
 
+class PhraseMatcher:
+    """Finds every phrase category present in a text in a single regex pass.
+
+    All phrases are compiled into one alternation inside a lookahead, so
+    overlapping matches are reported. At each position the longest matching
+    phrase wins; any shorter phrase matching there is a prefix of it, so each
+    phrase also carries the categories of its prefixes.
+    """
+
+    def __init__(self, categories: Dict[str, List[str]]):
+        owners: Dict[str, set] = {}
+        for category, phrases in categories.items():
+            for phrase in phrases:
+                owners.setdefault(phrase, set()).add(category)
+        phrases = sorted(owners, key=len, reverse=True)
+        self._labels = {
+            p: frozenset().union(*(owners[q] for q in phrases if p.startswith(q)))
+            for p in phrases
+        }
+        self._pattern = re.compile('(?=(' + '|'.join(map(re.escape, phrases)) + '))')
+
+    def match(self, text: str) -> set:
+        found = set()
+        for m in self._pattern.finditer(text):
+            found |= self._labels[m.group(1)]
+        return found
+
+_matchers: Dict[tuple, PhraseMatcher] = {}
+
+def title_phrase_matcher() -> PhraseMatcher:
+    """Return the matcher for the current title keyword lists (rebuilt if they change)."""
+    categories = {
+        'official_keyword': OFFICIAL_KEYWORDS,
+        'lyrics_penalty': BLOCK_LYRIC,
+        'audio_penalty': BLOCK_AUDIO,
+        'visualizer_penalty': BLOCK_VISUALIZER,
+        'static_image_penalty': BLOCK_STATIC,
+        'live_penalty': BLOCK_LIVE,
+        'cover_penalty': BLOCK_COVER,
+        'remix_penalty': BLOCK_REMIX,
+    }
+    key = tuple((c, tuple(p)) for c, p in categories.items())
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = PhraseMatcher(categories)
+    return matcher
+
+# Pairs needed before fuzzy similarities are computed with rapidfuzz.process.cpdist
+VECTORIZE_MIN_PAIRS = 256
+
+# Penalties in the order score_candidate applies them
+_TITLE_PENALTIES = (
+    'lyrics_penalty', 'audio_penalty', 'visualizer_penalty', 'static_image_penalty',
+    'live_penalty', 'cover_penalty', 'remix_penalty',
+)
+
+def _fuzzy_similarities(queries: List[str], titles: List[str]) -> List[float]:
+    """max(token_set_ratio, partial_ratio) for each (query, title) pair."""
+    # Below a few hundred pairs the per-call overhead of cpdist outweighs its gain
+    if _CDIST_AVAILABLE and len(titles) >= VECTORIZE_MIN_PAIRS:
+        ts = rf_process.cpdist(queries, titles, scorer=rf_fuzz.token_set_ratio, dtype=np.float64, workers=-1)
+        pr = rf_process.cpdist(queries, titles, scorer=rf_fuzz.partial_ratio, dtype=np.float64, workers=-1)
+        return np.maximum(ts, pr).tolist()
+    return [max(rf_fuzz.token_set_ratio(q, t), rf_fuzz.partial_ratio(q, t)) for q, t in zip(queries, titles)]
+
+def _fixed(name: str, pts: float):
+    return pts, f"{name}:{pts:+.1f}"
+
+def score_song_batches(batches: List[tuple]) -> List[List[VideoCandidate]]:
+    """Score the candidates of many songs at once; same scores and reasons as score_candidate.
+
+    Args:
+        batches: list of (candidates, artist, song) tuples
+
+    Each query is normalized once, title keywords are found with a single
+    compiled matcher per title and the fuzzy similarities of every
+    (query, title) pair are computed in one vectorized call.
+    """
+    matcher = title_phrase_matcher()
+    queries, titles = [], []
+    for candidates, artist, song in batches:
+        query = f"{artist} {song}".strip()
+        queries.extend(query for _ in candidates)
+        titles.extend(c.title for c in candidates)
+    similarities = _fuzzy_similarities(queries, titles) if _RAPIDFUZZ_AVAILABLE else None
+
+    # Reasons for fixed-weight signals are formatted once per batch
+    official = _fixed('official_keyword', WEIGHTS['official_keyword'])
+    music = _fixed('category_music', WEIGHTS['category_music'])
+    vevo = _fixed('vevo_channel', WEIGHTS['vevo_channel'])
+    artist_channel = _fixed('artist_channel_exact', WEIGHTS['artist_channel_exact'])
+    in_range = _fixed('duration_in_range', WEIGHTS['duration_in_range'])
+    out_of_range = _fixed('duration_out_of_range', -5.0)
+    penalties = [(p, _fixed(p, WEIGHTS[p])) for p in _TITLE_PENALTIES]
+    title_match, fuzzy_weight, view_weight = WEIGHTS['good_title_match'], WEIGHTS['rapidfuzz_similarity'], WEIGHTS['view_count']
+    channel_norms: Dict[str, str] = {}
+
+    i = 0
+    for candidates, artist, song in batches:
+        artist_names = channel_artist_names(artist)
+        query_tokens = set(normalize(f"{artist} {song}").split())
+        remix_in_song = 'remix' in normalize(song)
+        for candidate in candidates:
+            added = []
+            labels = matcher.match(candidate.title.lower())
+
+            # Positive signals
+            if 'official_keyword' in labels:
+                added.append(official)
+            if candidate.category_id == '10':  # Music category
+                added.append(music)
+            channel = candidate.channel_title
+            if any(hint in channel.lower() for hint in OFFICIAL_CHANNEL_HINTS):
+                added.append(vevo)
+            channel_norm = channel_norms.get(channel)
+            if channel_norm is None:
+                channel_norm = channel_norms[channel] = normalize(channel)
+            if any(name in channel_norm for name in artist_names):
+                added.append(artist_channel)
+
+            title_tokens = set(normalize(candidate.title).split())
+            if title_tokens and query_tokens:
+                overlap = len(title_tokens & query_tokens) / len(title_tokens | query_tokens)
+                if overlap > 0.5:
+                    pts = title_match * overlap
+                    added.append((pts, f'title_overlap_{overlap:.2f}:{pts:+.1f}'))
+
+            if similarities is not None:
+                similarity = similarities[i]
+                if similarity >= 60:
+                    pts = fuzzy_weight * (similarity / 100.0)
+                    added.append((pts, f'rf_sim_{similarity:.0f}:{pts:+.1f}'))
+                else:
+                    added.append((-5.0, f'rf_low_{similarity:.0f}:-5.0'))
+            i += 1
+
+            if candidate.view_count:
+                pts = min(candidate.view_count * view_weight, 18.0)
+                added.append((pts, f'view_count_scaled:{pts:+.1f}'))
+
+            if candidate.duration_seconds is not None:
+                added.append(in_range if DURATION_MIN <= candidate.duration_seconds <= DURATION_MAX else out_of_range)
+
+            # Negative signals
+            if labels:
+                for penalty, entry in penalties:
+                    if penalty in labels and not (penalty == 'remix_penalty' and remix_in_song):
+                        added.append(entry)
+
+            # Accumulate in the same order as VideoCandidate.add so floats match exactly
+            if added:
+                score = candidate.score
+                for pts, _ in added:
+                    score += pts
+                candidate.score = score
+                if candidate.reasons is None:
+                    candidate.reasons = []
+                candidate.reasons.extend(reason for _, reason in added)
+
+    return [candidates for candidates, _, _ in batches]
+
+def score_candidates_batch(candidates: List[VideoCandidate], artist: str, song: str) -> List[VideoCandidate]:
+    """Score many candidates for one song; same scores and reasons as score_candidate."""
+    return score_song_batches([(candidates, artist, song)])[0]
+
 def select_best_video(candidates: List[VideoCandidate], artist: str, song: str) -> Optional[VideoCandidate]:
-    scored = [score_candidate(c, artist, song) for c in candidates]
+    return best_of(score_candidates_batch(candidates, artist, song))
+
+def best_of(scored: List[VideoCandidate]) -> Optional[VideoCandidate]:
+    """Pick the winner among already-scored candidates."""
     if not scored:
         return None
     # Sort by score desc then by view_count desc for tie-break
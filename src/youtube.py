@@ -1,12 +1,17 @@
 import logging
 import os
 import json
+import threading
 import googleapiclient.discovery
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 from pathlib import Path
 
-from src.database import get_db_connection
+from src.metrics import count, timed, timer
+from src.ratelimit import TokenBucket
 from src.video_selector import build_candidates_from_api, select_best_video
+from src.youtube_cache import get_cache
 
 logger = logging.getLogger(__name__)
 
@@ -23,108 +28,304 @@ def get_api_keys():
     
     return api_keys
 
-# Initialize with the first API key
-current_key_index = 0
-api_keys = []
+# Requests per second allowed on each API key (0 disables limiting)
+KEY_RATE = float(os.environ.get('YOUTUBE_KEY_RATE', '5'))
+
+# Quota units charged by the YouTube Data API per call
+SEARCH_COST = 100
+VIDEOS_LIST_COST = 1
+DAILY_QUOTA_PER_KEY = 10_000
+
+class QuotaTracker:
+    """Counts the API calls and quota units spent by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.used = 0
+        self.calls = {}
+
+    def spend(self, kind: str, units: int):
+        with self._lock:
+            self.used += units
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+        count('youtube.quota_units', units)
+        count(f'youtube.{kind}.calls')
+
+quota = QuotaTracker()
+
+class QuotaExhausted(Exception):
+    """Raised when every configured API key has hit its quota."""
+
+def build_youtube_service(api_key: str):
+    """Build a YouTube v3 service from the discovery document bundled with googleapiclient."""
+    document = get_static_doc('youtube', 'v3')
+    return googleapiclient.discovery.build_from_document(document, developerKey=api_key)
+
+class YouTubeClientPool:
+    """API clients for every configured key, built once and shared by all threads.
+
+    Each key's service object is built on first use and reused afterwards.
+    Requests are executed over a per-thread HTTP transport (httplib2 is not
+    thread-safe), which keeps its connection to the API alive between calls.
+    Key failover happens in ``execute``: a 403 moves the pool to the next key
+    and the request is retried there.
+    """
+
+    def __init__(self, keys, build=build_youtube_service, rate=None):
+        self.keys = list(keys)
+        self.index = 0
+        self.rate = KEY_RATE if rate is None else rate
+        self._build = build
+        self._services = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.index >= len(self.keys)
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self.rate = rate
+            self._limiters.clear()
+
+    def service(self, index=None):
+        """Return the service for key ``index`` (default: the current key)."""
+        with self._lock:
+            index = self.index if index is None else index
+            if index >= len(self.keys):
+                raise QuotaExhausted('All YouTube API keys exhausted')
+            service = self._services.get(index)
+            if service is None:
+                service = self._services[index] = self._build(self.keys[index])
+            limiter = self._limiters.get(index)
+            if limiter is None:
+                limiter = self._limiters[index] = TokenBucket(self.rate)
+        return index, service, limiter
+
+    def http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = build_http()
+        return http
+
+    def advance(self, failed_index: int) -> bool:
+        """Move past a key that hit its quota; returns False once all keys are used up.
+
+        Concurrent requests that fail on the same key only advance the index once.
+        """
+        with self._lock:
+            if self.index == failed_index:
+                self.index += 1
+                if self.index < len(self.keys):
+                    logger.info(f"Quota exceeded. Switching to API key {self.index + 1}/{len(self.keys)}")
+            return self.index < len(self.keys)
+
+    def execute(self, make_request, kind: str, cost: int):
+        """Build a request with ``make_request(service)`` and execute it, failing over on quota errors."""
+        while True:
+            index, service, limiter = self.service()
+            limiter.acquire()
+            try:
+                with timer(f'youtube.{kind}'):
+                    response = make_request(service).execute(http=self.http())
+            except HttpError as e:
+                if e.resp.status != 403:
+                    raise
+                if not self.advance(index):
+                    raise QuotaExhausted('All YouTube API keys exhausted') from e
+                continue
+            quota.spend(kind, cost)
+            return response
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_client_pool() -> YouTubeClientPool:
+    """Return the process-wide client pool, loading API keys on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YouTubeClientPool(get_api_keys())
+        return _pool
+
+def set_client_pool(pool):
+    """Replace the process-wide client pool (used by tests and tooling)."""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+
+def keys_exhausted() -> bool:
+    """True once every configured API key has hit its quota."""
+    return _pool is not None and _pool.exhausted
+
+def set_key_rate(rate: float):
+    """Set the per-key request rate used by every subsequent API call."""
+    global KEY_RATE
+    KEY_RATE = rate
+    if _pool is not None:
+        _pool.set_rate(rate)
 
 # Function to get the YouTube Data API service with the current API key
 def get_youtube_service():
-    global current_key_index, api_keys
-    
-    # Load API keys if not already loaded
-    if not api_keys:
-        api_keys = get_api_keys()
-    
-    if not api_keys:
-        logger.error("No YouTube API keys available")
-        raise ValueError("No YouTube API keys available")
-    
-    api_key = api_keys[current_key_index]
-    youtube_service = googleapiclient.discovery.build('youtube', 'v3', developerKey=api_key)
-    return youtube_service
+    return get_client_pool().service()[1]
 
-def get_best_youtube_video(artist: str, song: str):
-    """Return best matching YouTube video metadata for a song using heuristic scoring.
+# Candidates requested per search; videos.list accepts up to 50 ids per call
+SEARCH_PAGE_SIZE = 15
+VIDEO_DETAILS_BATCH = 50
 
-    Returns dict with keys: video_id, title, channel_title, score or None.
-    """
-    global current_key_index
-    query = f"{song} {artist}".strip()
-    try:
-        logger.info(f'Searching YouTube for candidates: "{query}"')
-        youtube = get_youtube_service()
-        search_request = youtube.search().list(
+# lookup_best_videos' result for a song it could not look up this time (quota
+# or an API error); unlike None it says nothing about whether a video exists
+LOOKUP_FAILED = object()
+
+def search_videos(query: str, max_results: int = SEARCH_PAGE_SIZE):
+    """Return raw search items for a query, served from the persistent cache when fresh."""
+    cache = get_cache()
+    items = cache.get_search(query, max_results)
+    if items is not None:
+        logger.info(f'Using cached search results for "{query}"')
+        count('youtube.search.cache_hits')
+        return items
+    response = get_client_pool().execute(
+        lambda youtube: youtube.search().list(
             q=query,
             part='id,snippet',
-            maxResults=15,
+            maxResults=max_results,
             type='video'
+        ),
+        'search', SEARCH_COST
+    )
+    items = response.get('items', [])
+    cache.put_search(query, max_results, items)
+    return items
+
+def get_video_details(video_ids, videos_map=None):
+    """Return {video_id: videos.list resource}, only calling the API for ids not cached.
+
+    Details are added to ``videos_map`` (when given) batch by batch, so a
+    caller that catches an API error keeps everything fetched before it.
+    """
+    cache = get_cache()
+    if videos_map is None:
+        videos_map = {}
+    cached = cache.get_videos(video_ids)
+    videos_map.update(cached)
+    missing = [vid for vid in dict.fromkeys(video_ids) if vid not in videos_map]
+    count('youtube.videos.cache_hits', len(cached))
+    pool = get_client_pool() if missing else None
+    for start in range(0, len(missing), VIDEO_DETAILS_BATCH):
+        batch = ','.join(missing[start:start + VIDEO_DETAILS_BATCH])
+        response = pool.execute(
+            lambda youtube: youtube.videos().list(
+                id=batch,
+                part='snippet,contentDetails,statistics'
+            ),
+            'videos', VIDEOS_LIST_COST
         )
-        search_response = search_request.execute()
-        items = search_response.get('items', [])
+        fetched = response.get('items', [])
+        cache.put_videos(fetched)
+        videos_map.update((v['id'], v) for v in fetched)
+    return videos_map
+
+@timed('youtube.lookup')
+def lookup_best_videos(songs):
+    """Return best matching video metadata for several songs, sharing videos.list calls.
+
+    Every song is searched first; the candidate ids of all songs are then
+    de-duplicated and resolved together in full 50-id ``videos.list`` calls
+    (ids already in the cache cost nothing), and the details are fanned back
+    out to each song's candidates for scoring.
+
+    Args:
+        songs: list of (artist, song) tuples
+
+    Returns:
+        list aligned with ``songs`` holding a metadata dict (see
+        get_best_youtube_video), None when no suitable video exists, or
+        LOOKUP_FAILED when the song could not be looked up this time (quota
+        ran out or the API failed before its search or details came back).
+        Songs whose details were fetched before such an error are still
+        resolved.
+    """
+    searches = []
+    for artist, song in songs:
+        query = f"{song} {artist}".strip()
+        logger.info(f'Searching YouTube for candidates: "{query}"')
+        try:
+            items = search_videos(query, SEARCH_PAGE_SIZE)
+        except QuotaExhausted:
+            logger.error('All API keys exhausted (quota) while searching for video')
+            break
+        except HttpError as e:
+            logger.error(f"YouTube API HTTP error: {e}")
+            items = LOOKUP_FAILED
         if not items:
             logger.info(f'No search results for query: {query}')
-            return None
+        searches.append(items)
+    searches += [LOOKUP_FAILED] * (len(songs) - len(searches))
 
-        video_ids = [i['id']['videoId'] for i in items]
-        # Fetch details in batches of up to 50 (here at most 15)
-        details_request = youtube.videos().list(
-            id=','.join(video_ids),
-            part='snippet,contentDetails,statistics'
-        )
-        details_response = details_request.execute()
-        videos_map = {v['id']: v for v in details_response.get('items', [])}
+    video_ids = [i['id']['videoId'] for items in searches if items and items is not LOOKUP_FAILED for i in items]
+    videos_map = {}
+    details_complete = False
+    try:
+        get_video_details(video_ids, videos_map)
+        details_complete = True
+    except QuotaExhausted:
+        # Search results are cached, so a later run resolves the rest cheaply
+        logger.error('All API keys exhausted (quota) while fetching video details')
+    except HttpError as e:
+        logger.error(f"YouTube API HTTP error: {e}")
 
-        candidates = build_candidates_from_api(items, videos_map)
-        best = select_best_video(candidates, artist, song)
+    results = []
+    for (artist, song), items in zip(songs, searches):
+        if items is LOOKUP_FAILED or (
+                not details_complete and items and any(i['id']['videoId'] not in videos_map for i in items)):
+            results.append(LOOKUP_FAILED)
+            continue
+        candidates = build_candidates_from_api(items, videos_map) if items else []
+        # select_best_video sorts in place; keep the search order for the archive
+        with timer('youtube.select'):
+            best = select_best_video(list(candidates), artist, song)
         if not best:
-            return None
+            results.append(None)
+            continue
         logger.info(f"Selected video {best.video_id} score={best.score:.2f} title='{best.title}' channel='{best.channel_title}' reasons={best.reasons}")
-        return {
+        results.append({
             'video_id': best.video_id,
             'video_title': best.title,
             'channel_title': best.channel_title,
             'video_confidence': best.score,
-        }
-    except HttpError as e:
-        if e.resp.status == 403:
-            current_key_index += 1
-            if current_key_index >= len(api_keys):
-                logger.error('All API keys exhausted (quota) while searching for video')
-                return None
-            logger.info(f"Quota exceeded. Switching to API key {current_key_index+1}/{len(api_keys)}")
-            return get_best_youtube_video(artist, song)
-        logger.error(f"YouTube API HTTP error: {e}")
-        return None
+            'candidates': candidates,
+        })
+    return results
+
+@timed('youtube.get_best_video')
+def get_best_youtube_video(artist: str, song: str):
+    """Return best matching YouTube video metadata for a song using heuristic scoring.
+
+    Returns dict with keys: video_id, video_title, channel_title, video_confidence
+    and candidates (every scored candidate, in search order) or None.
+    """
+    result = lookup_best_videos([(artist, song)])[0]
+    return None if result is LOOKUP_FAILED else result
 
 def get_scored_candidates(artist: str, song: str, limit: int = 15):
     """Return a list of scored candidate videos (dicts) for manual analysis.
 
     Each element contains: video_id, title, channel_title, score, reasons (list), view_count, duration_seconds.
     """
-    global current_key_index
     query = f"{song} {artist}".strip()
     try:
-        youtube = get_youtube_service()
-        search_request = youtube.search().list(
-            q=query,
-            part='id,snippet',
-            maxResults=min(limit, 50),
-            type='video'
-        )
-        sr = search_request.execute()
-        items = sr.get('items', [])
+        items = search_videos(query, min(limit, 50))
         if not items:
             return []
         video_ids = [i['id']['videoId'] for i in items]
-        details = youtube.videos().list(
-            id=','.join(video_ids),
-            part='snippet,contentDetails,statistics'
-        ).execute()
-        vmap = {v['id']: v for v in details.get('items', [])}
+        vmap = get_video_details(video_ids)
         candidates = build_candidates_from_api(items, vmap)
         # Score (select_best_video internally scores; replicate to preserve reasons)
-        from src.video_selector import score_candidate
-        scored = [score_candidate(c, artist, song) for c in candidates]
+        from src.video_selector import score_candidates_batch
+        scored = score_candidates_batch(candidates, artist, song)
         scored.sort(key=lambda c: (c.score, c.view_count), reverse=True)
         out = []
         for c in scored:
@@ -138,12 +339,7 @@ def get_scored_candidates(artist: str, song: str, limit: int = 15):
                 'duration_seconds': c.duration_seconds,
             })
         return out
-    except HttpError as e:
-        if e.resp.status == 403:
-            current_key_index += 1
-            if current_key_index >= len(api_keys):
-                return []
-            return get_scored_candidates(artist, song, limit=limit)
+    except (QuotaExhausted, HttpError):
         return []
     except Exception:
         return []
@@ -151,47 +347,12 @@ def get_scored_candidates(artist: str, song: str, limit: int = 15):
         logger.error(f"Unexpected error selecting video: {e}")
         return None
 
-def update_video_ids():
-    """Update video IDs and associated metadata for songs missing them."""
-    conn = get_db_connection()
-    # Ensure new columns exist (non-destructive tries)
-    try:
-        conn.execute('ALTER TABLE songs ADD COLUMN video_title TEXT')
-    except Exception:
-        pass
-    try:
-        conn.execute('ALTER TABLE songs ADD COLUMN channel_title TEXT')
-    except Exception:
-        pass
-    try:
-        conn.execute('ALTER TABLE songs ADD COLUMN video_confidence REAL')
-    except Exception:
-        pass
-
-    songs = conn.execute('SELECT * FROM songs WHERE video_id IS NULL OR video_id = ""').fetchall()
-    logger.info(f'Updating video metadata for {len(songs)} songs')
+def update_video_ids(budget=None, workers=1, rate=None):
+    """Update video IDs and associated metadata for songs missing them.
 
-    update_count = 0
-    for row in songs:
-        song = dict(row)
-        try:
-            meta = get_best_youtube_video(song['artist'], song['song_name'])
-            if meta and meta.get('video_id'):
-                conn.execute(
-                    'UPDATE songs SET video_id = ?, video_title = ?, channel_title = ?, video_confidence = ? WHERE id = ?',
-                    (meta['video_id'], meta.get('video_title'), meta.get('channel_title'), meta.get('video_confidence'), song['id'])
-                )
-                conn.commit()
-                update_count += 1
-                logger.info(f"Updated video metadata for '{song['song_name']}' by '{song['artist']}' -> {meta['video_id']}")
-            else:
-                logger.info(f"No suitable video found for '{song['song_name']}' by '{song['artist']}'")
-                conn.execute('UPDATE songs SET video_id = ? WHERE id = ?', ('', song['id']))
-                conn.commit()
-        except Exception as e:
-            logger.error(f"Error updating video metadata for '{song['song_name']}' by '{song['artist']}': {e}")
-
-    logger.info(f'{update_count} videos updated successfully')
-    remaining = conn.execute('SELECT count(*) FROM songs WHERE video_id IS NULL').fetchone()[0]
-    logger.info(f'{remaining} songs without video IDs remaining')
-    conn.close()
\ No newline at end of file
+    Work is scheduled by src.enrichment: most recent / highest charting songs
+    first, stopping before ``budget`` quota units are spent. ``workers`` API
+    lookups run concurrently, each key limited to ``rate`` requests/second.
+    """
+    from src.enrichment import run_enrichment
+    return run_enrichment(budget=budget, workers=workers, rate=rate)
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.sqlutil import chunks
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = Path(os.environ.get('TOPTASTIC_CACHE_DIR', '.cache')) / 'youtube.db'
+
+# Search results drift slowly; statistics in video details go stale faster
+SEARCH_TTL = 30 * 24 * 3600
+VIDEO_TTL = 7 * 24 * 3600
+MAX_ENTRIES = 250_000
+
+QUERY_NORMALIZE_RE = re.compile(r'[\W_]+')
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse punctuation/whitespace (keeps non-Latin letters)."""
+    return QUERY_NORMALIZE_RE.sub(' ', query.casefold()).strip()
+
+class YouTubeCache:
+    """Persistent cache of raw YouTube API responses.
+
+    Search result lists are keyed by normalized query and page size, video
+    resources by video id. Every entry carries its own expiry; once the table
+    grows past ``max_entries`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=None, search_ttl=SEARCH_TTL, video_ttl=VIDEO_TTL, max_entries=MAX_ENTRIES):
+        self.path = Path(path) if path is not None else CACHE_PATH
+        self.search_ttl = search_ttl
+        self.video_ttl = video_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+    def _connection(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get_many(self, kind: str, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for chunk in chunks(keys):
+                rows = conn.execute(
+                    f"SELECT key, payload FROM entries WHERE kind = ? AND expires_at > ? "
+                    f"AND key IN ({','.join('?' * len(chunk))})",
+                    (kind, now, *chunk)
+                ).fetchall()
+                found.update((key, json.loads(payload)) for key, payload in rows)
+            if found:
+                conn.executemany(
+                    'UPDATE entries SET last_access = ? WHERE kind = ? AND key = ?',
+                    [(now, kind, key) for key in found]
+                )
+                conn.commit()
+        return found
+
+    def _put_many(self, kind: str, items: Iterable[tuple], ttl: float):
+        now = time.time()
+        rows = [(kind, key, json.dumps(value), now + ttl, now) for key, value in items]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)', rows)
+            conn.commit()
+            self._writes += len(rows)
+            if self._writes >= 1000:
+                self._writes = 0
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+        count = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        if count > self.max_entries:
+            excess = count - int(self.max_entries * 0.9)
+            conn.execute('''
+                DELETE FROM entries WHERE rowid IN (
+                    SELECT rowid FROM entries ORDER BY last_access LIMIT ?
+                )
+            ''', (excess,))
+            logger.info(f'Evicted {excess} least recently used YouTube cache entries')
+        conn.commit()
+
+    def evict(self):
+        """Drop expired entries and trim the cache to ``max_entries``."""
+        with self._lock:
+            self._evict(self._connection(), time.time())
+
+    @staticmethod
+    def search_key(query: str, max_results: int) -> str:
+        return f'{normalize_query(query)}|{max_results}'
+
+    def get_search(self, query: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+        """Return cached search items for a query, or None on a miss."""
+        key = self.search_key(query, max_results)
+        return self._get_many('search', [key]).get(key)
+
+    def put_search(self, query: str, max_results: int, items: List[Dict[str, Any]]):
+        self._put_many('search', [(self.search_key(query, max_results), items)], self.search_ttl)
+
+    def get_videos(self, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return {video_id: videos.list resource} for the ids that are cached."""
+        return self._get_many('video', list(dict.fromkeys(video_ids)))
+
+    def put_videos(self, videos: List[Dict[str, Any]]):
+        self._put_many('video', [(v['id'], v) for v in videos], self.video_ttl)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> YouTubeCache:
+    """Return the process-wide YouTube cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = YouTubeCache()
+        return _cache
+
+def set_cache(cache: Optional[YouTubeCache]):
+    """Replace the process-wide cache (used by tests and tooling)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,72 @@
+import pytest
+
+from src import artists, database, queries
+from src.credits import FEATURED, MAIN, artist_key, split_credit, standalone_artists
+from src.video_selector import is_artist_channel
+from tests.test_enrichment import chart
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlists_to_db([
+        ('20240105', chart(('SPRINTER', 'DAVE'), ('ONE KISS', 'CALVIN HARRIS FT DUA LIPA'),
+                           ('I WILL WAIT', 'MUMFORD & SONS'))),
+        ('20240112', chart(('SPRINTER', 'DAVE & CENTRAL CEE'), ('DOJA', 'CENTRAL CEE'),
+                           ('HOUDINI', 'DUA LIPA'))),
+    ])
+    yield database.get_db_connection()
+    database.close_db_connections()
+
+
+def test_split_credit_keeps_band_names_unless_every_piece_is_known():
+    assert split_credit('CALVIN HARRIS FT DUA LIPA') == [('CALVIN HARRIS', MAIN), ('DUA LIPA', FEATURED)]
+    assert split_credit('MUMFORD & SONS', known=set()) == [('MUMFORD & SONS', MAIN)]
+    known = standalone_artists(['DAVE', 'CENTRAL CEE FT. ABRA CADABRA'])
+    assert split_credit('DAVE & CENTRAL CEE', known) == [('DAVE', MAIN), ('CENTRAL CEE', MAIN)]
+    assert split_credit('DAVE/STORMZY X AITCH FEAT Dave', known) == [
+        ('DAVE', MAIN), ('STORMZY X AITCH', MAIN)]
+    assert artist_key('Beyoncé & JAY-Z') == artist_key('BEYONCE & JAY Z')
+
+
+@pytest.mark.parametrize('known', [None, set(), {'lilnasx', 'jackharlow', 'ac', 'dc'}])
+def test_split_credit_keeps_names_ending_in_x_and_slash_names_whole(known):
+    for credit in ('LIL NAS X', 'LIBERTY X', 'RICHARD X', 'X AMBASSADORS', 'AC/DC'):
+        assert split_credit(credit, known) == [(credit, MAIN)]
+    assert split_credit('RICHARD X VS LIBERTY X', known) == [('RICHARD X', MAIN), ('LIBERTY X', MAIN)]
+    assert split_credit('AC/DC FT DAVE/HUNTR/X', known) == [('AC/DC', MAIN), ('DAVE', FEATURED), ('HUNTR/X', FEATURED)]
+    assert split_credit('LIL NAS X & JACK HARLOW', {'lilnasx', 'jackharlow'}) == [
+        ('LIL NAS X', MAIN), ('JACK HARLOW', MAIN)]
+
+
+def test_slash_name_is_kept_whole_once_known():
+    assert split_credit('KID/ROCK') == [('KID', MAIN), ('ROCK', MAIN)]
+    assert split_credit('KID/ROCK FT DAVE', {'kidrock'}) == [('KID/ROCK', MAIN), ('DAVE', FEATURED)]
+    assert standalone_artists(['AC/DC', 'LIL NAS X', 'DAVE/STORMZY']) == {'acdc', 'lilnasx', 'dave', 'stormzy'}
+
+
+def test_ingest_links_artists_and_rebuild_splits_known_pairs(conn):
+    lipa = [entry.song_name for entry in queries.get_artist_history('Dua Lipa', conn)]
+    assert lipa == ['ONE KISS', 'HOUDINI']
+    assert [row[3] for row in artists.artist_songs(conn, 'dua lipa')] == [FEATURED, MAIN]
+    # CENTRAL CEE was not an artist yet when DAVE & CENTRAL CEE arrived in the same chart
+    assert [e.song_name for e in queries.get_artist_history('Central Cee', conn)] == ['DOJA']
+
+    artists.rebuild_song_artists(conn)
+    conn.commit()
+    assert [e.song_name for e in queries.get_artist_history('Central Cee', conn)] == ['SPRINTER', 'DOJA']
+    assert [e.date for e in queries.get_artist_history('Dave', conn)] == ['20240105', '20240112']
+    assert artists.find_artist(conn, 'mumford and sons') is None
+    assert artists.find_artist(conn, 'Mumford & Sons')[1] == 'MUMFORD & SONS'
+
+    # Later ingests split credits whose artists are already known
+    database.add_playlist_to_db('20240119', chart(('NEW ONE', 'CENTRAL CEE & DAVE')))
+    song_id = conn.execute("SELECT id FROM songs WHERE song_name = 'NEW ONE'").fetchone()[0]
+    assert artists.song_artists(conn, song_id) == [('CENTRAL CEE', MAIN), ('DAVE', MAIN)]
+
+
+def test_featured_artist_channel_counts_as_artist_channel():
+    assert is_artist_channel('CALVIN HARRIS FT DUA LIPA', 'Dua Lipa')
+    assert is_artist_channel('CALVIN HARRIS FT DUA LIPA', 'Calvin Harris - Topic')
+    assert not is_artist_channel('MUMFORD & SONS', 'Sons of Kemet')
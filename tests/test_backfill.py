@@ -0,0 +1,76 @@
+import datetime
+import threading
+
+import src.backfill as backfill
+
+
+def make_songs(n):
+    return [{'position': i, 'song_name': f'Song {i}', 'artist': 'Artist'} for i in range(1, n + 1)]
+
+
+def test_backfill_pipeline_writes_each_week_once(monkeypatch):
+    dates = [datetime.date(2024, 1, 5) + datetime.timedelta(days=7 * i) for i in range(12)]
+    short_week = dates[3]
+    written = []
+    writer_threads = set()
+    refreshed = []
+    parse_threads = set()
+
+    def fake_fetch(date, refresh=False):
+        if refresh:
+            refreshed.append((date, threading.current_thread().name.startswith('backfill-fetch')))
+        if date == dates[5]:
+            return None  # simulated HTTP failure
+        return date.isoformat()
+
+    def fake_parse(html, date):
+        parse_threads.add(threading.current_thread().name)
+        return make_songs(10 if date == short_week else 100)
+
+    def fake_add(charts, batch_size):
+        writer_threads.add(threading.current_thread().name)
+        written.extend(date_str for date_str, _ in charts)
+        return len(charts)
+
+    monkeypatch.setattr(backfill, 'fetch_chart_page', fake_fetch)
+    monkeypatch.setattr(backfill, 'parse_chart_page', fake_parse)
+    monkeypatch.setattr(backfill, 'add_playlists_to_db', fake_add)
+    monkeypatch.setattr(backfill, 'close_db_connections',
+                        lambda: writer_threads.add('closed:' + threading.current_thread().name))
+    discarded = []
+    monkeypatch.setattr(backfill, 'discard_chart_page', discarded.append)
+
+    stats = backfill.run_backfill(dates, workers=4, rate=0)
+
+    expected = {d.strftime('%Y%m%d') for d in dates if d not in (short_week, dates[5])}
+    assert sorted(written) == sorted(expected)
+    assert len(written) == len(expected)
+    assert writer_threads == {'backfill-write', 'closed:backfill-write'}
+    assert (stats.fetched, stats.written, stats.skipped, stats.failed) == (11, 10, 1, 1)
+    # The short page is downloaded again by the fetch pool, bypassing the
+    # cache, then dropped from the cache and skipped
+    assert refreshed == [(short_week, True)]
+    assert discarded == [short_week]
+    assert parse_threads == {'backfill-parse'}
+
+
+def test_find_chart_gaps_returns_missing_and_incomplete_weeks(tmp_path, monkeypatch):
+    from src import database
+
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    full = [dict(s, lw=0, peak=s['position'], weeks=1, is_new=False, is_reentry=False) for s in make_songs(40)]
+    database.add_playlists_to_db([
+        ('20240105', full),
+        ('20240112', full[:39]),
+        ('20240126', full),
+    ])
+
+    gaps = backfill.find_chart_gaps(datetime.date(2024, 1, 1), datetime.date(2024, 2, 1))
+
+    assert gaps == [datetime.date(2024, 1, 19), datetime.date(2024, 1, 12)]
+
+
+def test_chart_fridays_snaps_to_fridays():
+    fridays = backfill.chart_fridays(datetime.date(2024, 1, 1), datetime.date(2024, 1, 18))
+    assert fridays == [datetime.date(2024, 1, 12), datetime.date(2024, 1, 5)]
@@ -0,0 +1,29 @@
+from benchmarks import run, synthetic
+
+
+def test_chart_history_recurs_songs():
+    charts = synthetic.chart_history(10, turnover=0.2)
+    assert [len(songs) for _, songs in charts] == [100] * 10
+    assert charts[1][0] == '20000114'
+    unique = {(s['song_name'], s['artist']) for _, songs in charts for s in songs}
+    assert len(unique) == 100 + 9 * 20
+
+
+def test_compare_flags_slower_medians():
+    baseline = {'results': [{'name': 'a', 'median': 1.0}, {'name': 'b', 'median': 1.0}]}
+    results = [{'name': 'a', 'median': 1.1}, {'name': 'b', 'median': 1.5}, {'name': 'c', 'median': 1.0}]
+    assert run.compare(results, baseline, threshold=0.2) == ['b']
+
+
+def test_measure_passes_setup_arguments():
+    calls = []
+    result = run.measure('noop', calls.append, 3, items=10, setup=lambda: ('x',), size=1)
+    assert calls == ['x', 'x', 'x']
+    assert result['repeat'] == 3 and result['params'] == {'size': 1}
+    assert result['min'] <= result['median']
+
+
+def test_bench_parse_runs_against_the_fixtures(tmp_path):
+    results = run.bench_parse(1, None, tmp_path)
+    assert results[-1]['name'] == 'parse.scrape_songs'
+    assert all(result['repeat'] == 1 for result in results)
@@ -0,0 +1,45 @@
+import datetime
+from pathlib import Path
+
+import pytest
+
+from src.scraper import parse_chart_page
+
+FIXTURES = sorted((Path(__file__).parent / 'fixtures' / 'charts').glob('*.html'))
+CHART_DATE = datetime.date(2025, 6, 13)
+
+
+@pytest.mark.parametrize('page', FIXTURES, ids=lambda p: p.name)
+def test_fast_parser_matches_soup_parser(page):
+    html = page.read_text(encoding='utf-8')
+    fast = parse_chart_page(html, CHART_DATE, engine='fast')
+    soup = parse_chart_page(html, CHART_DATE, engine='soup')
+    assert fast
+    assert fast == soup
+
+
+def test_edge_case_semantics():
+    html = (Path(__file__).parent / 'fixtures' / 'charts' / 'singles_edge_cases.html').read_text(encoding='utf-8')
+    songs = {s['position']: s for s in parse_chart_page(html, CHART_DATE, engine='fast')}
+
+    # Malformed entries are dropped without renumbering the rest
+    assert sorted(songs) == [1, 2, 3, 7]
+    assert songs[1]['song_name'] == "DON'T STOP ME NOW"
+    assert songs[1]['artist'] == 'SIMON & GARFUNKEL'
+    assert songs[1]['lw'] == 1002
+    assert songs[2]['song_name'] == 'MANCHILD'
+    assert songs[2]['is_new'] and not songs[2]['is_reentry'] and songs[2]['lw'] == 0
+    assert songs[3]['is_reentry'] and songs[3]['peak'] == 3 and songs[3]['weeks'] == 1
+    assert songs[7]['song_name'] == 'FIRST <ONE>'
+    assert songs[7]['is_reentry'] and songs[7]['lw'] == 0
+
+
+def test_fast_parser_falls_back_to_soup(monkeypatch):
+    import src.scraper as scraper
+
+    def broken(html):
+        raise RuntimeError('tokenizer failure')
+
+    monkeypatch.setattr(scraper, 'parse_chart_entries', broken)
+    html = FIXTURES[0].read_text(encoding='utf-8')
+    assert parse_chart_page(html, CHART_DATE, engine='fast') == parse_chart_page(html, CHART_DATE, engine='soup')
@@ -0,0 +1,66 @@
+import pytest
+
+from src import database
+from src.chart_stats import (SongStats, check_chart_stats, get_artist_stats, get_song_stats, get_sparkline,
+                             rebuild_chart_stats)
+from tests.test_database import make_chart
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    yield database.get_db_connection()
+    database.close_db_connections()
+
+
+def song_id(conn, title):
+    return conn.execute('SELECT id FROM songs WHERE song_name = ?', (title,)).fetchone()[0]
+
+
+def test_weekly_adds_extend_runs_and_sparklines(conn):
+    database.add_playlist_to_db('20240105', make_chart(['A', 'B']))
+    database.add_playlist_to_db('20240112', make_chart(['B', 'A']))
+    database.add_playlist_to_db('20240119', make_chart(['B']))
+    database.add_playlist_to_db('20240126', make_chart(['C', 'A']))
+
+    a = song_id(conn, 'A')
+    assert get_song_stats(conn, a) == SongStats(a, weeks=3, peak=1, weeks_at_peak=1, first_date='20240105',
+                                                last_date='20240126', runs=2)
+    assert get_sparkline(conn, a) == [1, 2, 0, 2]
+    assert get_sparkline(conn, song_id(conn, 'B')) == [2, 1, 1]
+    assert get_artist_stats(conn, 'Artist') == {
+        'artist': 'Artist', 'songs': 3, 'weeks': 7, 'peak': 1, 'number_ones': 3,
+        'first_date': '20240105', 'last_date': '20240126',
+    }
+    assert check_chart_stats(conn) == []
+
+
+def test_backfill_and_replacement_recompute_affected_songs(conn):
+    database.add_playlists_to_db([('20240105', make_chart(['A', 'B'])), ('20240119', make_chart(['A']))])
+    # An older chart lands between existing ones and shifts A's sparkline
+    database.add_playlist_to_db('20240112', make_chart(['C', 'A']))
+    a = song_id(conn, 'A')
+    assert get_sparkline(conn, a) == [1, 2, 1]
+    assert get_song_stats(conn, a).runs == 1
+
+    # Replacing a chart drops B from the history entirely
+    database.add_playlists_to_db([('20240105', make_chart(['A']))])
+    assert get_song_stats(conn, song_id(conn, 'B')) is None
+    assert check_chart_stats(conn) == []
+
+
+def test_check_reports_drift_and_rebuild_repairs_it(conn):
+    database.add_playlists_to_db([('20240105', make_chart(['A', 'B'])), ('20240112', make_chart(['B']))])
+    conn.execute('UPDATE song_stats SET weeks = 9')
+    conn.execute('DELETE FROM song_sparklines')
+    conn.commit()
+
+    problems = check_chart_stats(conn)
+    assert any(p.startswith('song_stats') for p in problems)
+    assert any(p.startswith('song_sparklines') for p in problems)
+    assert not any(p.startswith('artist_stats') for p in problems)
+
+    rebuild_chart_stats(conn)
+    conn.commit()
+    assert check_chart_stats(conn) == []
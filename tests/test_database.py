@@ -0,0 +1,130 @@
+import pytest
+
+from src import database
+from src.queries import get_playlist
+
+
+def make_chart(titles, artist='Artist'):
+    return [{
+        'position': i,
+        'song_name': title,
+        'artist': artist,
+        'lw': 0,
+        'peak': i,
+        'weeks': 1,
+        'is_new': True,
+        'is_reentry': False,
+    } for i, title in enumerate(titles, 1)]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    return tmp_path / 'songs.db'
+
+
+def song_rows():
+    conn = database.get_db_connection()
+    rows = conn.execute('SELECT id, song_name, artist FROM songs ORDER BY id').fetchall()
+    conn.close()
+    return [tuple(r) for r in rows]
+
+
+def test_bulk_ingest_reuses_song_ids(db):
+    database.add_playlist_to_db('20240105', make_chart(['A', 'B']))
+    written = database.add_playlists_to_db([
+        ('20240112', make_chart(['B', 'C'])),
+        ('20240119', make_chart(['C', 'D', 'A'])),
+    ], batch_size=1)
+
+    assert written == 2
+    assert song_rows() == [(1, 'A', 'Artist'), (2, 'B', 'Artist'), (3, 'C', 'Artist'), (4, 'D', 'Artist')]
+    playlist = get_playlist('20240119')
+    assert [(s.position, s.song_id, s.song_name) for s in playlist] == [(1, 3, 'C'), (2, 4, 'D'), (3, 1, 'A')]
+
+
+def test_bulk_ingest_replaces_existing_playlist(db):
+    database.add_playlists_to_db([('20240105', make_chart(['A', 'B', 'C']))])
+    database.add_playlists_to_db([('20240105', make_chart(['C', 'A']))])
+
+    playlist = get_playlist('20240105')
+    assert [s.song_name for s in playlist] == ['C', 'A']
+    conn = database.get_db_connection()
+    assert conn.execute('SELECT COUNT(*) FROM playlists').fetchone()[0] == 1
+    conn.close()
+
+
+def test_deleted_song_ids_are_not_reissued(db):
+    database.add_playlist_to_db('20240105', make_chart(['A', 'B']))
+    conn = database.get_db_connection()
+    conn.execute("DELETE FROM playlist_songs WHERE song_id = 2")
+    conn.execute("DELETE FROM songs WHERE id = 2")
+    conn.commit()
+
+    database.add_playlists_to_db([('20240112', make_chart(['A', 'C']))])
+    database.add_playlist_to_db('20240119', make_chart(['D']))
+    assert song_rows() == [(1, 'A', 'Artist'), (3, 'C', 'Artist'), (4, 'D', 'Artist')]
+
+
+def test_single_add_matches_existing_songs_by_name_and_artist(db):
+    chart = make_chart(['A', 'A'])
+    chart[1]['artist'] = 'Other'
+    database.add_playlist_to_db('20240105', chart)
+    database.add_playlist_to_db('20240112', make_chart(['A'], artist='Other'))
+
+    assert len(song_rows()) == 2
+    assert get_playlist('20240112')[0].song_id == 2
+
+
+def test_connection_is_shared_per_thread(db):
+    import threading
+
+    conn = database.get_db_connection()
+    assert database.get_db_connection() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(database.get_db_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+    # Closing the shared connection is harmless; the next call reopens it
+    conn.close()
+    assert database.get_db_connection().execute('SELECT 1').fetchone()[0] == 1
+
+
+def test_set_db_path_and_readonly_connection(db, tmp_path):
+    database.add_playlist_to_db('20240105', make_chart(['A']))
+    other = tmp_path / 'other.db'
+    database.set_db_path(other)
+    try:
+        database.create_tables_if_needed()
+        assert database.get_playlist_sizes() == {}
+    finally:
+        database.set_db_path('songs.db')
+
+    ro = database.get_readonly_connection(db)
+    try:
+        assert ro.execute('SELECT COUNT(*) FROM songs').fetchone()[0] == 1
+        with pytest.raises(Exception):
+            ro.execute("INSERT INTO playlists (date) VALUES ('20240112')")
+    finally:
+        ro.close()
+
+
+def test_bulk_ingest_skips_a_failing_chart(db):
+    bad = make_chart(['B', 'C'])
+    del bad[1]['peak']
+    written = database.add_playlists_to_db([
+        ('20240105', make_chart(['A'])),
+        ('20240112', bad),
+        ('20240119', make_chart(['D', 'B'])),
+    ])
+
+    assert written == 2
+    assert song_rows() == [(1, 'A', 'Artist'), (2, 'D', 'Artist'), (3, 'B', 'Artist')]
+    assert get_playlist('20240112') is None
+    assert [s.song_name for s in get_playlist('20240119')] == ['D', 'B']
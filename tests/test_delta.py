@@ -0,0 +1,103 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from src import database, delta
+from tests.test_database import make_chart
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlists_to_db([('20240105', make_chart(['A', 'B'])), ('20240112', make_chart(['B', 'C']))])
+    database.close_db_connections()
+    return tmp_path / 'songs.db'
+
+
+def snapshot(db, tmp_path, name):
+    """Copy the working DB the way the publish workflow does."""
+    path = tmp_path / name
+    shutil.copy(db, path)
+    return path
+
+
+def next_week(date, titles):
+    database.add_playlist_to_db(date, make_chart(titles))
+    conn = database.get_db_connection()
+    conn.execute("UPDATE songs SET video_id = 'vid' WHERE song_name = 'A'")
+    conn.execute("DELETE FROM playlist_songs WHERE position = 2 AND playlist_id = 1")
+    conn.commit()
+    database.close_db_connections()
+
+
+def test_client_catches_up_by_applying_changesets(db, tmp_path):
+    out = tmp_path / 'public'
+    v1 = snapshot(db, tmp_path, 'v1.db')
+    first = delta.publish(v1, out)
+    assert (first['version'], first['chain_start'], first['deltas']) == (1, 1, [])
+
+    next_week('20240119', ['C', 'D'])
+    v2 = snapshot(db, tmp_path, 'v2.db')
+    second = delta.publish(v2, out, v1, first)
+    next_week('20240126', ['D', 'E'])
+    third = delta.publish(snapshot(db, tmp_path, 'v3.db'), out, v2, second)
+
+    assert third['version'] == 3 and [d['version'] for d in third['deltas']] == [2, 3]
+    assert third['deltas'][0]['state'] == third['deltas'][1]['base_state']
+
+    client = sqlite3.connect(snapshot(v1, tmp_path, 'client.db'))
+    updates = delta.updates_for(third, 1)
+    for entry in updates:
+        assert delta.file_sha256(out / entry['file']) == entry['sha256']
+        delta.apply_changeset(client, delta.read_changeset(out / entry['file']))
+    assert delta.state_hash(client) == third['state']
+    assert client.execute("SELECT video_id FROM songs WHERE song_name = 'A'").fetchone() == ('vid',)
+    assert delta.updates_for(third, 3) == []
+
+
+def test_changeset_refuses_wrong_base(db, tmp_path):
+    out = tmp_path / 'public'
+    v1 = snapshot(db, tmp_path, 'v1.db')
+    first = delta.publish(v1, out)
+    next_week('20240119', ['C', 'D'])
+    second = delta.publish(snapshot(db, tmp_path, 'v2.db'), out, v1, first)
+    changeset = delta.read_changeset(out / second['deltas'][0]['file'])
+
+    client = sqlite3.connect(snapshot(db, tmp_path, 'client.db'))
+    before = delta.state_hash(client)
+    with pytest.raises(delta.DeltaError):
+        delta.apply_changeset(client, changeset)
+    assert delta.state_hash(client) == before
+
+
+def test_unchanged_database_keeps_its_version(db, tmp_path):
+    out = tmp_path / 'public'
+    v1 = snapshot(db, tmp_path, 'v1.db')
+    first = delta.publish(v1, out)
+    again = delta.publish(snapshot(db, tmp_path, 'v1b.db'), out, v1, first)
+    assert again['version'] == 1 and again['deltas'] == []
+
+
+def test_new_chain_after_full_every_or_schema_change(db, tmp_path):
+    out = tmp_path / 'public'
+    v1 = snapshot(db, tmp_path, 'v1.db')
+    first = delta.publish(v1, out)
+    next_week('20240119', ['C', 'D'])
+    v2 = snapshot(db, tmp_path, 'v2.db')
+    second = delta.publish(v2, out, v1, first, full_every=1)
+    next_week('20240126', ['D', 'E'])
+    v3 = snapshot(db, tmp_path, 'v3.db')
+    third = delta.publish(v3, out, v2, second, full_every=1)
+
+    assert (third['version'], third['chain_start'], third['deltas']) == (3, 3, [])
+    assert not list((out / 'deltas').iterdir())
+    assert delta.updates_for(third, 2) is None
+
+    conn = database.get_db_connection()
+    conn.execute('ALTER TABLE songs ADD COLUMN extra TEXT')
+    conn.commit()
+    database.close_db_connections()
+    fourth = delta.publish(snapshot(db, tmp_path, 'v4.db'), out, v3, third)
+    assert (fourth['version'], fourth['chain_start']) == (4, 4)
@@ -0,0 +1,130 @@
+import datetime
+import time
+
+import pytest
+
+from src import database, enrichment, youtube
+from src.youtube_cache import YouTubeCache, set_cache
+
+
+def chart(*songs):
+    return [{
+        'position': i,
+        'song_name': name,
+        'artist': artist,
+        'lw': 0,
+        'peak': i,
+        'weeks': 1,
+        'is_new': True,
+        'is_reentry': False,
+    } for i, (name, artist) in enumerate(songs, 1)]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlists_to_db([
+        ('20240105', chart(('Old', 'A'), ('Gone', 'B'))),
+        ('20240112', chart(('Top', 'C'), ('Second', 'D'), ('Old', 'A'))),
+    ])
+    set_cache(YouTubeCache(tmp_path / 'youtube.db'))
+    yield database.get_db_connection()
+    set_cache(None)
+    database.close_db_connections()
+
+
+def patch_lookup(monkeypatch, fake_lookup):
+    monkeypatch.setattr(enrichment, 'lookup_best_videos', lambda songs: [fake_lookup(a, s) for a, s in songs])
+
+
+def queue_names(conn, now=None):
+    return [t.song_name for t in enrichment.load_enrichment_queue(conn, now)]
+
+
+def test_queue_orders_by_latest_chart_then_position(db):
+    assert queue_names(db) == ['Top', 'Second', 'Old', 'Gone']
+
+
+def test_failed_lookup_backs_off_exponentially(db):
+    now = datetime.datetime(2024, 2, 1)
+    song_id = db.execute("SELECT id FROM songs WHERE song_name = 'Top'").fetchone()[0]
+
+    enrichment.record_failure(db, song_id, 0, 'no suitable video', now=now)
+    assert 'Top' not in queue_names(db, now)
+    assert 'Top' in queue_names(db, now + datetime.timedelta(days=1))
+
+    enrichment.record_failure(db, song_id, 1, now=now)
+    assert 'Top' not in queue_names(db, now + datetime.timedelta(days=1))
+    assert 'Top' in queue_names(db, now + datetime.timedelta(days=2))
+
+    assert enrichment.retry_delay(50) == enrichment.RETRY_MAX
+
+
+def test_run_stops_at_budget_and_records_outcomes(db, monkeypatch):
+    looked_up = []
+
+    def fake_lookup(artist, song):
+        looked_up.append(song)
+        youtube.quota.spend('search', youtube.SEARCH_COST)
+        if song == 'Second':
+            return None
+        return {'video_id': f'vid-{song}', 'video_title': song, 'channel_title': artist, 'video_confidence': 50.0}
+
+    patch_lookup(monkeypatch, fake_lookup)
+    stats = enrichment.run_enrichment(budget=2 * (youtube.SEARCH_COST + youtube.VIDEOS_LIST_COST))
+
+    assert looked_up == ['Top', 'Second']
+    assert (stats.updated, stats.failed, stats.deferred) == (1, 1, 2)
+    assert stats.quota_used == 2 * youtube.SEARCH_COST
+    assert db.execute("SELECT video_id FROM songs WHERE song_name = 'Top'").fetchone()[0] == 'vid-Top'
+    retry = db.execute('''
+        SELECT r.attempts FROM video_lookup_retries r JOIN songs s ON s.id = r.song_id
+        WHERE s.song_name = 'Second'
+    ''').fetchone()
+    assert retry[0] == 1
+
+
+def test_cached_lookups_cost_nothing(db):
+    cache = enrichment.get_cache()
+    cache.put_search('Old A', youtube.SEARCH_PAGE_SIZE, [{'id': {'videoId': 'x'}}])
+    assert enrichment.estimate_cost('A', 'Old') == youtube.VIDEOS_LIST_COST
+    cache.put_videos([{'id': 'x'}])
+    assert enrichment.estimate_cost('A', 'Old') == 0
+    assert enrichment.estimate_cost('B', 'Gone') == youtube.SEARCH_COST + youtube.VIDEOS_LIST_COST
+
+
+def test_parallel_run_matches_serial_choices(db, monkeypatch):
+    def fake_lookup(artist, song):
+        time.sleep(0.01)
+        youtube.quota.spend('search', youtube.SEARCH_COST)
+        return {'video_id': f'vid-{song}', 'video_title': song, 'channel_title': artist, 'video_confidence': 50.0}
+
+    patch_lookup(monkeypatch, fake_lookup)
+    stats = enrichment.run_enrichment(budget=10_000, workers=4, rate=0, write_batch=2)
+
+    assert (stats.updated, stats.failed, stats.deferred) == (4, 0, 0)
+    rows = db.execute('SELECT song_name, video_id FROM songs ORDER BY id').fetchall()
+    assert all(video_id == f'vid-{name}' for name, video_id in rows)
+
+
+def test_parallel_run_never_overshoots_budget(db, monkeypatch):
+    def fake_lookup(artist, song):
+        time.sleep(0.01)
+        youtube.quota.spend('search', youtube.SEARCH_COST)
+        return None
+
+    patch_lookup(monkeypatch, fake_lookup)
+    stats = enrichment.run_enrichment(budget=3 * (youtube.SEARCH_COST + youtube.VIDEOS_LIST_COST), workers=4, rate=0)
+
+    assert stats.quota_used == 3 * youtube.SEARCH_COST
+    assert (stats.failed, stats.deferred) == (3, 1)
+
+
+def test_failed_lookups_are_not_backed_off(db, monkeypatch):
+    patch_lookup(monkeypatch, lambda artist, song: youtube.LOOKUP_FAILED)
+    stats = enrichment.run_enrichment(budget=10_000, rate=0)
+
+    assert (stats.updated, stats.failed, stats.unresolved) == (0, 0, 4)
+    assert db.execute('SELECT COUNT(*) FROM video_lookup_retries').fetchone()[0] == 0
+    assert queue_names(db) == ['Top', 'Second', 'Old', 'Gone']
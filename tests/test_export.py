@@ -0,0 +1,89 @@
+import csv
+import gzip
+
+import pytest
+
+from src import database, export
+from tests.test_database import make_chart
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlists_to_db([
+        ('20221230', make_chart(['A', 'B', 'C'])),
+        ('20230106', make_chart(['B', 'C', 'D'])),
+        ('20230113', make_chart(['D', 'E'])),
+    ])
+    conn = database.get_db_connection()
+    conn.execute("UPDATE songs SET video_id = 'vid', video_title = 'Title', channel_title = 'Chan', "
+                 "video_confidence = 42.5 WHERE song_name = 'D'")
+    conn.commit()
+    database.close_db_connections()
+    return tmp_path / 'songs.db'
+
+
+def read_csv(path):
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_latest_playlist_and_songs_include_video_fields(db, tmp_path):
+    jobs = export.plan_exports(db, tmp_path / 'public')
+    export.run_exports(db, jobs, workers=1)
+
+    latest = read_csv(tmp_path / 'public' / 'latest_playlist.csv')
+    assert latest[0] == [name for name, _ in export.CHART_COLUMNS]
+    assert [row[0] for row in latest[1:]] == ['20230113', '20230113']
+    assert latest[1][2] == 'D' and latest[1][9:] == ['vid', 'Title', 'Chan', '42.5']
+    assert latest[2][9:] == ['', '', '', '']
+
+    songs = read_csv(tmp_path / 'public' / 'songs.csv')
+    assert songs[0] == [name for name, _ in export.SONG_COLUMNS]
+    assert [row[1] for row in songs[1:]] == ['A', 'B', 'C', 'D', 'E']
+
+
+def test_history_and_year_partitions_stream_every_row(db, tmp_path):
+    out = tmp_path / 'public'
+    jobs = export.plan_exports(db, out, history=True, by_year=True)
+    results = export.run_exports(db, jobs, workers=3, chunk_size=2)
+
+    assert {r.name: r.rows for r in results} == {
+        'latest_playlist': 2, 'songs': 5, 'chart_history': 8, 'chart_history_2022': 3, 'chart_history_2023': 5,
+    }
+    history = read_csv(out / 'history' / 'chart_history.csv.gz')
+    assert [(row[0], row[1]) for row in history[1:4]] == [('20221230', '1'), ('20221230', '2'), ('20221230', '3')]
+    by_year = read_csv(out / 'history' / 'by_year' / 'chart_history_2023.csv.gz')
+    assert by_year[1:] == history[4:]
+    assert not list(out.rglob('*.tmp'))
+
+
+def test_unknown_format_is_rejected(db, tmp_path):
+    with pytest.raises(ValueError):
+        export.plan_exports(db, tmp_path, formats=['xlsx'])
+
+
+@pytest.mark.skipif(not export._PYARROW_AVAILABLE, reason='pyarrow not installed')
+def test_parquet_matches_csv(db, tmp_path):
+    import pyarrow.parquet as pq
+
+    jobs = export.plan_exports(db, tmp_path, formats=[], history_formats=['parquet', 'csv'], history=True)
+    export.run_exports(db, jobs, chunk_size=3)
+    table = pq.read_table(tmp_path / 'history' / 'chart_history.parquet')
+    rows = read_csv(tmp_path / 'history' / 'chart_history.csv')
+    assert table.column_names == rows[0]
+    assert table.num_rows == len(rows) - 1
+
+
+def test_songs_export_works_before_song_canonical_exists(db, tmp_path):
+    conn = database.get_db_connection()
+    conn.execute('DROP TABLE song_canonical')
+    conn.commit()
+    database.close_db_connections()
+
+    jobs = export.plan_exports(db, tmp_path / 'public')
+    export.run_exports(db, jobs, workers=1)
+    songs = read_csv(tmp_path / 'public' / 'songs.csv')
+    assert all(row[0] == row[7] for row in songs[1:])
@@ -0,0 +1,100 @@
+import datetime
+from pathlib import Path
+
+import src.fetcher as fetcher
+from src.fetcher import ChartCache, fetch_chart_html
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+URL = 'https://example.test/chart'
+
+
+def test_recent_chart_revalidates_with_etag(tmp_path, monkeypatch):
+    cache = ChartCache(tmp_path)
+    session = FakeSession([
+        FakeResponse(200, '<html>v1</html>', {'ETag': '"abc"', 'Last-Modified': 'Fri, 03 Oct 2025 00:00:00 GMT'}),
+        FakeResponse(304),
+    ])
+    monkeypatch.setattr(fetcher, 'get_session', lambda: session)
+    today = datetime.date.today()
+
+    assert fetch_chart_html(URL, '7501', today, cache=cache) == '<html>v1</html>'
+    assert fetch_chart_html(URL, '7501', today, cache=cache) == '<html>v1</html>'
+    assert session.calls[0] == {}
+    assert session.calls[1] == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Fri, 03 Oct 2025 00:00:00 GMT'}
+
+
+def test_historical_chart_served_without_network(tmp_path, monkeypatch):
+    cache = ChartCache(tmp_path)
+    session = FakeSession([FakeResponse(200, '<html>old</html>')])
+    monkeypatch.setattr(fetcher, 'get_session', lambda: session)
+    old = datetime.date(2001, 1, 5)
+
+    assert fetch_chart_html(URL, '7501', old, cache=cache) == '<html>old</html>'
+    assert fetch_chart_html(URL, '7501', old, cache=cache) == '<html>old</html>'
+    assert len(session.calls) == 1
+
+
+def test_identical_pages_share_one_object(tmp_path):
+    cache = ChartCache(tmp_path)
+    a = cache.put('7501', '20010105', URL, '<html>same</html>')
+    b = cache.put('7501', '20010112', URL, '<html>same</html>')
+    assert a['sha256'] == b['sha256']
+    assert len(list((tmp_path / 'objects').rglob('*.html'))) == 1
+
+
+def test_failed_fetch_is_not_cached(tmp_path, monkeypatch):
+    cache = ChartCache(tmp_path)
+    monkeypatch.setattr(fetcher, 'get_session', lambda: FakeSession([FakeResponse(404)]))
+    assert fetch_chart_html(URL, '7501', datetime.date(2001, 1, 5), cache=cache) is None
+    assert cache.get('7501', '20010105') == (None, None)
+
+
+def test_refresh_replaces_a_pinned_historical_page(tmp_path, monkeypatch):
+    cache = ChartCache(tmp_path)
+    old = datetime.date(2001, 1, 5)
+    cache.put('7501', '20010105', URL, '<html>truncated')
+    session = FakeSession([FakeResponse(200, '<html>full</html>')])
+    monkeypatch.setattr(fetcher, 'get_session', lambda: session)
+
+    assert fetch_chart_html(URL, '7501', old, cache=cache) == '<html>truncated'
+    assert fetch_chart_html(URL, '7501', old, cache=cache, refresh=True) == '<html>full</html>'
+    assert session.calls == [{}]
+    assert cache.get('7501', '20010105')[1] == '<html>full</html>'
+    cache.discard('7501', '20010105')
+    assert cache.get('7501', '20010105') == (None, None)
+
+
+def test_short_chart_is_downloaded_again_and_not_pinned(tmp_path, monkeypatch):
+    from src import scraper
+    monkeypatch.setattr(fetcher, 'CACHE_DIR', tmp_path)
+    old = datetime.date(2001, 1, 5)
+    url = scraper.chart_url(old)
+    full = (Path(__file__).parent / 'fixtures' / 'charts' / 'singles_top100.html').read_text(encoding='utf-8')
+    ChartCache().put('7501', '20010105', url, '<html>error</html>')
+    session = FakeSession([FakeResponse(200, full)] + [FakeResponse(200, '<html>error</html>')] * 2)
+    monkeypatch.setattr(fetcher, 'get_session', lambda: session)
+
+    assert len(scraper.scrape_songs(old)) == 100
+    assert ChartCache().get('7501', '20010105')[1] == full
+
+    # A page that is still short after the refresh is dropped from the cache
+    ChartCache().discard('7501', '20010105')
+    assert scraper.scrape_songs(old) == []
+    assert ChartCache().get('7501', '20010105') == (None, None)
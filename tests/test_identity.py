@@ -0,0 +1,57 @@
+import pytest
+
+from src import database, enrichment, identity
+from tests.test_enrichment import chart
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlists_to_db([
+        ('20240105', chart(("DON'T LET GO (LOVE)", 'EN VOGUE'), ('HEAVEN', 'DJ SAMMY'),
+                           ('HARD BEAT EP 17', 'VARIOUS ARTISTS'), ('IN THE AIR TONIGHT', 'PHIL COLLINS'),
+                           ('SHAPE OF YOU', 'ED SHEERAN'), ('SHAPE OF YOU (FT X)', 'ED SHEERAN'))),
+        ('20240112', chart(('DONT LET GO (LOVE)', 'EN VOGUE'), ('HEAVEN', 'DJ SAMMY & YANOU FT DO'),
+                           ('HARD BEAT EP 21', 'VARIOUS ARTISTS'), ('IN THE AIR TONITE', "LIL' KIM FT PHIL COLLINS"))),
+        ('20240119', chart(('DONT LET GO (LOVE)', 'EN VOGUE'))),
+    ])
+    yield database.get_db_connection()
+    database.close_db_connections()
+
+
+def names(conn, ids):
+    return [tuple(conn.execute('SELECT song_name, artist FROM songs WHERE id = ?', (i,)).fetchone()) for i in ids]
+
+
+def test_keys_fold_credits_and_punctuation():
+    assert identity.title_key("Don't Let Go (Love) (feat. X)") == 'dont let go love'
+    assert identity.lead_artist('Sigala FT Ella Eyre') == identity.lead_artist('SIGALA & ELLA EYRE') == 'sigala'
+    assert identity.lead_artist('Diddy - Dirty Money/Skylar Grey') == 'diddydirtymoney'
+
+
+def test_groups_duplicates_but_not_numbered_releases_covers_or_cocharting_songs(conn):
+    groups = identity.find_identity_groups(conn)
+    # The two SHAPE OF YOU rows match but share a chart, so they are different entries
+    assert [names(conn, g.members) for g in groups] == [
+        [('HEAVEN', 'DJ SAMMY'), ('HEAVEN', 'DJ SAMMY & YANOU FT DO')],
+        # The version with more chart weeks is canonical
+        [('DONT LET GO (LOVE)', 'EN VOGUE'), ("DON'T LET GO (LOVE)", 'EN VOGUE')],
+    ]
+
+
+def test_duplicates_share_videos_and_skip_the_lookup_queue(conn):
+    conn.execute("UPDATE songs SET video_id = 'vid' WHERE song_name = 'HEAVEN' AND artist = 'DJ SAMMY'")
+    identity.resolve_song_identities(conn)
+    conn.commit()
+
+    heaven = conn.execute("SELECT id FROM songs WHERE artist = 'DJ SAMMY & YANOU FT DO'").fetchone()[0]
+    assert conn.execute('SELECT video_id FROM songs WHERE id = ?', (heaven,)).fetchone()[0] == 'vid'
+    assert identity.canonical_id(conn, heaven) != heaven
+
+    queued = {t.song_name for t in enrichment.load_enrichment_queue(conn)}
+    assert "DON'T LET GO (LOVE)" not in queued and 'DONT LET GO (LOVE)' in queued
+
+    canonical = conn.execute("SELECT id FROM songs WHERE song_name = 'DONT LET GO (LOVE)'").fetchone()[0]
+    enrichment.record_success(conn, canonical, {'video_id': 'ev'})
+    assert {row[0] for row in conn.execute("SELECT video_id FROM songs WHERE artist = 'EN VOGUE'")} == {'ev'}
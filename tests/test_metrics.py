@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from src import database, metrics
+from tests.test_enrichment import chart
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.metrics.reset()
+    yield
+    metrics.metrics.reset()
+
+
+def test_summary_percentiles_and_timer_records_failures():
+    summary = metrics.summarize([float(v) for v in range(100, 0, -1)])
+    assert (summary['count'], summary['min'], summary['max']) == (100, 1.0, 100.0)
+    assert (summary['p50'], summary['p90'], summary['p99']) == (50.0, 90.0, 99.0)
+
+    with pytest.raises(ValueError):
+        with metrics.timer('stage.failing'):
+            raise ValueError
+    assert len(metrics.metrics.histograms['stage.failing']) == 1
+    assert metrics.metrics.counters == {'stage.failing.errors': 1}
+
+
+def test_db_writes_are_counted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlist_to_db('20240105', chart(('A', 'X'), ('B', 'Y')))
+    database.add_playlists_to_db([('20240112', chart(('A', 'X'), ('C', 'Z'))), ('20240119', chart(('D', 'W')))])
+    database.close_db_connections()
+
+    counters = metrics.metrics.counters
+    assert (counters['db.charts_written'], counters['db.chart_rows_written'], counters['db.songs_inserted']) == (3, 5, 4)
+    assert set(metrics.metrics.histograms) == {'db.add_playlist', 'db.add_playlists'}
+    assert 'db.add_playlist.errors' not in counters
+
+
+def test_failed_db_write_is_counted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    bad = chart(('A', 'X'))
+    del bad[0]['peak']
+    database.add_playlist_to_db('20240105', bad)
+    database.close_db_connections()
+
+    counters = metrics.metrics.counters
+    assert counters['db.add_playlist.errors'] == 1
+    assert 'db.charts_written' not in counters
+    assert len(metrics.metrics.histograms['db.add_playlist']) == 1
+
+
+def test_run_report_keeps_other_scripts(tmp_path):
+    path = tmp_path / 'public' / 'run_report.json'
+    metrics.count('youtube.quota_units', 101)
+    metrics.observe('youtube.search', 0.25)
+    metrics.write_run_report('update_videos', path, extra={'enrichment': {'updated': 1}})
+    metrics.metrics.reset()
+    metrics.count('export.rows_written', 10)
+    metrics.write_run_report('export_csv', path)
+
+    runs = json.loads(path.read_text())['runs']
+    assert set(runs) == {'update_videos', 'export_csv'}
+    assert runs['update_videos']['counters'] == {'youtube.quota_units': 101}
+    assert runs['update_videos']['stages']['youtube.search']['p99'] == 0.25
+    assert runs['update_videos']['enrichment'] == {'updated': 1}
+    assert runs['export_csv']['stages'] == {}
@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+
+from src import migrations
+from src.migrations import get_schema_version, latest_version, migrate
+
+
+def legacy_db(path):
+    """Schema as shipped in songs.db before migrations: no keys, no video columns."""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE songs (id INTEGER PRIMARY KEY, song_name TEXT NOT NULL, artist TEXT NOT NULL, video_id TEXT);
+        CREATE TABLE playlists (id INTEGER PRIMARY KEY, date TEXT NOT NULL);
+        CREATE TABLE playlist_songs (
+            playlist_id INTEGER, song_id INTEGER, position INTEGER, lw INTEGER,
+            peak INTEGER, weeks INTEGER, is_new INTEGER, is_reentry INTEGER
+        );
+        INSERT INTO songs VALUES (1, 'SANTA TELL ME', 'ARIANA GRANDE', NULL);
+        INSERT INTO songs VALUES (2, 'SANTA TELL ME', 'ARIANA GRANDE', 'abc');
+        INSERT INTO songs VALUES (3, 'SANTA TELL ME', 'ARIANA GRANDE', 'def');
+        INSERT INTO songs VALUES (4, 'OTHER', 'ARIANA GRANDE', NULL);
+        INSERT INTO playlists VALUES (1, '20231222');
+        INSERT INTO playlists VALUES (2, '20231229');
+        INSERT INTO playlists VALUES (3, '20231229');
+        INSERT INTO playlist_songs VALUES (1, 1, 1, 0, 1, 1, 1, 0);
+        INSERT INTO playlist_songs VALUES (2, 4, 1, 0, 1, 1, 1, 0);
+        INSERT INTO playlist_songs VALUES (3, 2, 1, 0, 1, 2, 0, 0);
+        INSERT INTO playlist_songs VALUES (3, 4, 2, 0, 2, 2, 0, 0);
+    ''')
+    conn.commit()
+    return conn
+
+
+def index_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_migrate_legacy_database(tmp_path):
+    conn = legacy_db(tmp_path / 'songs.db')
+
+    assert migrate(conn) == latest_version()
+    assert get_schema_version(conn) == latest_version()
+    assert {'idx_playlists_date', 'idx_songs_artist_song', 'idx_playlist_songs_position'} <= index_names(conn)
+
+    # Duplicate songs collapse onto the lowest id, inheriting a video
+    assert conn.execute('SELECT id, video_id FROM songs ORDER BY id').fetchall() == [(1, 'abc'), (4, None)]
+    # The fuller copy of a duplicated date survives
+    assert conn.execute('SELECT id, date FROM playlists ORDER BY id').fetchall() == [(1, '20231222'), (3, '20231229')]
+    assert conn.execute('SELECT playlist_id, song_id FROM playlist_songs ORDER BY 1, 2').fetchall() == [(1, 1), (3, 1), (3, 4)]
+
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO playlists (date) VALUES ('20231222')")
+
+
+def test_migrate_is_idempotent(tmp_path):
+    conn = legacy_db(tmp_path / 'songs.db')
+    migrate(conn)
+    before = conn.execute('SELECT * FROM songs').fetchall()
+    assert migrate(conn) == latest_version()
+    assert conn.execute('SELECT * FROM songs').fetchall() == before
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    conn = legacy_db(tmp_path / 'songs.db')
+    last_good = latest_version()
+
+    def broken(conn):
+        conn.execute('CREATE TABLE half_done (id INTEGER)')
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [(last_good + 1, 'broken', broken)])
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+
+    assert get_schema_version(conn) == last_good
+    assert 'half_done' not in {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+
+
+def test_song_ids_are_never_reissued_after_migrating(tmp_path):
+    conn = legacy_db(tmp_path / 'songs.db')
+    migrate(conn)
+
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'songs'").fetchone()[0]
+    assert 'AUTOINCREMENT' in sql
+    assert {'idx_songs_artist_song'} <= index_names(conn)
+    assert conn.execute('SELECT id, song_name FROM songs ORDER BY id').fetchall() == [(1, 'SANTA TELL ME'), (4, 'OTHER')]
+
+    conn.execute('DELETE FROM songs WHERE id = 4')
+    conn.execute("INSERT INTO songs (song_name, artist) VALUES ('NEW', 'ARIANA GRANDE')")
+    assert conn.execute("SELECT id FROM songs WHERE song_name = 'NEW'").fetchone() == (5,)
+    # The full-text triggers came through the rebuild
+    assert conn.execute("SELECT rowid FROM songs_fts WHERE songs_fts MATCH 'new'").fetchall() == [(5,)]
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from src import database, queries
+from tests.test_database import make_chart
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queries.clear_playlist_cache()
+    database.create_tables_if_needed()
+    database.add_playlists_to_db([
+        ('20240105', make_chart(['A', 'B'])),
+        ('20240112', make_chart(['B', 'C'])),
+        ('20240119', make_chart(['C'])),
+    ])
+    yield tmp_path / 'songs.db'
+    database.close_db_connections()
+
+
+def test_batch_and_range_lookups(db):
+    playlists = queries.get_playlists(['20240119', '20240105', '20990101'])
+    assert list(playlists) == ['20240119', '20240105']
+    assert [(e.position, e.song_name, e.song_id) for e in playlists['20240105']] == [(1, 'A', 1), (2, 'B', 2)]
+
+    by_range = queries.get_playlist_range('20240106', '20240131')
+    assert list(by_range) == ['20240112', '20240119']
+    assert queries.get_playlist('20990101') is None
+    assert queries.latest_chart_date() == '20240119'
+
+    entry = playlists['20240119'][0]
+    assert entry.song_name == entry[3] == 'C'
+    with pytest.raises(AttributeError):
+        entry.position = 2
+
+
+def test_cache_is_bounded_and_dropped_on_writes(db, monkeypatch):
+    monkeypatch.setattr(queries, 'PLAYLIST_CACHE_SIZE', 2)
+    queries.get_playlists(['20240105', '20240112'])
+    queries.get_playlist('20240105')
+    queries.get_playlist('20240119')
+    assert queries.playlist_cache_dates() == ['20240105', '20240119']
+
+    database.add_playlist_to_db('20240105', make_chart(['Z']))
+    assert [e.song_name for e in queries.get_playlist('20240105')] == ['Z']
+
+    # A commit from another connection is noticed too
+    other = sqlite3.connect(db)
+    other.execute("UPDATE songs SET video_id = 'vid' WHERE song_name = 'Z'")
+    other.commit()
+    other.close()
+    assert queries.get_playlist('20240105')[0].video_id == 'vid'
@@ -0,0 +1,56 @@
+import pytest
+
+from src import database, rescore, video_selector
+from src.candidates import load_archived_songs, store_candidates
+from src.video_selector import VideoCandidate, select_best_video
+
+
+def candidate(video_id, title, channel='Channel', views=1000):
+    return VideoCandidate(video_id, title, channel, views, 210, '10', '2024-01-01T00:00:00Z')
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlist_to_db('20240105', [
+        {'position': i, 'song_name': name, 'artist': artist, 'lw': 0, 'peak': i, 'weeks': 1,
+         'is_new': True, 'is_reentry': False}
+        for i, (name, artist) in enumerate([('Cardigan', 'Taylor Swift'), ('Flowers', 'Miley Cyrus')], 1)
+    ])
+    conn = database.get_db_connection()
+    archive = {
+        'Cardigan': [candidate('lyr', 'Taylor Swift - Cardigan (Lyrics)', views=9_000_000),
+                     candidate('off', 'Taylor Swift - Cardigan (Official Video)', 'Taylor Swift')],
+        'Flowers': [candidate('fl1', 'Miley Cyrus - Flowers (Official Video)', 'Miley Cyrus'),
+                    candidate('fl2', 'Miley Cyrus - Flowers (Live at the BBC)')],
+    }
+    for song_id, song_name, artist in conn.execute('SELECT id, song_name, artist FROM songs').fetchall():
+        best = select_best_video(list(archive[song_name]), artist, song_name)
+        conn.execute('UPDATE songs SET video_id = ? WHERE id = ?', (best.video_id, song_id))
+        store_candidates(conn, song_id, archive[song_name])
+    conn.commit()
+    yield conn
+    database.close_db_connections()
+
+
+def test_archive_round_trips_in_search_order(db):
+    songs = load_archived_songs(db)
+    assert [[row[0] for row in rows] for _, _, _, _, rows in songs] == [['lyr', 'off'], ['fl1', 'fl2']]
+
+
+def test_rescore_only_touches_changed_picks(db, monkeypatch):
+    first = rescore.rescore_archive(workers=2, chunk_size=1)
+    assert first.scored == 2 and first.changes == []
+    assert rescore.rescore_archive(workers=1).up_to_date
+
+    # Make lyric videos attractive: only Cardigan's pick should move
+    monkeypatch.setitem(video_selector.WEIGHTS, 'lyrics_penalty', 100.0)
+    dry = rescore.rescore_archive(workers=1, dry_run=True)
+    assert [(c.song_name, c.old_video_id, c.video_id) for c in dry.changes] == [('Cardigan', 'off', 'lyr')]
+    assert db.execute("SELECT video_id FROM songs WHERE song_name = 'Cardigan'").fetchone()[0] == 'off'
+
+    applied = rescore.rescore_archive(workers=1)
+    assert [c.video_id for c in applied.changes] == ['lyr']
+    assert db.execute("SELECT video_id FROM songs WHERE song_name = 'Cardigan'").fetchone()[0] == 'lyr'
+    assert rescore.rescore_archive(workers=1).up_to_date
@@ -3,7 +3,8 @@ import datetime
 import sys
 import os
 
-# Add the src directory to the Python path
+# Add the project root and src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from scraper import scrape_songs
@@ -0,0 +1,46 @@
+import pytest
+
+from src import database
+from src.search import fold, match_expression, search_artists, search_songs
+from tests.test_database import make_chart
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    chart = make_chart(['CRAZY IN LOVE', 'HALO', 'SHAPE OF YOU', 'PERFECT'])
+    chart[0]['artist'] = chart[1]['artist'] = 'BEYONCÉ'
+    chart[2]['artist'] = chart[3]['artist'] = 'ED SHEERAN'
+    database.add_playlist_to_db('20240105', chart)
+    database.add_playlist_to_db('20240112', make_chart(['HALO'], artist='BEYONCÉ'))
+    yield database.get_db_connection()
+    database.close_db_connections()
+
+
+def test_fold_and_match_expression():
+    assert fold('Beyoncé & JAY-Z') == 'beyonce jay z'
+    assert match_expression("don't stop") == '"don"* AND "t"* AND "stop"*'
+    assert match_expression('ed sheeran', column='artist', prefix_len=3) == 'artist : ("ed"* AND "she"*)'
+    assert match_expression('!!') is None
+
+
+def test_prefix_typo_and_diacritic_search(conn):
+    assert [r.song_name for r in search_songs('beyonce cra')] == ['CRAZY IN LOVE']
+    assert search_songs('shaep of you')[0].song_name == 'SHAPE OF YOU'
+    # Ties go to the song with more chart weeks
+    assert [r.song_name for r in search_songs('beyonce')] == ['HALO', 'CRAZY IN LOVE']
+    assert search_artists('ed sh') == ['ED SHEERAN']
+    assert search_songs('zzz') == []
+
+
+def test_index_follows_song_changes(conn):
+    conn.execute("UPDATE songs SET song_name = 'THINKING OUT LOUD' WHERE song_name = 'PERFECT'")
+    conn.execute("DELETE FROM songs WHERE song_name = 'SHAPE OF YOU'")
+    conn.commit()
+
+    assert [r.song_name for r in search_songs('thinking')] == ['THINKING OUT LOUD']
+    assert search_songs('perfect') == []
+    assert [r.song_name for r in search_songs('ed sheeran')] == ['THINKING OUT LOUD']
+    # Raises if the index and the songs table disagree
+    conn.execute("INSERT INTO songs_fts (songs_fts, rank) VALUES ('integrity-check', 1)")
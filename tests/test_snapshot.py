@@ -0,0 +1,83 @@
+import gzip
+import sqlite3
+
+import pytest
+
+from src import database, snapshot
+from tests.test_database import make_chart
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.create_tables_if_needed()
+    database.add_playlists_to_db([('20240105', make_chart(['A', 'B', 'C'])), ('20240112', make_chart(['C', 'A']))])
+    database.close_db_connections()
+    return tmp_path / 'songs.db'
+
+
+def test_snapshot_keeps_reader_data_in_compact_form(db, tmp_path):
+    out = tmp_path / 'public' / 'songs.db'
+    out.parent.mkdir()
+    report = snapshot.snapshot_with_report(db, out, compress=['gz'])
+
+    assert out.stat().st_mode & 0o222 == 0
+    assert gzip.decompress((out.parent / 'songs.db.gz').read_bytes()) == out.read_bytes()
+    assert report.compressed['gz'] < report.snapshot_bytes
+    assert set(report.query_seconds) == set(snapshot.QUERIES)
+
+    conn = sqlite3.connect(f'{out.as_uri()}?mode=ro', uri=True)
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    assert sorted(tables) == ['playlist_songs', 'playlists', 'snapshot_meta', 'songs']
+    assert conn.execute('SELECT typeof(date) FROM playlists').fetchone() == ('integer',)
+    assert conn.execute('PRAGMA journal_mode').fetchone() == ('delete',)
+    # migrate() must not take the snapshot for a fully migrated database
+    assert conn.execute('PRAGMA user_version').fetchone() == (0,)
+    assert snapshot.snapshot_format(conn) == snapshot.SNAPSHOT_FORMAT
+    # Existing string-date queries still match the INTEGER column
+    rows = conn.execute(snapshot.QUERIES['playlist_by_date'], ('20240112',)).fetchall()
+    assert [(r[0], r[1]) for r in rows] == [(1, 'C'), (2, 'A')]
+    history = conn.execute(snapshot.QUERIES['song_history'], (1,)).fetchall()
+    assert [(r[0], r[1]) for r in history] == [(20240105, 1), (20240112, 2)]
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+    assert indexes == {'idx_playlists_date'}
+    conn.close()
+
+    snapshot.build_snapshot(db, out, history_index=True)
+    conn = sqlite3.connect(f'{out.as_uri()}?mode=ro', uri=True)
+    plan = ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + snapshot.QUERIES['song_history'], (1,)))
+    assert 'USING INDEX idx_playlist_songs_song' in plan
+    conn.close()
+
+
+def test_snapshot_warns_when_it_grows_over_the_previous_publication(db, tmp_path, caplog):
+    out = tmp_path / 'songs_snapshot.db'
+    report = snapshot.snapshot_with_report(db, out, compress=None)
+    assert report.previous_bytes is None
+
+    # Rebuilding over the existing file compares against it
+    report = snapshot.snapshot_with_report(db, out, compress=None)
+    assert report.previous_bytes == report.snapshot_bytes
+    assert 'grew' not in caplog.text
+
+    assert set(report.query_seconds['song_history']) == {'source', 'previous', 'snapshot'}
+
+    previous = tmp_path / 'previous.db'
+    previous.write_bytes(b'x' * (report.snapshot_bytes // 2))
+    report = snapshot.snapshot_with_report(db, out, compress=None, previous_path=previous)
+    assert report.previous_bytes == report.snapshot_bytes // 2
+    assert 'Snapshot grew 100.0% over the previous publication' in caplog.text
+    assert 'previous' not in report.query_seconds['song_history']
+
+
+def test_derived_tables_go_to_a_separate_extras_snapshot(db, tmp_path):
+    out = tmp_path / 'songs_extras.db'
+    snapshot.build_snapshot(db, out, extras=True)
+
+    conn = sqlite3.connect(f'{out.as_uri()}?mode=ro', uri=True)
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    assert sorted(tables) == ['artist_stats', 'artists', 'snapshot_meta', 'song_artists', 'song_canonical',
+                              'song_sparklines', 'song_stats']
+    assert conn.execute('SELECT weeks, first_date FROM song_stats WHERE song_id = 1').fetchone() == (2, 20240105)
+    conn.close()
@@ -0,0 +1,57 @@
+import copy
+
+import numpy as np
+
+from src import tuning, video_selector
+from src.video_selector import best_of, score_candidate
+
+from tests.test_video_selector import synthetic_songs
+
+
+def archived(songs):
+    """Turn (candidates, artist, song) into load_archived_songs-style tuples."""
+    out = []
+    for song_id, (candidates, artist, song) in enumerate(songs):
+        rows = [(c.video_id, c.title, c.channel_title, c.view_count, c.duration_seconds, c.category_id,
+                 c.published_at) for c in candidates]
+        out.append((song_id, artist, song, '', rows))
+    return out
+
+
+def reference_picks(songs):
+    picks = {}
+    for song_id, (candidates, artist, song) in enumerate(songs):
+        scored = [score_candidate(copy.copy(c), artist, song) for c in candidates]
+        picks[song_id] = best_of(scored).video_id
+    return picks
+
+
+def test_feature_scores_match_score_candidate():
+    songs = synthetic_songs()
+    labels = {song_id: candidates[0].video_id for song_id, (candidates, _, _) in enumerate(songs)}
+    fs = tuning.build_feature_set(archived(songs), labels)
+
+    expected = [score_candidate(copy.copy(c), artist, song).score for candidates, artist, song in songs for c in candidates]
+    got = tuning.scores(fs, tuning.weight_vector(video_selector.WEIGHTS)[None, :])[:, 0]
+    assert np.allclose(got, expected)
+
+
+def test_current_weights_reproduce_their_own_picks():
+    songs = synthetic_songs()
+    fs = tuning.build_feature_set(archived(songs), reference_picks(songs))
+    assert tuning.evaluate(fs, tuning.weight_vector(video_selector.WEIGHTS)).tolist() == [1.0]
+
+
+def test_search_recovers_changed_weights(monkeypatch):
+    songs = synthetic_songs(count=60)
+    # Label with the picks a stronger lyrics penalty would make
+    monkeypatch.setitem(video_selector.WEIGHTS, 'lyrics_penalty', -200.0)
+    labels = reference_picks(songs)
+    monkeypatch.undo()
+
+    fs = tuning.build_feature_set(archived(songs), labels)
+    base = tuning.weight_vector(video_selector.WEIGHTS)
+    configs = tuning.grid_configs(base, {'lyrics_penalty': [-30.0, -200.0]})
+    accuracy = tuning.evaluate(fs, configs)
+    assert accuracy[2] == 1.0
+    assert accuracy[0] == accuracy[1] < 1.0
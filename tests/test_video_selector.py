@@ -1,6 +1,12 @@
+import copy
+import random
+
 import pytest
 
-from src.video_selector import VideoCandidate, select_best_video, score_candidate
+from src import video_selector
+from src.video_selector import (
+    PhraseMatcher, VideoCandidate, score_candidate, score_candidates_batch, score_song_batches, select_best_video,
+)
 
 def make_candidate(**kwargs):
     base = dict(
@@ -62,3 +68,50 @@ def test_rapidfuzz_similarity_boost(artist_song):
     poorer = make_candidate(video_id='p1', title='Swift Taylor - Crdgn (Teaser)')
     best = select_best_video([poorer, good], artist, song)
     assert best.video_id == 'g1', 'Expected higher RapidFuzz similarity candidate to win'
+
+
+def synthetic_songs(count=40, per_song=15):
+    rng = random.Random(7)
+    words = ['love', 'night', 'Official', 'Video', 'lyrics', 'live at', 'remix', 'official audio', 'cover by',
+             'HQ', 'visualiser', 'static image', 'music', 'MV', 'letra', 'bootleg', 'l y r i c', 'session']
+    songs = []
+    for s in range(count):
+        artist = f'{rng.choice(words).title()} {rng.choice(words).title()}'
+        song = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+        candidates = [make_candidate(
+            video_id=f'v{s}_{i}',
+            title=' '.join(rng.choice(words + [artist, song]) for _ in range(rng.randint(1, 7))),
+            channel_title=rng.choice([artist, f'{artist}VEVO', 'Lyrics Hub', '']),
+            view_count=rng.choice([0, 500, 10 ** 7]),
+            duration_seconds=rng.choice([None, 60, 200, 900]),
+            category_id=rng.choice(['10', '22', None]),
+        ) for i in range(per_song)]
+        songs.append((candidates, artist, song))
+    return songs
+
+
+def outcome(candidates):
+    return [(c.video_id, c.score, c.reasons) for c in candidates]
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_batch_scoring_matches_score_candidate(monkeypatch, vectorized):
+    assert video_selector._CDIST_AVAILABLE
+    monkeypatch.setattr(video_selector, '_CDIST_AVAILABLE', vectorized)
+    monkeypatch.setattr(video_selector, 'VECTORIZE_MIN_PAIRS', 1)
+    songs = synthetic_songs()
+
+    expected = [outcome([score_candidate(copy.copy(c), artist, song) for c in candidates])
+                for candidates, artist, song in songs]
+    per_song = [outcome(score_candidates_batch([copy.copy(c) for c in candidates], artist, song))
+                for candidates, artist, song in songs]
+    together = [outcome(r) for r in score_song_batches([([copy.copy(c) for c in candidates], artist, song)
+                                                        for candidates, artist, song in songs])]
+    assert per_song == expected
+    assert together == expected
+
+
+def test_phrase_matcher_reports_overlapping_categories():
+    matcher = PhraseMatcher({'a': ['live'], 'b': ['live at'], 'c': ['at the'], 'd': ['remix']})
+    assert matcher.match('live at the o2') == {'a', 'b', 'c'}
+    assert matcher.match('liv') == set()
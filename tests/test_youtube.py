@@ -0,0 +1,219 @@
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from src import youtube
+from src.youtube_cache import YouTubeCache, normalize_query, set_cache
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self, http=None):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeYouTube:
+    """Minimal stand-in for the googleapiclient YouTube service."""
+
+    def __init__(self, search_items, videos):
+        self.search_items = search_items
+        self.videos_by_id = {v['id']: v for v in videos}
+        self.calls = []
+
+    def search(self):
+        return self
+
+    def videos(self):
+        return FakeVideos(self)
+
+    def list(self, **kwargs):
+        self.calls.append(('search', kwargs))
+        return FakeRequest({'items': self.search_items})
+
+
+class FakeVideos:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, id, part):
+        ids = id.split(',')
+        self.service.calls.append(('videos', ids))
+        return FakeRequest({'items': [self.service.videos_by_id[i] for i in ids if i in self.service.videos_by_id]})
+
+
+def search_item(video_id, title, channel):
+    return {'id': {'videoId': video_id}, 'snippet': {'title': title, 'channelTitle': channel}}
+
+
+def video(video_id, title, channel, views=1000):
+    return {
+        'id': video_id,
+        'snippet': {'title': title, 'channelTitle': channel, 'categoryId': '10'},
+        'statistics': {'viewCount': str(views)},
+        'contentDetails': {'duration': 'PT3M30S'},
+    }
+
+
+@pytest.fixture
+def fake_service(tmp_path, monkeypatch):
+    service = FakeYouTube(
+        [search_item('off1', 'Taylor Swift - cardigan (Official Music Video)', 'Taylor Swift'),
+         search_item('lyr1', 'Taylor Swift - cardigan (Lyrics)', 'Lyrics Hub')],
+        [video('off1', 'Taylor Swift - cardigan (Official Music Video)', 'Taylor Swift', 5_000_000),
+         video('lyr1', 'Taylor Swift - cardigan (Lyrics)', 'Lyrics Hub')],
+    )
+    set_cache(YouTubeCache(tmp_path / 'youtube.db'))
+    youtube.set_client_pool(youtube.YouTubeClientPool(['key1'], build=lambda key: service, rate=0))
+    yield service
+    youtube.set_client_pool(None)
+    set_cache(None)
+
+
+def test_repeat_lookup_costs_no_api_calls(fake_service):
+    first = youtube.get_best_youtube_video('Taylor Swift', 'Cardigan')
+    assert first['video_id'] == 'off1'
+    assert [c[0] for c in fake_service.calls] == ['search', 'videos']
+
+    again = youtube.get_best_youtube_video('Taylor Swift', 'Cardigan')
+    scored = youtube.get_scored_candidates('Taylor Swift', 'Cardigan', limit=15)
+    youtube.get_best_youtube_video('TAYLOR SWIFT', 'cardigan')  # same normalized query
+    assert again == first
+    assert scored[0]['video_id'] == 'off1'
+    assert len(fake_service.calls) == 2
+
+
+def test_cache_entries_expire(tmp_path):
+    cache = YouTubeCache(tmp_path / 'youtube.db', search_ttl=60)
+    cache.put_search('Cardigan Taylor Swift', 15, [{'id': {'videoId': 'x'}}])
+    assert cache.get_search('cardigan  taylor swift!', 15) == [{'id': {'videoId': 'x'}}]
+    assert cache.get_search('cardigan taylor swift', 50) is None
+
+    cache.search_ttl = -1
+    cache.put_search('Cardigan Taylor Swift', 15, [])
+    assert cache.get_search('Cardigan Taylor Swift', 15) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = YouTubeCache(tmp_path / 'youtube.db', max_entries=10)
+    cache.put_videos([{'id': f'v{i}'} for i in range(20)])
+    time.sleep(0.01)
+    cache.get_videos(['v0'])
+    cache.evict()
+    remaining = cache.get_videos([f'v{i}' for i in range(20)])
+    assert len(remaining) == 9
+    assert 'v0' in remaining
+
+
+def test_normalize_query_keeps_non_latin_text():
+    assert normalize_query('BEYONCÉ - Halo!') == 'beyoncé halo'
+    assert normalize_query('방탄소년단 Dynamite') != normalize_query('Dynamite')
+
+
+class QuotaExceededYouTube(FakeYouTube):
+    def list(self, **kwargs):
+        self.calls.append(('search', kwargs))
+        return FakeRequest(HttpError(httplib2.Response({'status': 403}), b'quotaExceeded'))
+
+
+def test_quota_failover_builds_each_client_once(tmp_path):
+    good = FakeYouTube([search_item('off1', 'Cardigan (Official Video)', 'Taylor Swift')],
+                       [video('off1', 'Cardigan (Official Video)', 'Taylor Swift')])
+    services = {'key1': QuotaExceededYouTube([], []), 'key2': good}
+    built = []
+
+    def build(key):
+        built.append(key)
+        return services[key]
+
+    set_cache(YouTubeCache(tmp_path / 'youtube.db'))
+    pool = youtube.YouTubeClientPool(['key1', 'key2'], build=build, rate=0)
+    youtube.set_client_pool(pool)
+    try:
+        assert youtube.get_best_youtube_video('Taylor Swift', 'Cardigan')['video_id'] == 'off1'
+        assert youtube.get_best_youtube_video('Taylor Swift', 'Cardigan 2') is not None
+        assert built == ['key1', 'key2']
+        assert pool.index == 1 and not youtube.keys_exhausted()
+
+        pool.advance(1)
+        assert youtube.keys_exhausted()
+        assert youtube.get_best_youtube_video('Taylor Swift', 'Exile') is None
+    finally:
+        youtube.set_client_pool(None)
+        set_cache(None)
+
+
+class SearchByQueryYouTube(FakeYouTube):
+    def __init__(self, results, videos):
+        super().__init__([], videos)
+        self.results = results
+
+    def list(self, **kwargs):
+        self.calls.append(('search', kwargs))
+        return FakeRequest({'items': self.results[kwargs['q']]})
+
+
+def test_details_are_batched_across_songs(tmp_path):
+    def items(prefix, count):
+        return [search_item(f'{prefix}{i}', f'{prefix} {i}', 'Channel') for i in range(count)]
+
+    # Two songs share a remix upload; together they need 31 distinct ids
+    service = SearchByQueryYouTube(
+        {'Song A Artist': items('a', 15) + [search_item('shared', 'Shared', 'Channel')],
+         'Song B Artist': items('b', 15) + [search_item('shared', 'Shared', 'Channel')]},
+        [video(f'{p}{i}', f'{p} {i}', 'Channel') for p in 'ab' for i in range(15)] + [video('shared', 'Shared', 'Channel')],
+    )
+    set_cache(YouTubeCache(tmp_path / 'youtube.db'))
+    youtube.set_client_pool(youtube.YouTubeClientPool(['key1'], build=lambda key: service, rate=0))
+    try:
+        results = youtube.lookup_best_videos([('Artist', 'Song A'), ('Artist', 'Song B')])
+        detail_calls = [ids for kind, ids in service.calls if kind == 'videos']
+        assert len(detail_calls) == 1
+        assert sorted(detail_calls[0]) == sorted(set(detail_calls[0]))
+        assert len(detail_calls[0]) == 31
+        assert results == [youtube.get_best_youtube_video('Artist', 'Song A'),
+                           youtube.get_best_youtube_video('Artist', 'Song B')]
+        assert len(service.calls) == 3
+    finally:
+        youtube.set_client_pool(None)
+        set_cache(None)
+
+
+class FailingSecondBatchYouTube(SearchByQueryYouTube):
+    def videos(self):
+        return FailingSecondBatchVideos(self)
+
+
+class FailingSecondBatchVideos(FakeVideos):
+    def list(self, id, part):
+        request = super().list(id, part)
+        if sum(kind == 'videos' for kind, _ in self.service.calls) > 1:
+            return FakeRequest(HttpError(httplib2.Response({'status': 500}), b'backendError'))
+        return request
+
+
+def test_details_error_only_fails_songs_it_left_unresolved(tmp_path):
+    def items(prefix, count):
+        return [search_item(f'{prefix}{i}', f'{prefix} {i}', 'Channel') for i in range(count)]
+
+    # 60 distinct ids: the first batch of 50 covers A, B and half of C
+    service = FailingSecondBatchYouTube(
+        {f'Song {p.upper()} Artist': items(p, 20) for p in 'abc'},
+        [video(f'{p}{i}', f'{p} {i}', 'Channel') for p in 'abc' for i in range(20)],
+    )
+    set_cache(YouTubeCache(tmp_path / 'youtube.db'))
+    youtube.set_client_pool(youtube.YouTubeClientPool(['key1'], build=lambda key: service, rate=0))
+    try:
+        results = youtube.lookup_best_videos([('Artist', 'Song A'), ('Artist', 'Song B'), ('Artist', 'Song C')])
+        assert results[0]['video_id'].startswith('a')
+        assert results[1]['video_id'].startswith('b')
+        assert results[2] is youtube.LOOKUP_FAILED
+        assert youtube.get_best_youtube_video('Artist', 'Song C') is None
+    finally:
+        youtube.set_client_pool(None)
+        set_cache(None)